@@ -2,7 +2,8 @@
 API Routes cho vnstock API
 """
 from fastapi import APIRouter, HTTPException, Query, Body
-from typing import Optional, List, Dict, Any
+from fastapi.responses import Response
+from typing import Optional, List, Dict, Any, Tuple
 from ..models.schemas import StockRequest, StockResponse
 from ..services.vnstock_service import VNStockService
 from ..services.market_screener import MarketScreener
@@ -11,6 +12,7 @@ from ..services.portfolio_analytics import PortfolioAnalytics
 from ..services.news_aggregator import NewsAggregator
 from ..services.intraday_service import IntradayService
 from ..core.cache import get_cache
+from ..utils.columnar import validate_format, to_columnar_json, encode_binary
 
 router = APIRouter()
 
@@ -235,6 +237,168 @@ async def get_intraday_data(
         raise HTTPException(status_code=500, detail=f"Error getting intraday data: {str(e)}")
 
 
+@router.get("/api/stock/{symbol}/intraday/technical")
+async def get_intraday_technical_indicators(
+    symbol: str,
+    intervals: str = Query(
+        '5m',
+        description="Các khung thời gian intraday, phân cách bởi dấu phẩy (VD: 5m,15m,1h)",
+        example="5m,15m,1h"
+    ),
+    indicators: Optional[str] = Query(
+        None,
+        description="Danh sách nhóm chỉ số, phân cách bởi dấu phẩy (VD: RSI,MACD). Mặc định: tất cả",
+        example="RSI,MACD"
+    ),
+    tail: Optional[int] = Query(
+        None,
+        description="Chỉ trả về N nến cuối của mỗi khung thời gian",
+        ge=1,
+        le=5000
+    ),
+    start_date: Optional[str] = Query(
+        None,
+        description="Ngày bắt đầu (YYYY-MM-DD)",
+        example="2024-01-01"
+    ),
+    end_date: Optional[str] = Query(
+        None,
+        description="Ngày kết thúc (YYYY-MM-DD)",
+        example="2024-01-31"
+    ),
+    limit: int = Query(
+        5000,
+        description="Số lượng tick tối đa",
+        ge=100,
+        le=10000
+    )
+):
+    """
+    Lấy chỉ số kỹ thuật intraday trên nhiều khung thời gian từ một lần lấy tick
+
+    Tick được gộp một lần thành nến 1 phút, các khung lớn hơn được resample cục bộ
+    nên không phát sinh thêm request upstream cho mỗi khung thời gian.
+
+    **Curl examples:**
+    ```bash
+    curl "http://localhost:8000/api/stock/VNM/intraday/technical?intervals=5m,15m,1h&indicators=RSI,MACD"
+    curl "http://localhost:8000/api/stock/HPG/intraday/technical?intervals=15m&tail=20"
+    ```
+
+    Args:
+        symbol: Mã cổ phiếu
+        intervals: Các khung thời gian intraday
+        indicators: Các nhóm chỉ số cần tính
+        tail: Số nến cuối cần trả về
+        start_date: Ngày bắt đầu
+        end_date: Ngày kết thúc
+        limit: Số lượng tick tối đa để xử lý
+
+    Returns:
+        Chỉ số kỹ thuật theo từng khung thời gian
+    """
+    try:
+        from ..utils.technical_indicators import TechnicalAnalyzer
+        groups = TechnicalAnalyzer.validate_groups(indicators.split(',') if indicators else None)
+        timeframe_list = TechnicalAnalyzer.validate_timeframes(intervals.split(','))
+        if any(tf in ('D', 'W', 'M') for tf in timeframe_list):
+            raise ValueError("Use /api/stock/{symbol}/technical?timeframes=... for D, W, M")
+
+        cache_key = f"intraday_technical_{symbol}_{','.join(timeframe_list)}_{indicators}_{tail}_{start_date}_{end_date}_{limit}"
+        cache = get_cache()
+
+        cached_data = cache.get(cache_key)
+        if cached_data:
+            return {**cached_data, 'cached': True}
+
+        service = IntradayService(source='VCI')
+        frame = service.get_intraday_frame(symbol.upper(), start_date, end_date, limit)
+        if len(frame) == 0:
+            raise ValueError(f"No intraday data available for {symbol.upper()}")
+        analyzer = TechnicalAnalyzer(frame)
+
+        data = analyzer.calculate_multi_timeframe(timeframe_list, groups, tail, with_dates=True)
+
+        result = {
+            'symbol': symbol.upper(),
+            'timeframes': data,
+            'total_base_candles': len(frame)
+        }
+
+        # Cache for 1 minute (intraday data changes frequently)
+        cache.set(cache_key, result, ttl=60)
+
+        return {**result, 'cached': False}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error calculating intraday indicators: {str(e)}")
+
+
+@router.get("/api/stock/{symbol}/intraday/patterns")
+async def get_intraday_patterns(
+    symbol: str,
+    interval: str = Query(
+        '5m',
+        description="Khung thời gian (1m, 5m, 15m, 30m, 1h, 3h, 6h)",
+        example="5m"
+    ),
+    limit: int = Query(
+        5000,
+        description="Số lượng tick tối đa",
+        ge=100,
+        le=10000
+    )
+):
+    """
+    Nhận dạng mô hình nến trên nến intraday (cập nhật tăng dần)
+
+    Server giữ state cho mỗi (symbol, interval): mỗi lần gọi chỉ các nến vừa đóng kể từ lần
+    trước được đánh giá (cùng vài nến đóng trước đó làm ngữ cảnh), các mô hình cũ được giữ lại.
+    Nến cuối cùng (đang hình thành) không được đánh giá.
+
+    **Curl examples:**
+    ```bash
+    curl "http://localhost:8000/api/stock/VNM/intraday/patterns?interval=5m"
+    curl "http://localhost:8000/api/stock/HPG/intraday/patterns?interval=15m"
+    ```
+
+    Args:
+        symbol: Mã cổ phiếu
+        interval: Khung thời gian
+        limit: Số lượng tick tối đa để xử lý
+
+    Returns:
+        Các mô hình mới phát hiện và các mô hình gần nhất của (symbol, interval)
+    """
+    try:
+        if interval == '1d':
+            raise ValueError("Use /api/stock/{symbol}/candlestick-patterns for daily candles")
+
+        # Dùng chung cache nến với endpoint /intraday
+        cache_key = f"intraday_{symbol}_{interval}_{None}_{None}_{limit}"
+        cache = get_cache()
+
+        candles = cache.get(cache_key)
+        if not candles:
+            service = IntradayService(source='VCI')
+            candles = service.get_intraday_candles(symbol=symbol.upper(), interval=interval, limit=limit)
+            cache.set(cache_key, candles, ttl=60)
+
+        from ..services.intraday_pattern_tracker import get_intraday_pattern_tracker
+        result = get_intraday_pattern_tracker().update(symbol.upper(), interval, candles)
+
+        return {
+            'symbol': symbol.upper(),
+            'interval': interval,
+            **result
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error detecting intraday patterns: {str(e)}")
+
+
 @router.get("/api/stock/{symbol}/intervals")
 async def get_supported_intervals():
     """
@@ -267,15 +431,55 @@ async def get_supported_intervals():
 async def get_technical_indicators(
     symbol: str,
     start_date: Optional[str] = Query(None, description="Ngày bắt đầu (YYYY-MM-DD)", example="2024-01-01"),
-    end_date: Optional[str] = Query(None, description="Ngày kết thúc (YYYY-MM-DD)", example="2024-12-31")
+    end_date: Optional[str] = Query(None, description="Ngày kết thúc (YYYY-MM-DD)", example="2024-12-31"),
+    format: str = Query(
+        'json',
+        description="Format output: json (mặc định), columnar, msgpack, arrow",
+        example="columnar"
+    ),
+    float32: bool = Query(False, description="Giảm độ chính xác về float32 (chỉ áp dụng cho format dạng cột)"),
+    tail: Optional[int] = Query(
+        None,
+        description="Chỉ trả về N phiên cuối. Nếu không có start_date, API chỉ lấy N phiên + look-back cần thiết",
+        ge=1,
+        le=5000,
+        example=30
+    ),
+    indicators: Optional[str] = Query(
+        None,
+        description="Danh sách nhóm chỉ số, phân cách bởi dấu phẩy (VD: RSI,MACD). Mặc định: tất cả",
+        example="RSI,MACD"
+    ),
+    timeframes: Optional[str] = Query(
+        None,
+        description="Các khung thời gian, phân cách bởi dấu phẩy: D, W, M (resample từ dữ liệu ngày)",
+        example="D,W,M"
+    )
 ):
     """
     Lấy các chỉ số kỹ thuật của cổ phiếu (SMA, EMA, MACD, RSI, Bollinger Bands, ATR, OBV, Ichimoku, PSAR, MFI, A/D, CMF, ADL)
 
+    **Format output:**
+    - `json`: Format cũ, mỗi chỉ số là list với giai đoạn warm-up được thay bằng 0 (RSI/MFI: 50)
+    - `columnar`: Trục `dates` dùng chung, mỗi chỉ số là một mảng, giai đoạn warm-up là `null`
+    - `msgpack`: Như `columnar` nhưng encode MessagePack, mỗi cột là buffer float nhị phân (cần `msgpack`)
+    - `arrow`: Arrow IPC stream (cần `pyarrow`)
+
+    **Cửa sổ output (`tail`):** Khi chỉ cần N phiên cuối (VD: RSI 30 ngày), API chỉ lấy thêm
+    số phiên look-back đủ cho chỉ số dài nhất được yêu cầu (SMA_200 -> 200 phiên, Ichimoku -> 52 + 26),
+    tính toán rồi trả về đúng N phiên cuối.
+
+    **Đa khung thời gian (`timeframes`):** Chỉ số tuần/tháng được resample cục bộ từ cùng một lần
+    lấy dữ liệu ngày, không gọi thêm upstream. Response trả về `timeframes: {D: ..., W: ..., M: ...}`.
+    Format nhị phân (msgpack/arrow) chỉ hỗ trợ một khung thời gian mỗi request.
+
     **Curl examples:**
     ```bash
     curl "http://localhost:8000/api/stock/VNM/technical?start_date=2024-01-01&end_date=2024-01-31"
     curl "http://localhost:8000/api/stock/HPG/technical"
+    curl "http://localhost:8000/api/stock/HPG/technical?format=columnar&float32=true"
+    curl "http://localhost:8000/api/stock/HPG/technical?tail=30&indicators=RSI,MACD"
+    curl "http://localhost:8000/api/stock/HPG/technical?timeframes=D,W,M&tail=30&indicators=RSI,MACD"
     ```
 
     **HTTP Request:**
@@ -287,35 +491,119 @@ async def get_technical_indicators(
         symbol: Mã cổ phiếu
         start_date: Ngày bắt đầu
         end_date: Ngày kết thúc
+        format: Format output
+        float32: Dùng độ chính xác float32
+        tail: Số phiên cuối cần trả về
+        indicators: Các nhóm chỉ số cần tính
+        timeframes: Các khung thời gian
 
     Returns:
-        Các chỉ số kỹ thuật dưới dạng JSON
+        Các chỉ số kỹ thuật dưới dạng JSON (hoặc nhị phân với msgpack/arrow)
     """
     try:
-        service = VNStockService()
-        df = service.get_price_data(symbol.upper(), start_date, end_date)
+        output_format = validate_format(format)
 
         from ..utils.technical_indicators import TechnicalAnalyzer
+        groups = TechnicalAnalyzer.validate_groups(indicators.split(',') if indicators else None)
+        timeframe_list = TechnicalAnalyzer.validate_timeframes(timeframes.split(',')) if timeframes else None
+
+        if timeframe_list and output_format in ('msgpack', 'arrow') and len(timeframe_list) > 1:
+            raise ValueError(f"Format '{output_format}' supports a single timeframe per request")
+        if timeframe_list and any(tf not in ('D', 'W', 'M') for tf in timeframe_list):
+            raise ValueError("Daily price data supports timeframes D, W, M")
+
+        service = VNStockService()
+        if tail and start_date is None:
+            bars = TechnicalAnalyzer.required_daily_bars(timeframe_list or ['D'], groups, tail)
+            df = service.get_price_data_window(symbol.upper(), bars, end_date)
+        else:
+            df = service.get_price_data(symbol.upper(), start_date, end_date)
+
         analyzer = TechnicalAnalyzer(df)
-        indicators = analyzer.calculate_all_indicators()
 
-        return {
-            'symbol': symbol.upper(),
-            'indicators': indicators
-        }
+        if timeframe_list and output_format in ('json', 'columnar'):
+            if output_format == 'json':
+                data = analyzer.calculate_multi_timeframe(timeframe_list, groups, tail)
+            else:
+                frames = analyzer.calculate_multi_timeframe(timeframe_list, groups, tail, with_dates=True, columns=True)
+                data = {
+                    tf: to_columnar_json(frame['dates'], frame['indicators'], float32=float32)
+                    for tf, frame in frames.items()
+                }
+            return {
+                'symbol': symbol.upper(),
+                'format': output_format,
+                'timeframes': data
+            }
+        if timeframe_list:
+            analyzer = analyzer.for_timeframe(timeframe_list[0])
+
+        if output_format == 'json':
+            indicators_data = analyzer.calculate_all_indicators(groups, tail)
+            return {
+                'symbol': symbol.upper(),
+                'indicators': indicators_data
+            }
+
+        dates = analyzer.get_dates(tail)
+        columns = analyzer.calculate_indicator_columns(groups, tail)
+
+        if output_format == 'columnar':
+            return {
+                'symbol': symbol.upper(),
+                'format': 'columnar',
+                'indicators': to_columnar_json(dates, columns, float32=float32)
+            }
+
+        content, media_type = encode_binary(
+            output_format, dates, columns, float32=float32, metadata={'symbol': symbol.upper()}
+        )
+        return Response(content=content, media_type=media_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting technical indicators: {str(e)}")
 
 
+def _get_valuation(service: VNStockService, symbol: str, price: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Định giá P/E, P/B, P/S theo giá gần nhất và chỉ số trên mỗi cổ phiếu đã lưu (None nếu lỗi)"""
+    try:
+        from ..services.valuation_service import ValuationService
+
+        return ValuationService(service).get_valuation(symbol, price)
+    except Exception as e:
+        print(f"Error getting valuation: {e}")
+        return None
+
+
+def _get_fundamental_ranks(symbol: str) -> Dict[str, Any]:
+    """Đọc xếp hạng chỉ số cơ bản theo ngành/thị trường từ database (rỗng nếu chưa có hoặc lỗi)"""
+    try:
+        from ..database import get_db_session
+        from ..services.fundamental_rank_service import FundamentalRankService
+
+        with get_db_session() as db:
+            return FundamentalRankService.get_ranks(db, symbol)
+    except Exception as e:
+        print(f"Error getting fundamental ranks: {e}")
+        return {}
+
+
 @router.get("/api/stock/{symbol}/fundamental")
-async def get_fundamental_indicators(symbol: str):
+async def get_fundamental_indicators(
+    symbol: str,
+    include_ranks: bool = Query(True, description="Kèm xếp hạng percentile của các chỉ số trong ngành ICB và toàn thị trường")
+):
     """
     Lấy các chỉ số cơ bản của cổ phiếu (EPS, P/E, P/B, P/S, ROE, ROA, D/E, CR, NPM, RG, OCF, FCF)
 
+    Xếp hạng (ranks) được đọc từ bảng dựng sẵn sau mỗi lần scheduler cập nhật dữ liệu.
+    Định giá (valuation) dùng giá đóng cửa gần nhất và EPS TTM / BVPS / SPS đã lưu theo kỳ báo cáo.
+
     **Curl examples:**
     ```bash
     curl "http://localhost:8000/api/stock/VNM/fundamental"
-    curl "http://localhost:8000/api/stock/VCB/fundamental"
+    curl "http://localhost:8000/api/stock/VCB/fundamental?include_ranks=false"
     ```
 
     **HTTP Request:**
@@ -325,6 +613,7 @@ async def get_fundamental_indicators(symbol: str):
 
     Args:
         symbol: Mã cổ phiếu
+        include_ranks: Kèm xếp hạng theo ngành và thị trường
 
     Returns:
         Các chỉ số cơ bản dưới dạng JSON
@@ -335,11 +624,10 @@ async def get_fundamental_indicators(symbol: str):
         # Lấy thông tin công ty
         company_info = service.get_company_info(symbol.upper())
 
-        # Lấy dữ liệu giá hiện tại
-        df = service.get_price_data(symbol.upper())
-        current_price = float(df['close'].iloc[-1]) if not df.empty else 0
+        # Giá đóng cửa gần nhất (chỉ tải vài phiên cuối, không tải toàn bộ lịch sử)
+        current_price = service.get_last_price(symbol.upper()) or 0
 
-        # Lấy báo cáo tài chính
+        # Lấy báo cáo tài chính (được cache theo mã)
         financial_statements = service.get_financial_statements(symbol.upper())
 
         # Tính các chỉ số
@@ -350,15 +638,135 @@ async def get_fundamental_indicators(symbol: str):
         analyzer = FundamentalAnalyzer(financial_statements)
         indicators = analyzer.calculate_all_indicators(current_price, shares_outstanding, market_cap)
 
-        return {
+        result = {
             'symbol': symbol.upper(),
             'indicators': indicators,
-            'current_price': current_price
+            'current_price': current_price,
+            'valuation': _get_valuation(service, symbol.upper(), current_price or None)
         }
+        if include_ranks:
+            result['ranks'] = _get_fundamental_ranks(symbol)
+
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting fundamental indicators: {str(e)}")
 
 
+@router.get("/api/stock/{symbol}/fundamental/history")
+async def get_fundamental_history(
+    symbol: str,
+    period: str = Query("quarter", description="Loại kỳ báo cáo: year, quarter", example="quarter"),
+    metrics: Optional[str] = Query(
+        None,
+        description="Các chỉ số cần lấy, phân cách bởi dấu phẩy (VD: roe_ttm,eps_ttm,revenue_growth). Mặc định: tất cả",
+        example="roe_ttm,eps_ttm,revenue_growth"
+    ),
+    limit: Optional[int] = Query(None, description="Số kỳ gần nhất", example=12, ge=1, le=200),
+    refresh: bool = Query(False, description="Tính lại từ báo cáo tài chính trước khi trả về")
+):
+    """
+    Chuỗi chỉ số cơ bản theo kỳ báo cáo (ROE theo quý, EPS TTM, tăng trưởng cùng kỳ...)
+
+    Đọc từ bảng chỉ số theo kỳ đã lưu; lần đầu (hoặc khi refresh=true) báo cáo tài chính
+    được lấy và tính cho mọi kỳ trong một lượt rồi lưu lại.
+
+    **Curl examples:**
+    ```bash
+    curl "http://localhost:8000/api/stock/VNM/fundamental/history"
+    curl "http://localhost:8000/api/stock/VNM/fundamental/history?period=year&metrics=roe_ttm,eps_ttm&limit=5"
+    ```
+
+    Args:
+        symbol: Mã cổ phiếu
+        period: Loại kỳ báo cáo
+        metrics: Các chỉ số cần lấy
+        limit: Số kỳ gần nhất
+        refresh: Tính lại trước khi trả về
+
+    Returns:
+        Danh sách kỳ (cũ nhất trước) với các chỉ số
+    """
+    try:
+        from ..database import get_db_session
+        from ..services.fundamental_history_service import (
+            FundamentalHistoryService, validate_metrics, validate_period
+        )
+
+        validate_period(period)
+        metric_list = validate_metrics(metrics.split(',') if metrics else None)
+
+        with get_db_session() as db:
+            history = [] if refresh else FundamentalHistoryService.get_history(
+                db, symbol, period, metric_list, limit
+            )
+            if not history:
+                FundamentalHistoryService.refresh_symbol(db, symbol, period)
+                history = FundamentalHistoryService.get_history(db, symbol, period, metric_list, limit)
+
+        return {
+            'symbol': symbol.upper(),
+            'period': period,
+            'metrics': metric_list,
+            'history': history
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting fundamental history: {str(e)}")
+
+
+@router.get("/api/stock/{symbol}/screening/history")
+async def get_screening_history(
+    symbol: str,
+    fields: Optional[str] = Query(
+        None,
+        description="Các chỉ số cần lấy, phân cách bởi dấu phẩy (VD: pe,rsi,sma_200_distance). Mặc định: tất cả",
+        example="pe,rsi,sma_200_distance"
+    ),
+    start_date: Optional[str] = Query(None, description="Ngày bắt đầu (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Ngày kết thúc (YYYY-MM-DD)")
+):
+    """
+    Lịch sử chỉ số và factor screening theo ngày của một mã (từ ảnh chụp hàng ngày)
+
+    **Curl examples:**
+    ```bash
+    curl "http://localhost:8000/api/stock/VNM/screening/history?fields=pe,rsi,score"
+    curl "http://localhost:8000/api/stock/VNM/screening/history?start_date=2026-01-01&fields=macd_histogram"
+    ```
+
+    Args:
+        symbol: Mã cổ phiếu
+        fields: Các chỉ số cần lấy
+        start_date: Ngày bắt đầu
+        end_date: Ngày kết thúc
+
+    Returns:
+        Danh sách ngày (cũ nhất trước) với các chỉ số
+    """
+    try:
+        from datetime import datetime
+        from ..database import get_db_session
+        from ..services.screening_history_service import ScreeningHistoryService, validate_fields
+
+        field_list = validate_fields(fields.split(',') if fields else None)
+        start = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+
+        with get_db_session() as db:
+            history = ScreeningHistoryService.get_factor_history(db, symbol, field_list, start, end)
+
+        return {
+            'symbol': symbol.upper(),
+            'fields': field_list,
+            'history': history
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting screening history: {str(e)}")
+
+
 @router.get("/api/stock/{symbol}/company")
 async def get_company_info(symbol: str):
     """
@@ -402,6 +810,60 @@ async def health_check():
 
 # ==================== MARKET SCREENER ENDPOINTS ====================
 
+# Số mã tối đa mỗi trang JSON và mỗi response NDJSON (stream, đủ cho toàn thị trường)
+SCREENER_MAX_LIMIT = 500
+SCREENER_STREAM_MAX_LIMIT = 5000
+
+# Format output của screener: json hoặc ndjson (mỗi dòng một mã)
+SCREENER_FORMATS = {'json', 'ndjson'}
+
+
+def _screen_page(screener: MarketScreener, filters: Dict[str, Any], exchange: str, limit: int,
+                 cursor: Optional[str], output_format: str, **kwargs) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Một trang kết quả screener theo keyset (score, symbol)
+
+    Returns:
+        Tuple (danh sách mã, cursor của trang sau hoặc None nếu đã hết)
+
+    Raises:
+        ValueError: Format, cursor hoặc bộ lọc không hợp lệ
+    """
+    from ..core.validators import PaginationValidator
+    from ..services.screener_snapshot import decode_cursor, encode_cursor
+
+    output_format = (output_format or 'json').strip().lower()
+    if output_format not in SCREENER_FORMATS:
+        raise ValueError(f"Invalid format: '{output_format}'. Supported: {', '.join(sorted(SCREENER_FORMATS))}")
+    max_limit = SCREENER_STREAM_MAX_LIMIT if output_format == 'ndjson' else SCREENER_MAX_LIMIT
+    limit, _ = PaginationValidator.validate_pagination(limit, 0, max_limit=max_limit)
+
+    after = decode_cursor(cursor) if cursor else None
+    # Lấy thêm một mã để biết còn trang sau hay không
+    results = screener.screen_stocks(filters, exchange, limit + 1, after=after, **kwargs)
+    next_cursor = encode_cursor(results[limit - 1]) if len(results) > limit else None
+    return results[:limit], next_cursor
+
+
+def _screen_response(payload: Dict[str, Any], results: List[Dict[str, Any]],
+                     next_cursor: Optional[str], output_format: str):
+    """Response JSON (payload kèm danh sách mã) hoặc NDJSON stream từng mã (cursor trong header)"""
+    if (output_format or 'json').strip().lower() != 'ndjson':
+        return {**payload, "total_found": len(results), "next_cursor": next_cursor, "stocks": results}
+
+    import json
+    from fastapi.responses import StreamingResponse
+
+    def lines():
+        for stock in results:
+            yield json.dumps(stock, ensure_ascii=False, default=str) + "\n"
+
+    headers = {"X-Total-Found": str(len(results))}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
 @router.post("/api/screener/scan")
 async def screen_stocks(
     filters: Dict[str, Any] = Body(..., example={
@@ -411,11 +873,26 @@ async def screen_stocks(
         "market_cap_min": 1000000000000
     }),
     exchange: str = Query("HOSE", description="Sàn giao dịch: HOSE, HNX, UPCOM, ALL"),
-    limit: int = Query(50, description="Số lượng cổ phiếu tối đa")
+    limit: int = Query(50, description="Số lượng cổ phiếu mỗi trang"),
+    as_of: Optional[str] = Query(None, description="Quét trên dữ liệu của ngày (YYYY-MM-DD), mặc định: hiện tại"),
+    profile: Optional[str] = Query(None, description="Scoring profile để xếp hạng (xem /api/screener/profiles)"),
+    cursor: Optional[str] = Query(None, description="Cursor của trang sau (next_cursor của response trước)"),
+    format: str = Query('json', description="Format output: json (mặc định), ndjson (stream mỗi dòng một mã)")
 ):
     """
     Quét cổ phiếu theo bộ lọc tùy chỉnh
 
+    Với `as_of`, bộ lọc chạy trên ảnh chụp dữ liệu screening của phiên gần nhất không sau
+    ngày đó (ảnh chụp được lưu mỗi ngày giao dịch).
+
+    Với `profile`, kết quả được xếp hạng theo điểm của scoring profile đó (`score` trong kết
+    quả là điểm theo profile), mặc định dùng score đã lưu.
+
+    **Phân trang:** kết quả xếp theo (score giảm dần, symbol), `next_cursor` trỏ tới trang
+    sau (null khi đã hết). Gửi lại cùng bộ lọc kèm `cursor=<next_cursor>` để lấy trang tiếp
+    theo. Với `format=ndjson`, response là stream mỗi dòng một mã (tối đa 5000 mã) và cursor
+    nằm trong header `X-Next-Cursor`.
+
     **Các bộ lọc có sẵn:**
     - `pe_min`, `pe_max`: P/E ratio
     - `pb_max`: P/B ratio
@@ -424,18 +901,29 @@ async def screen_stocks(
     - `price_change_min`, `price_change_max`: % thay đổi giá (30 ngày)
     - `volume_min`: Khối lượng giao dịch tối thiểu
     - `rsi_min`, `rsi_max`: RSI indicator
+    - `expression`: Biểu thức lọc, kết hợp (AND) với các bộ lọc trên, ví dụ
+      `pe < 15 AND (roe > 20 OR pb < 1) AND sector NOT IN ('Ngân hàng') TOP 3 PER sector BY roe`
     """
     try:
+        from datetime import datetime
+
+        as_of_date = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
         screener = MarketScreener()
-        results = screener.screen_stocks(filters, exchange, limit)
+        results, next_cursor = _screen_page(
+            screener, filters, exchange, limit, cursor, format, as_of=as_of_date, profile=profile
+        )
 
-        return {
+        return _screen_response({
             "success": True,
             "exchange": exchange,
-            "filters_applied": filters,
-            "total_found": len(results),
-            "stocks": results
-        }
+            "as_of": as_of,
+            "profile": profile,
+            "filters_applied": filters
+        }, results, next_cursor, format)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -464,14 +952,41 @@ async def get_preset_screens():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/screener/profiles")
+async def get_scoring_profiles():
+    """
+    Lấy danh sách các scoring profile
+
+    **Profiles:**
+    - `classic`: Bảng điểm mặc định (P/E, P/B, ROE, biến động giá, RSI)
+    - `value`: Định giá thấp so với ngành
+    - `momentum`: Xu hướng giá (SMA 200, MACD, đỉnh 52 tuần)
+    - `quality`: Chất lượng so với ngành (ROE, biên lợi nhuận gộp, D/E, tăng trưởng)
+    """
+    try:
+        from ..services.scoring_profiles import list_profiles
+
+        return {
+            "success": True,
+            "profiles": list_profiles()
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/screener/preset/{preset_name}")
 async def screen_by_preset(
     preset_name: str,
     exchange: str = Query("HOSE", description="Sàn giao dịch"),
-    limit: int = Query(50, description="Số lượng cổ phiếu")
+    limit: int = Query(50, description="Số lượng cổ phiếu mỗi trang"),
+    profile: Optional[str] = Query(None, description="Scoring profile để xếp hạng"),
+    cursor: Optional[str] = Query(None, description="Cursor của trang sau (next_cursor của response trước)"),
+    format: str = Query('json', description="Format output: json (mặc định), ndjson (stream mỗi dòng một mã)")
 ):
     """
     Quét cổ phiếu theo preset có sẵn
+
+    Phân trang bằng `cursor` và `format=ndjson` như /api/screener/scan.
     """
     try:
         screener = MarketScreener()
@@ -484,21 +999,62 @@ async def screen_by_preset(
             )
 
         preset = presets[preset_name]
-        results = screener.screen_stocks(preset['filters'], exchange, limit)
+        results, next_cursor = _screen_page(
+            screener, preset['filters'], exchange, limit, cursor, format, profile=profile
+        )
 
-        return {
+        return _screen_response({
             "success": True,
             "preset": preset,
             "exchange": exchange,
-            "total_found": len(results),
-            "stocks": results
-        }
+            "profile": profile
+        }, results, next_cursor, format)
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/api/market/symbols")
+async def get_market_symbols(
+    exchange: str = Query("ALL", description="Sàn giao dịch: HOSE, HNX, UPCOM, ALL"),
+    index: Optional[str] = Query(None, description="Rổ chỉ số: VN30, HNX30", example="VN30"),
+    details: bool = Query(False, description="Kèm sàn, ngành ICB và rổ chỉ số của từng mã")
+):
+    """
+    Danh sách mã niêm yết toàn thị trường (tải từ listing của vnstock, làm mới hàng ngày)
+
+    **Curl examples:**
+    ```bash
+    curl "http://localhost:8000/api/market/symbols?exchange=HOSE"
+    curl "http://localhost:8000/api/market/symbols?index=VN30&details=true"
+    ```
+
+    Args:
+        exchange: Sàn giao dịch
+        index: Rổ chỉ số
+        details: Kèm thông tin niêm yết
+
+    Returns:
+        Danh sách mã
+    """
+    try:
+        from ..services.symbol_universe import get_symbol_universe
+
+        universe = get_symbol_universe()
+        symbols = universe.get_symbols(exchange, index)
+        return {
+            'exchange': exchange.upper(),
+            'index': index.upper() if index else None,
+            'total': len(symbols),
+            'symbols': [universe.get_info(s) for s in symbols] if details else symbols
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error getting market symbols: {str(e)}")
+
+
 # ==================== MARKET HEATMAP ENDPOINTS ====================
 
 @router.get("/api/heatmap/market")
@@ -691,12 +1247,31 @@ async def search_news(
 
 # ==================== CANDLESTICK PATTERNS ENDPOINTS ====================
 
+# Số phiên tối thiểu của cửa sổ đầu tiên khi lấy N mô hình gần nhất
+LATEST_PATTERNS_INITIAL_BARS = 60
+
+def _get_pattern_outcome_stats(symbol: str, pattern_names: List[str]) -> Dict[str, Any]:
+    """Đọc thống kê kết quả sau mô hình từ database (rỗng nếu chưa có hoặc lỗi)"""
+    if not pattern_names:
+        return {}
+    try:
+        from ..database import get_db_session
+        from ..services.pattern_outcome_service import PatternOutcomeService
+
+        with get_db_session() as db:
+            return PatternOutcomeService.get_stats(db, symbol, pattern_names)
+    except Exception as e:
+        print(f"Error getting pattern outcome stats: {e}")
+        return {}
+
+
 @router.get("/api/stock/{symbol}/candlestick-patterns")
 async def get_candlestick_patterns(
     symbol: str,
     start_date: Optional[str] = Query(None, description="Ngày bắt đầu (YYYY-MM-DD)", example="2024-01-01"),
     end_date: Optional[str] = Query(None, description="Ngày kết thúc (YYYY-MM-DD)", example="2024-12-31"),
-    latest_n: Optional[int] = Query(None, description="Lấy N mô hình gần nhất", example=10)
+    latest_n: Optional[int] = Query(None, description="Lấy N mô hình gần nhất", example=10, ge=1, le=1000),
+    include_stats: bool = Query(True, description="Kèm tỷ lệ thắng lịch sử (1/5/20 phiên) của các mô hình tìm thấy")
 ):
     """
     Nhận dạng các mô hình nến Nhật (Japanese Candlestick Patterns)
@@ -724,6 +1299,12 @@ async def get_candlestick_patterns(
     curl "http://localhost:8000/api/stock/VNM/candlestick-patterns?latest_n=10"
     ```
 
+    **include_stats:** Kèm `outcome_stats` - tỷ lệ giá tăng sau 1/5/20 phiên của từng mô hình
+    (theo mã và toàn thị trường), đọc từ bảng thống kê được scheduler cập nhật hàng ngày.
+
+    **latest_n:** Khi không truyền start_date, chỉ lấy một cửa sổ giá gần nhất và mở rộng dần
+    (x4 mỗi lần) cho đến khi đủ N mô hình hoặc hết lịch sử, thay vì tải toàn bộ lịch sử.
+
     **HTTP Request:**
     ```
     GET http://localhost:8000/api/stock/VNM/candlestick-patterns?start_date=2024-01-01&end_date=2024-12-31
@@ -734,34 +1315,111 @@ async def get_candlestick_patterns(
         start_date: Ngày bắt đầu
         end_date: Ngày kết thúc
         latest_n: Lấy N mô hình gần nhất (tùy chọn)
+        include_stats: Kèm thống kê tỷ lệ thắng
 
     Returns:
         Các mô hình nến được phát hiện dưới dạng JSON
     """
     try:
         service = VNStockService()
-        df = service.get_price_data(symbol.upper(), start_date, end_date)
-
-        from ..utils.candlestick_patterns import CandlestickPatternDetector
-        detector = CandlestickPatternDetector(df)
+        from ..utils.candlestick_patterns import CandlestickPatternDetector, MAX_PATTERN_SPAN
+
+        if latest_n and start_date is None:
+            # Cửa sổ ban đầu đủ cho N mô hình trong trường hợp thông thường, mở rộng nếu thiếu
+            bars = max(LATEST_PATTERNS_INITIAL_BARS, latest_n * 4)
+            while True:
+                df = service.get_price_data_window(symbol.upper(), bars, end_date)
+                detector = CandlestickPatternDetector(df)
+                # Cửa sổ ngắn hơn yêu cầu nghĩa là đã lấy đến đầu lịch sử
+                complete = len(df) < bars
+                # Các bar đầu cửa sổ thiếu nến phía trước nên chỉ tin cậy khi đã đến đầu lịch sử
+                patterns = detector.get_latest_patterns(
+                    latest_n, min_index=0 if complete else MAX_PATTERN_SPAN - 1
+                )
+                if len(patterns) >= latest_n or complete:
+                    break
+                bars *= 4
+        else:
+            df = service.get_price_data(symbol.upper(), start_date, end_date)
+            detector = CandlestickPatternDetector(df)
+            patterns = detector.get_latest_patterns(latest_n) if latest_n else detector.detect_all_patterns()
 
         if latest_n:
-            patterns = detector.get_latest_patterns(latest_n)
-            return {
+            result = {
                 'symbol': symbol.upper(),
                 'patterns': patterns,
                 'total': len(patterns)
             }
+            found = sorted({p['pattern_name'] for p in patterns})
         else:
-            all_patterns = detector.detect_all_patterns()
-            return {
+            result = {
                 'symbol': symbol.upper(),
-                'patterns': all_patterns
+                'patterns': patterns
             }
+            found = patterns['summary']['patterns_found']
+
+        if include_stats:
+            result['outcome_stats'] = _get_pattern_outcome_stats(symbol, found)
+
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error detecting candlestick patterns: {str(e)}")
 
 
+@router.get("/api/patterns/scan")
+async def scan_market_patterns(
+    patterns: Optional[str] = Query(
+        None,
+        description="Các mô hình cần tìm, phân cách bởi dấu phẩy (VD: Bullish_Engulfing,Hammer). Mặc định: tất cả",
+        example="Bullish_Engulfing"
+    ),
+    exchange: Optional[str] = Query(None, description="Sàn giao dịch (HOSE, HNX, UPCOM)", example="HOSE"),
+    days: int = Query(1, description="Số phiên gần nhất cần xét", ge=1, le=20),
+    as_of: Optional[str] = Query(None, description="Ngày giao dịch cuối (YYYY-MM-DD), mặc định: mới nhất", example="2024-12-31")
+):
+    """
+    Quét mô hình nến Nhật cho toàn thị trường
+
+    Dùng nến ngày đã lưu trong database cho mọi mã đang active (được scheduler cập nhật),
+    quét trong một lượt dạng panel (mã x ngày), không gọi upstream cho từng mã.
+    Kết quả được cache theo ngày giao dịch.
+
+    **Curl examples:**
+    ```bash
+    # Các mã có Bullish Engulfing ở phiên mới nhất
+    curl "http://localhost:8000/api/patterns/scan?patterns=Bullish_Engulfing"
+
+    # Tất cả mô hình trên sàn HOSE trong 3 phiên gần nhất
+    curl "http://localhost:8000/api/patterns/scan?exchange=HOSE&days=3"
+    ```
+
+    Args:
+        patterns: Các mô hình cần tìm
+        exchange: Sàn giao dịch
+        days: Số phiên gần nhất
+        as_of: Ngày giao dịch cuối
+
+    Returns:
+        Danh sách mã theo từng mô hình
+    """
+    try:
+        from datetime import datetime
+        from ..services.pattern_scan_service import PatternScanService
+
+        as_of_date = datetime.strptime(as_of, '%Y-%m-%d').date() if as_of else None
+        result = PatternScanService().scan(
+            patterns=patterns.split(',') if patterns else None,
+            exchange=exchange,
+            days=days,
+            as_of=as_of_date
+        )
+        return {'success': True, **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error scanning candlestick patterns: {str(e)}")
+
+
 # ==================== CACHE MANAGEMENT ENDPOINTS ====================
 
 @router.get("/api/cache/stats")
@@ -850,17 +1508,17 @@ async def get_scheduler_status():
 @router.post("/api/admin/database/populate")
 async def populate_database(
     exchange: str = Query("HOSE", description="Sàn giao dịch: HOSE, HNX, UPCOM"),
-    delay_seconds: int = Query(3, description="Delay giữa các request (giây)", ge=1, le=10)
+    max_workers: int = Query(4, description="Số mã được lấy song song", ge=1, le=16)
 ):
     """
     Populate database với dữ liệu ban đầu
 
-    **Cảnh báo:** Job này có thể chạy lâu (30-60 phút) do rate limit.
-    Nên chạy trong background hoặc khi thị trường đóng cửa.
+    **Cảnh báo:** Job này có thể chạy lâu do rate limit (các worker dùng chung giới hạn
+    UPSTREAM_RATE_PER_SECOND request/giây). Nên chạy khi thị trường đóng cửa.
 
     Args:
         exchange: Sàn giao dịch cần scan
-        delay_seconds: Thời gian delay giữa các request để tránh rate limit
+        max_workers: Số mã được lấy song song
 
     Returns:
         Kết quả populate database
@@ -872,7 +1530,7 @@ async def populate_database(
         import threading
         def run_populate():
             try:
-                stock_updater.scan_all_symbols(exchange=exchange, delay_seconds=delay_seconds)
+                stock_updater.scan_all_symbols(exchange=exchange, max_workers=max_workers)
             except Exception as e:
                 print(f"Error in populate job: {e}")
 
@@ -883,7 +1541,7 @@ async def populate_database(
             "success": True,
             "message": f"Database population started for {exchange}",
             "info": "Job is running in background. Check job logs for progress.",
-            "estimated_time": "30-60 minutes depending on rate limits"
+            "estimated_time": "Depends on UPSTREAM_RATE_PER_SECOND (3 requests per stock)"
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -893,7 +1551,7 @@ async def populate_database(
 async def update_stale_stocks(
     max_stocks: int = Query(50, description="Số lượng cổ phiếu tối đa", ge=1, le=200),
     max_age_hours: int = Query(24, description="Tuổi dữ liệu tối đa (giờ)", ge=1, le=168),
-    delay_seconds: int = Query(3, description="Delay giữa các request (giây)", ge=1, le=10)
+    max_workers: int = Query(4, description="Số mã được lấy song song", ge=1, le=16)
 ):
     """
     Cập nhật các cổ phiếu có dữ liệu cũ
@@ -901,7 +1559,7 @@ async def update_stale_stocks(
     Args:
         max_stocks: Số lượng cổ phiếu tối đa cần update
         max_age_hours: Cập nhật các stocks có dữ liệu cũ hơn N giờ
-        delay_seconds: Delay giữa các request
+        max_workers: Số mã được lấy song song
 
     Returns:
         Kết quả update
@@ -915,7 +1573,8 @@ async def update_stale_stocks(
             try:
                 stock_updater.update_stale_stocks(
                     max_stocks=max_stocks,
-                    delay_seconds=delay_seconds
+                    max_age_hours=max_age_hours,
+                    max_workers=max_workers
                 )
             except Exception as e:
                 print(f"Error in update job: {e}")
@@ -932,6 +1591,48 @@ async def update_stale_stocks(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/api/admin/database/backfill-history")
+async def backfill_price_history(
+    max_symbols: Optional[int] = Query(None, description="Số mã tối đa (mặc định: tất cả mã còn thiếu)", ge=1),
+    max_workers: int = Query(4, description="Số mã được lấy song song", ge=1, le=16)
+):
+    """
+    Tải lịch sử nến ngày còn thiếu (đủ 52 tuần cho các factor kỹ thuật)
+
+    Mã chưa đủ lịch sử được tải toàn bộ, mã bị thiếu phiên được tải từ nến mới nhất đã lưu.
+    Job cũng chạy hàng ngày trước daily update.
+
+    Args:
+        max_symbols: Số mã tối đa cần tải
+        max_workers: Số mã được lấy song song
+
+    Returns:
+        Kết quả khởi chạy job
+    """
+    try:
+        from ..scheduler.stock_updater import stock_updater
+
+        # Run in background
+        import threading
+        def run_backfill():
+            try:
+                stock_updater.backfill_history(max_symbols=max_symbols, max_workers=max_workers)
+            except Exception as e:
+                print(f"Error in backfill job: {e}")
+
+        thread = threading.Thread(target=run_backfill, daemon=True)
+        thread.start()
+
+        return {
+            "success": True,
+            "message": "History backfill started",
+            "info": "Job is running in background. Check job logs for progress.",
+            "estimated_time": "Depends on UPSTREAM_RATE_PER_SECOND (1 request per stock)"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @router.get("/api/admin/database/stats")
 async def get_database_stats():
     """
@@ -0,0 +1,268 @@
+"""
+Process pool cho các tác vụ phân tích nặng CPU trên nhiều mã cổ phiếu
+
+Tính chỉ số kỹ thuật / mô hình nến cho hàng trăm mã là code Python chạy trên một core
+(GIL). Executor này (opt-in qua ANALYTICS_PROCESS_POOL=true) chia batch cho nhiều process:
+- Toàn bộ OHLCV của batch được ghi một lần vào shared memory, worker chỉ nhận
+  (tên block, offset, độ dài) nên không phải pickle các mảng giá
+- Mỗi worker dựng OHLCVFrame dạng view trên shared memory và chạy task
+- Kết quả trả về là dict nhỏ gọn (giá trị mới nhất), không phải cả chuỗi
+
+Khi tắt pool hoặc batch nhỏ, các task chạy tuần tự ngay trong process hiện tại.
+"""
+import gc
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.ohlcv import OHLCVFrame
+
+# Bật process pool (mặc định tắt)
+ANALYTICS_PROCESS_POOL = os.getenv('ANALYTICS_PROCESS_POOL', 'false').lower() == 'true'
+ANALYTICS_MAX_WORKERS = int(os.getenv('ANALYTICS_MAX_WORKERS', str(os.cpu_count() or 2)))
+
+# Batch nhỏ hơn ngưỡng này chạy tuần tự (chi phí khởi tạo process không đáng)
+MIN_PARALLEL_BATCH = 8
+
+# Số dòng trong block shared memory: dates + open, high, low, close, volume
+_ROWS = 1 + len(OHLCVFrame.FIELDS)
+
+
+def _latest_value(values: np.ndarray) -> Optional[float]:
+    """Giá trị cuối của mảng (None nếu rỗng hoặc NaN)"""
+    if len(values) == 0 or np.isnan(values[-1]):
+        return None
+    return float(values[-1])
+
+
+def technical_snapshot(frame: OHLCVFrame, groups: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Task: giá trị mới nhất của các chỉ số kỹ thuật
+
+    Args:
+        frame: Dữ liệu OHLCV của một mã
+        groups: Các nhóm chỉ số (None = tất cả)
+
+    Returns:
+        Dictionary {tên cột: giá trị mới nhất}
+    """
+    from ..utils.technical_indicators import TechnicalAnalyzer
+
+    columns = TechnicalAnalyzer(frame).calculate_indicator_columns(groups)
+    return {name: _latest_value(values) for name, values in columns.items()}
+
+
+def candlestick_latest(frame: OHLCVFrame, n: int = 5) -> List[Dict[str, Any]]:
+    """
+    Task: N mô hình nến gần nhất
+
+    Args:
+        frame: Dữ liệu OHLCV của một mã
+        n: Số mô hình cần lấy
+
+    Returns:
+        Danh sách mô hình (như CandlestickPatternDetector.get_latest_patterns)
+    """
+    from ..utils.candlestick_patterns import CandlestickPatternDetector
+
+    return CandlestickPatternDetector(frame).get_latest_patterns(n)
+
+
+def screening_factors(frame: OHLCVFrame) -> Dict[str, Optional[float]]:
+    """
+    Task: factor kỹ thuật của bộ lọc cổ phiếu tại phiên gần nhất
+
+    Args:
+        frame: Nến ngày của một mã (chỉ gồm các phiên mã đó có giao dịch)
+
+    Returns:
+        Dictionary {tên factor: giá trị} (như screening_factors.symbol_technical_factors)
+    """
+    from ..services.screening_factors import symbol_technical_factors
+
+    return symbol_technical_factors(frame)
+
+
+def pattern_events(frame: OHLCVFrame, patterns: Optional[List[str]] = None,
+                   since: Optional[int] = None) -> List[Tuple[int, int]]:
+    """
+    Task: các mô hình nến xuất hiện từ một ngày trở đi
+
+    Args:
+        frame: Nến ngày của một mã
+        patterns: Các mô hình cần quét (mặc định: tất cả)
+        since: Chỉ giữ các bar có ngày >= giá trị này (int64 nanosecond, mặc định: tất cả)
+
+    Returns:
+        Danh sách (bar index, pattern id) theo bar rồi pattern id
+    """
+    from ..utils.candlestick_patterns import PatternScanner
+
+    events = PatternScanner.from_ohlcv(frame).scan(patterns=patterns)
+    if since is not None:
+        events = events[frame.dates[events[:, 0]] >= since]
+    return [tuple(event) for event in events.tolist()]
+
+
+# Các task được phép chạy trong worker (tra theo tên để không phải pickle function)
+TASKS: Dict[str, Callable[..., Any]] = {
+    'technical_snapshot': technical_snapshot,
+    'candlestick_latest': candlestick_latest,
+    'screening_factors': screening_factors,
+    'pattern_events': pattern_events,
+}
+
+
+def _run_task(task: str, frame: OHLCVFrame, params: Dict[str, Any]) -> Tuple[bool, Any]:
+    """Chạy task cho một mã, trả về (thành công, kết quả hoặc thông báo lỗi)"""
+    try:
+        return True, TASKS[task](frame, **params)
+    except Exception as e:
+        return False, str(e)
+
+
+def _run_chunk(shm_name: str, total: int, task: str,
+               entries: List[Tuple[str, int, int]], params: Dict[str, Any]) -> Dict[str, Tuple[bool, Any]]:
+    """
+    Chạy trong worker process: gắn vào shared memory và chạy task cho từng mã của chunk
+
+    Args:
+        shm_name: Tên block shared memory
+        total: Tổng số bar của cả batch
+        task: Tên task
+        entries: Danh sách (symbol, offset, length)
+        params: Tham số cho task
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+
+    results = {}
+    try:
+        dates = np.ndarray((total,), dtype=np.int64, buffer=shm.buf)
+        values = np.ndarray((_ROWS - 1, total), dtype=np.float64, buffer=shm.buf, offset=dates.nbytes)
+        for symbol, offset, length in entries:
+            window = slice(offset, offset + length)
+            frame = OHLCVFrame(dates[window], *(row[window] for row in values))
+            results[symbol] = _run_task(task, frame, params)
+            del frame
+        del dates, values
+    finally:
+        gc.collect()
+        shm.close()
+    return results
+
+
+def _pack_frames(shm: shared_memory.SharedMemory, total: int,
+                 frames: Dict[str, OHLCVFrame]) -> List[Tuple[str, int, int]]:
+    """Ghi OHLCV của batch vào shared memory, trả về danh sách (symbol, offset, length)"""
+    dates = np.ndarray((total,), dtype=np.int64, buffer=shm.buf)
+    values = np.ndarray((_ROWS - 1, total), dtype=np.float64, buffer=shm.buf, offset=dates.nbytes)
+
+    entries = []
+    offset = 0
+    for symbol, frame in frames.items():
+        length = len(frame)
+        dates[offset:offset + length] = frame.dates
+        for i, field in enumerate(OHLCVFrame.FIELDS):
+            values[i, offset:offset + length] = getattr(frame, field)
+        entries.append((symbol, offset, length))
+        offset += length
+    return entries
+
+
+class AnalyticsExecutor:
+    """Chạy task phân tích cho một batch mã, song song trên process pool nếu được bật"""
+
+    def __init__(self, max_workers: Optional[int] = None, enabled: Optional[bool] = None):
+        """
+        Args:
+            max_workers: Số process tối đa (mặc định ANALYTICS_MAX_WORKERS)
+            enabled: Bật process pool (mặc định theo ANALYTICS_PROCESS_POOL)
+        """
+        self.max_workers = max_workers or ANALYTICS_MAX_WORKERS
+        self.enabled = ANALYTICS_PROCESS_POOL if enabled is None else enabled
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """Lazy khởi tạo process pool"""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._pool
+
+    def run(self, task: str, frames: Dict[str, OHLCVFrame], **params) -> Dict[str, Any]:
+        """
+        Chạy task cho mọi mã trong batch
+
+        Args:
+            task: Tên task trong TASKS (VD: 'technical_snapshot', 'screening_factors')
+            frames: Dictionary {symbol: OHLCVFrame}
+            **params: Tham số truyền cho task
+
+        Returns:
+            Dictionary {symbol: kết quả}; mã bị lỗi không có trong kết quả
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown analytics task: '{task}'. Supported: {list(TASKS.keys())}")
+
+        if not self.enabled or len(frames) < MIN_PARALLEL_BATCH or self.max_workers < 2:
+            outcomes = {symbol: _run_task(task, frame, params) for symbol, frame in frames.items()}
+        else:
+            outcomes = self._run_parallel(task, frames, params)
+
+        results = {}
+        for symbol, (ok, value) in outcomes.items():
+            if ok:
+                results[symbol] = value
+            else:
+                print(f"Analytics task '{task}' failed for {symbol}: {value}")
+        return results
+
+    def _run_parallel(self, task: str, frames: Dict[str, OHLCVFrame],
+                      params: Dict[str, Any]) -> Dict[str, Tuple[bool, Any]]:
+        """Ghi batch vào shared memory và chia chunk cho các worker"""
+        total = sum(len(frame) for frame in frames.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(1, _ROWS * total * 8))
+        try:
+            entries = _pack_frames(shm, total, frames)
+
+            # Chia nhỏ hơn số worker để cân bằng tải giữa mã dài/ngắn
+            chunk_size = max(1, math.ceil(len(entries) / (self.max_workers * 4)))
+            chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+
+            pool = self._get_pool()
+            futures = [pool.submit(_run_chunk, shm.name, total, task, chunk, params) for chunk in chunks]
+
+            outcomes = {}
+            for future in futures:
+                outcomes.update(future.result())
+            return outcomes
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        """Dừng process pool"""
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+
+# Global executor instance
+_global_executor = AnalyticsExecutor()
+
+
+def get_analytics_executor() -> AnalyticsExecutor:
+    """
+    Lấy global analytics executor
+
+    Returns:
+        AnalyticsExecutor instance
+    """
+    return _global_executor
@@ -0,0 +1,76 @@
+"""
+Giới hạn tốc độ gọi upstream (vnstock) dùng chung cho mọi luồng
+
+Token bucket: mỗi request lấy một token; token được nạp lại đều theo UPSTREAM_RATE_PER_SECOND,
+tối đa UPSTREAM_BURST token. Các worker song song chia nhau cùng một ngân sách request
+nên tăng số worker không làm vượt giới hạn của upstream.
+"""
+import os
+import time
+from threading import Lock
+
+# Mặc định 2 request/giây: job tuần tự cũ tốn ~6 giây cho 3 request mỗi mã (mạng ~1.5s,
+# sleep 2s trong lúc lấy dữ liệu và 2-3s giữa các mã), tức ~0.5 request/giây. Các worker
+# song song che độ trễ mạng nên dùng hết ngân sách, nhanh gấp ~4 lần mà không dồn request.
+# Vượt quota của vnstock làm thư viện dừng bằng SystemExit, nên chỉ tăng khi tài khoản
+# vnstock có quota cao hơn.
+UPSTREAM_RATE_PER_SECOND = float(os.getenv('UPSTREAM_RATE_PER_SECOND', '2'))
+UPSTREAM_BURST = int(os.getenv('UPSTREAM_BURST', '6'))
+
+
+class TokenBucket:
+    """Token bucket thread-safe"""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate: Số token được nạp mỗi giây
+            capacity: Số token tối đa (số request được phép dồn một lúc)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: int = 1) -> float:
+        """
+        Lấy token, chờ nếu chưa đủ
+
+        Args:
+            tokens: Số token cần lấy (số request sắp gọi)
+
+        Returns:
+            Số giây đã chờ
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                # Yêu cầu lớn hơn capacity vẫn được phục vụ khi bucket đầy
+                needed = min(tokens, self.capacity)
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+
+# Global rate limiter cho các request tới vnstock
+_upstream_limiter = TokenBucket(UPSTREAM_RATE_PER_SECOND, UPSTREAM_BURST)
+
+
+def get_upstream_rate_limiter() -> TokenBucket:
+    """
+    Lấy global rate limiter của upstream
+
+    Returns:
+        TokenBucket instance
+    """
+    return _upstream_limiter
@@ -324,6 +324,18 @@ class ScreenerValidator:
             if key in filters and filters[key] is not None:
                 validated[key] = filters[key]
 
+        # Biểu thức lọc (phân tích một lần, cache theo hash)
+        if filters.get('expression'):
+            from ..services.screener_expression import compile_expression
+            try:
+                compile_expression(filters['expression'])
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid expression: {e}"
+                )
+            validated['expression'] = filters['expression']
+
         return validated
 
 
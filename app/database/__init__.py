@@ -2,7 +2,10 @@
 Database package
 """
 from .database import init_db, get_db, get_db_session, close_db, engine, SessionLocal
-from .models import Base, StockScreeningData, ScreeningJobLog
+from .models import (
+    Base, StockScreeningData, SymbolListing, StockDailyBar, ScreeningSnapshotDaily, PatternOutcomeStat,
+    FundamentalPeriodData, FundamentalRank, ScreeningJobLog
+)
 
 __all__ = [
     'init_db',
@@ -13,5 +16,11 @@ __all__ = [
     'SessionLocal',
     'Base',
     'StockScreeningData',
+    'SymbolListing',
+    'StockDailyBar',
+    'ScreeningSnapshotDaily',
+    'PatternOutcomeStat',
+    'FundamentalPeriodData',
+    'FundamentalRank',
     'ScreeningJobLog'
 ]
@@ -1,7 +1,7 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 import os
@@ -22,8 +22,38 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def _migrate_schema():
+    """
+    Migration nhẹ cho bảng đã có: thêm cột và index mới của model
+
+    create_all chỉ tạo bảng chưa có, không sửa bảng cũ. Cột mới được thêm bằng
+    ALTER TABLE ... ADD COLUMN (nullable, không default), index còn thiếu được tạo.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing_columns]
+        if missing:
+            with engine.begin() as connection:
+                for column in missing:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            print(f"Added columns to {table.name}: {[column.name for column in missing]}")
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(bind=engine)
+
+
 def init_db():
     """Initialize database - create all tables"""
+    _migrate_schema()
     Base.metadata.create_all(bind=engine)
     print("Database initialized successfully")
 
@@ -1,12 +1,21 @@
 """
 Database models for stock screening data
 """
-from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Index
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, Boolean, Index
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
 Base = declarative_base()
 
+# Các cột factor của StockScreeningData (tính bởi services.screening_factors)
+TECHNICAL_FACTOR_COLUMNS = (
+    'sma_20', 'sma_50', 'sma_200', 'sma_50_distance', 'sma_200_distance',
+    'macd', 'macd_signal', 'macd_histogram', 'macd_cross', 'atr_pct',
+    'high_52w', 'low_52w', 'high_52w_distance', 'low_52w_distance', 'avg_value_20d'
+)
+FUNDAMENTAL_FACTOR_COLUMNS = ('revenue_growth', 'net_income_growth', 'eps_growth', 'gross_margin', 'de')
+SCREENING_FACTOR_COLUMNS = TECHNICAL_FACTOR_COLUMNS + FUNDAMENTAL_FACTOR_COLUMNS
+
 
 class StockScreeningData(Base):
     """Model để lưu trữ dữ liệu screening của cổ phiếu"""
@@ -36,6 +45,31 @@ class StockScreeningData(Base):
     # Technical indicators
     rsi = Column(Float)  # RSI 14
 
+    # Technical factors (từ nến ngày đã lưu)
+    sma_20 = Column(Float)
+    sma_50 = Column(Float)
+    sma_200 = Column(Float)
+    sma_50_distance = Column(Float)  # % giá so với SMA 50
+    sma_200_distance = Column(Float)  # % giá so với SMA 200
+    macd = Column(Float)  # MACD 12/26/9
+    macd_signal = Column(Float)
+    macd_histogram = Column(Float)
+    macd_cross = Column(Integer)  # 1: cắt lên, -1: cắt xuống signal trong vài phiên gần nhất, 0: không
+    atr_pct = Column(Float)  # ATR 14 / giá (%)
+    high_52w = Column(Float)
+    low_52w = Column(Float)
+    high_52w_distance = Column(Float)  # % so với đỉnh 52 tuần (<= 0)
+    low_52w_distance = Column(Float)  # % so với đáy 52 tuần (>= 0)
+    avg_value_20d = Column(Float)  # Giá trị giao dịch trung bình 20 phiên (VND)
+
+    # Fundamental factors (kỳ báo cáo gần nhất, ưu tiên quý)
+    revenue_growth = Column(Float)  # % YoY
+    net_income_growth = Column(Float)  # % YoY
+    eps_growth = Column(Float)  # % YoY
+    gross_margin = Column(Float)  # %
+    de = Column(Float)  # Nợ / vốn chủ sở hữu
+    factors_updated = Column(DateTime)
+
     # Metadata
     score = Column(Float, default=0)
     last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -46,6 +80,13 @@ class StockScreeningData(Base):
         Index('idx_exchange_score', 'exchange', 'score'),
         Index('idx_pe_roe', 'pe', 'roe'),
         Index('idx_last_updated', 'last_updated'),
+        Index('idx_macd_cross_score', 'macd_cross', 'score'),
+        Index('idx_exchange_sma200_distance', 'exchange', 'sma_200_distance'),
+        Index('idx_exchange_high52w_distance', 'exchange', 'high_52w_distance'),
+        Index('idx_exchange_avg_value', 'exchange', 'avg_value_20d'),
+        Index('idx_exchange_atr_pct', 'exchange', 'atr_pct'),
+        Index('idx_eps_revenue_growth', 'eps_growth', 'revenue_growth'),
+        Index('idx_sector_score', 'sector', 'score'),
     )
 
     def to_dict(self):
@@ -67,11 +108,246 @@ class StockScreeningData(Base):
             'eps': self.eps,
             'market_cap': self.market_cap,
             'rsi': self.rsi,
+            **{column: getattr(self, column) for column in SCREENING_FACTOR_COLUMNS},
             'score': self.score,
             'last_updated': self.last_updated.isoformat() if self.last_updated else None
         }
 
 
+class SymbolListing(Base):
+    """Model lưu danh sách mã niêm yết (sàn, ngành ICB, chỉ số thành phần) từ listing của vnstock"""
+    __tablename__ = "symbol_listing"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), unique=True, index=True, nullable=False)
+    exchange = Column(String(10), index=True)  # HOSE, HNX, UPCOM
+    company_name = Column(String(255))
+    industry = Column(String(100))  # ICB cấp 3
+    sector = Column(String(100))  # ICB cấp 2
+    indices = Column(String(100))  # Chỉ số thành phần, phân cách bởi dấu phẩy (VN30,HNX30)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            'symbol': self.symbol,
+            'exchange': self.exchange,
+            'company_name': self.company_name,
+            'industry': self.industry,
+            'sector': self.sector,
+            'indices': self.indices.split(',') if self.indices else []
+        }
+
+
+class StockDailyBar(Base):
+    """Model lưu nến ngày gần nhất của cổ phiếu (dùng cho quét mô hình nến toàn thị trường)"""
+    __tablename__ = "stock_daily_bar"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), nullable=False)
+    trade_date = Column(Date, nullable=False)
+
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Float)
+
+    __table_args__ = (
+        Index('idx_bar_symbol_date', 'symbol', 'trade_date', unique=True),
+        Index('idx_bar_trade_date', 'trade_date'),
+    )
+
+
+class ScreeningSnapshotDaily(Base):
+    """
+    Model lưu ảnh chụp dữ liệu screening mỗi phiên (chỉ thêm, không ghi đè)
+
+    Mỗi ngày giao dịch một dòng cho mỗi mã active với toàn bộ chỉ số và factor tại thời
+    điểm đó; dùng cho screen theo ngày trong quá khứ (as_of) và lịch sử factor.
+    """
+    __tablename__ = "screening_snapshot_daily"
+
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot_date = Column(Date, nullable=False)
+    symbol = Column(String(10), nullable=False)
+    exchange = Column(String(10))
+    industry = Column(String(100))
+    sector = Column(String(100))
+
+    current_price = Column(Float)
+    price_change_30d = Column(Float)
+    volume = Column(Float)
+    pe = Column(Float)
+    pb = Column(Float)
+    roe = Column(Float)
+    eps = Column(Float)
+    market_cap = Column(Float)
+    rsi = Column(Float)
+    score = Column(Float)
+
+    sma_20 = Column(Float)
+    sma_50 = Column(Float)
+    sma_200 = Column(Float)
+    sma_50_distance = Column(Float)
+    sma_200_distance = Column(Float)
+    macd = Column(Float)
+    macd_signal = Column(Float)
+    macd_histogram = Column(Float)
+    macd_cross = Column(Integer)
+    atr_pct = Column(Float)
+    high_52w = Column(Float)
+    low_52w = Column(Float)
+    high_52w_distance = Column(Float)
+    low_52w_distance = Column(Float)
+    avg_value_20d = Column(Float)
+    revenue_growth = Column(Float)
+    net_income_growth = Column(Float)
+    eps_growth = Column(Float)
+    gross_margin = Column(Float)
+    de = Column(Float)
+
+    __table_args__ = (
+        # Screen theo ngày: quét một phân vùng ngày; lịch sử factor: quét theo mã
+        Index('idx_snapshot_date_symbol', 'snapshot_date', 'symbol', unique=True),
+        Index('idx_snapshot_symbol_date', 'symbol', 'snapshot_date'),
+    )
+
+
+class PatternOutcomeStat(Base):
+    """
+    Model thống kê kết quả sau mô hình nến: số lần xuất hiện và số lần giá tăng sau N phiên
+
+    symbol = 'ALL' là thống kê toàn thị trường (tổng hợp từ các mã)
+    """
+    __tablename__ = "pattern_outcome_stat"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), nullable=False)
+    pattern_name = Column(String(40), nullable=False)
+    horizon = Column(Integer, nullable=False)  # Số phiên sau mô hình: 1, 5, 20
+
+    occurrences = Column(Integer, default=0)  # Số lần mô hình có đủ N phiên phía sau
+    hits = Column(Integer, default=0)  # Số lần giá đóng cửa sau N phiên cao hơn
+    return_sum = Column(Float, default=0)  # Tổng lợi nhuận (%) sau N phiên
+
+    # Các mô hình đến ngày này đã được tính (refresh tăng dần từ sau ngày này)
+    evaluated_through = Column(Date)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_outcome_symbol_pattern_horizon', 'symbol', 'pattern_name', 'horizon', unique=True),
+    )
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            'occurrences': self.occurrences,
+            'hit_rate': round(self.hits / self.occurrences, 4) if self.occurrences else None,
+            'avg_return': round(self.return_sum / self.occurrences, 4) if self.occurrences else None,
+            'evaluated_through': self.evaluated_through.isoformat() if self.evaluated_through else None
+        }
+
+
+class FundamentalPeriodData(Base):
+    """
+    Model lưu chỉ số cơ bản theo từng kỳ báo cáo (chuỗi thời gian ROE, EPS TTM, tăng trưởng...)
+
+    period_type = 'year' (quarter = 0) hoặc 'quarter' (quarter = 1..4)
+    """
+    __tablename__ = "fundamental_period"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), nullable=False)
+    period_type = Column(String(10), nullable=False)
+    year = Column(Integer, nullable=False)
+    quarter = Column(Integer, nullable=False, default=0)
+
+    # Số liệu báo cáo
+    revenue = Column(Float)
+    net_income = Column(Float)
+    revenue_ttm = Column(Float)  # Tổng 4 quý gần nhất (báo cáo năm: giá trị năm)
+    net_income_ttm = Column(Float)
+    total_assets = Column(Float)
+    shareholders_equity = Column(Float)
+    total_debt = Column(Float)
+    operating_cash_flow = Column(Float)
+    fcf = Column(Float)
+
+    # Chỉ số
+    eps_ttm = Column(Float)
+    bvps = Column(Float)
+    sps = Column(Float)  # Doanh thu TTM trên mỗi cổ phiếu
+    roe = Column(Float)  # Theo kỳ (%)
+    roe_ttm = Column(Float)
+    roa_ttm = Column(Float)
+    de = Column(Float)
+    current_ratio = Column(Float)
+    gross_margin = Column(Float)
+    npm = Column(Float)
+
+    # Tăng trưởng so với cùng kỳ năm trước (%)
+    revenue_growth = Column(Float)
+    net_income_growth = Column(Float)
+    eps_growth = Column(Float)
+
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_fundamental_symbol_period', 'symbol', 'period_type', 'year', 'quarter', unique=True),
+    )
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        from ..utils.fundamental_indicators import HISTORY_METRICS
+
+        result = {
+            'year': self.year,
+            'quarter': self.quarter if self.period_type == 'quarter' else None,
+        }
+        for metric in HISTORY_METRICS:
+            result[metric] = getattr(self, metric)
+        return result
+
+
+class FundamentalRank(Base):
+    """
+    Model xếp hạng phần trăm (percentile) của từng chỉ số cơ bản trong ngành ICB và toàn thị trường
+
+    Percentile = tỷ lệ (%) số mã có giá trị nhỏ hơn hoặc bằng, trong cùng ngành / toàn thị trường
+    """
+    __tablename__ = "fundamental_rank"
+
+    id = Column(Integer, primary_key=True, index=True)
+    symbol = Column(String(10), nullable=False)
+    metric = Column(String(30), nullable=False)
+    value = Column(Float)
+    sector = Column(String(100))
+
+    sector_percentile = Column(Float)
+    sector_count = Column(Integer)
+    market_percentile = Column(Float)
+    market_count = Column(Integer)
+
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_rank_symbol_metric', 'symbol', 'metric', unique=True),
+        Index('idx_rank_metric_sector', 'metric', 'sector'),
+    )
+
+    def to_dict(self):
+        """Convert model to dictionary"""
+        return {
+            'value': self.value,
+            'sector': self.sector,
+            'sector_percentile': self.sector_percentile,
+            'sector_count': self.sector_count,
+            'market_percentile': self.market_percentile,
+            'market_count': self.market_count
+        }
+
+
 class ScreeningJobLog(Base):
     """Model để log các lần chạy background job"""
     __tablename__ = "screening_job_log"
@@ -79,6 +79,10 @@ async def shutdown_event():
     from .scheduler import stop_scheduler
     stop_scheduler()
 
+    # Stop analytics process pool
+    from .core.analytics_executor import get_analytics_executor
+    get_analytics_executor().shutdown()
+
     # Close database
     from .database import close_db
     close_db()
@@ -5,7 +5,10 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 import atexit
 
-from .stock_updater import run_daily_update, run_hourly_update
+from .stock_updater import (
+    run_daily_update, run_hourly_update, run_pattern_outcome_update, run_fundamental_history_update,
+    run_symbol_universe_update, run_history_backfill
+)
 
 # Create scheduler instance
 scheduler = BackgroundScheduler()
@@ -15,6 +18,24 @@ def init_scheduler():
     """Initialize and start the scheduler"""
 
     # Add jobs
+    # Symbol universe: Chạy lúc 6:30 sáng, trước daily update
+    scheduler.add_job(
+        func=run_symbol_universe_update,
+        trigger=CronTrigger(hour=6, minute=30),
+        id='symbol_universe_update',
+        name='Reload listed symbols from vnstock listing',
+        replace_existing=True
+    )
+
+    # History backfill: Chạy lúc 6:40 sáng, tải lịch sử nến ngày còn thiếu trước daily update
+    scheduler.add_job(
+        func=run_history_backfill,
+        trigger=CronTrigger(hour=6, minute=40),
+        id='history_backfill',
+        name='Backfill missing daily bar history',
+        replace_existing=True
+    )
+
     # Daily update: Chạy lúc 7:00 sáng mỗi ngày (sau giờ đóng cửa thị trường)
     scheduler.add_job(
         func=run_daily_update,
@@ -33,11 +54,33 @@ def init_scheduler():
         replace_existing=True
     )
 
+    # Pattern outcome stats: Chạy lúc 8:00 sáng, sau khi daily update đã lưu nến mới
+    scheduler.add_job(
+        func=run_pattern_outcome_update,
+        trigger=CronTrigger(hour=8, minute=0),
+        id='pattern_outcome_update',
+        name='Refresh candlestick pattern outcome stats',
+        replace_existing=True
+    )
+
+    # Fundamental history: Chạy lúc 9:00 sáng Chủ nhật (báo cáo tài chính chỉ đổi theo quý)
+    scheduler.add_job(
+        func=run_fundamental_history_update,
+        trigger=CronTrigger(day_of_week='sun', hour=9, minute=0),
+        id='fundamental_history_update',
+        name='Recompute per-period fundamental metrics',
+        replace_existing=True
+    )
+
     # Start scheduler
     scheduler.start()
     print("✓ Background scheduler started")
+    print("  - Symbol universe: 6:30 AM")
+    print("  - History backfill: 6:40 AM")
     print("  - Daily update: 7:00 AM")
     print("  - Hourly update: Every 2 hours (9:30, 11:30, 13:30)")
+    print("  - Pattern outcome stats: 8:00 AM")
+    print("  - Fundamental history: Sunday 9:00 AM")
 
     # Shut down scheduler when app exits
     atexit.register(lambda: scheduler.shutdown())
@@ -1,86 +1,221 @@
 """
 Background job để tự động cập nhật dữ liệu cổ phiếu
+
+Các mã được lấy song song bởi một thread pool (UPDATER_MAX_WORKERS worker). Mọi worker
+dùng chung ngân sách request tới upstream (core.rate_limiter), mỗi mã được thử lại với
+backoff có jitter, kết quả được ghi vào database theo batch từ luồng chính và tiến độ
+được cập nhật vào ScreeningJobLog sau mỗi batch.
+
+Lịch sử nến ngày (đủ 52 tuần cho các factor kỹ thuật) được tải một lần cho mỗi mã và bổ
+sung khi có phiên bị thiếu bởi backfill_history, cùng thread pool và ngân sách request.
+Báo cáo tài chính cho chỉ số cơ bản theo kỳ (refresh_fundamental_history) cũng vậy.
 """
+import os
+import random
 import time
-from datetime import datetime
-from typing import List
-from vnstock import Vnstock
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
 
 from ..database import get_db_session
 from ..services.stock_data_service import StockDataService
 from ..services.market_screener import MarketScreener
 
+UPDATER_MAX_WORKERS = int(os.getenv('UPDATER_MAX_WORKERS', '4'))
+UPDATER_MAX_RETRIES = int(os.getenv('UPDATER_MAX_RETRIES', '3'))
+
+# Backoff giữa các lần thử: RETRY_BACKOFF_SECONDS * 2^lần thử, nhân jitter 0.5-1.5
+RETRY_BACKOFF_SECONDS = 2.0
+
+# Số mã ghi vào database mỗi transaction (cũng là chu kỳ cập nhật tiến độ job log)
+UPDATER_BATCH_SIZE = 20
+
+# Số request của VNStockService.get_financial_statements cho một kỳ
+# (balance sheet, income statement, cash flow, ratio)
+FINANCIAL_STATEMENT_REQUESTS = 4
+
 
 class StockDataUpdater:
     """Background worker để update stock data"""
 
-    def __init__(self):
+    def __init__(self, max_workers: int = UPDATER_MAX_WORKERS, max_retries: int = UPDATER_MAX_RETRIES,
+                 batch_size: int = UPDATER_BATCH_SIZE):
+        """
+        Args:
+            max_workers: Số mã được lấy song song
+            max_retries: Số lần thử lại mỗi mã khi lỗi
+            batch_size: Số mã mỗi lần ghi database
+        """
         self.screener = MarketScreener()
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.batch_size = batch_size
 
-    def update_single_stock(self, symbol: str) -> bool:
+    def fetch_stock(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
-        Cập nhật dữ liệu cho 1 cổ phiếu
-        Return True nếu thành công, False nếu thất bại
+        Lấy dữ liệu screening (kèm nến ngày) của 1 mã, thử lại với backoff có jitter
+
+        Return None nếu vẫn thất bại sau max_retries lần thử lại
         """
-        try:
-            # Lấy dữ liệu từ API
-            stock_data = self.screener._get_stock_screening_data(symbol)
+        for attempt in range(self.max_retries + 1):
+            try:
+                stock_data = self.screener._get_stock_screening_data(symbol, include_price_bars=True)
+                if stock_data:
+                    return stock_data
+            except Exception as e:
+                print(f"✗ Error fetching {symbol} (attempt {attempt + 1}): {e}")
 
-            if not stock_data:
-                print(f"No data returned for {symbol}")
-                return False
+            if attempt < self.max_retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
 
-            # Lưu vào database
-            with get_db_session() as db:
-                StockDataService.upsert_stock_data(db, stock_data)
+        print(f"No data returned for {symbol}")
+        return None
 
-            print(f"✓ Updated {symbol}")
-            return True
+    @staticmethod
+    def _write_batch(db, batch: List[Dict[str, Any]]) -> int:
+        """Ghi một batch dữ liệu screening và nến ngày trong một transaction"""
+        for stock_data in batch:
+            price_bars = stock_data.pop('price_bars', None)
+            if price_bars:
+                StockDataService.upsert_daily_bars(db, stock_data['symbol'], price_bars, commit=False)
+        return StockDataService.bulk_upsert_stock_data(db, batch)
 
-        except SystemExit as e:
-            print(f"✗ Rate limit for {symbol}: {e}")
-            return False
-        except Exception as e:
-            print(f"✗ Error updating {symbol}: {e}")
-            return False
+    def update_symbols(self, db, job_id: int, symbols: List[str],
+                       max_workers: Optional[int] = None) -> Tuple[int, int, int]:
+        """
+        Cập nhật danh sách mã bằng thread pool, ghi database theo batch
+
+        Args:
+            db: Database session (chỉ dùng ở luồng gọi)
+            job_id: Job log được cập nhật tiến độ sau mỗi batch
+            symbols: Danh sách mã
+            max_workers: Số mã được lấy song song (mặc định: self.max_workers)
 
-    def update_stale_stocks(self, max_stocks: int = 50, delay_seconds: int = 3):
+        Returns:
+            Tuple (processed, updated, failed)
         """
-        Cập nhật các cổ phiếu có dữ liệu cũ
+        max_workers = max_workers or self.max_workers
+        processed = updated = failed = 0
+        batch: List[Dict[str, Any]] = []
+
+        def flush():
+            nonlocal updated, failed, batch
+            if batch:
+                try:
+                    updated += self._write_batch(db, batch)
+                except Exception as e:
+                    db.rollback()
+                    failed += len(batch)
+                    print(f"✗ Error writing batch: {e}")
+                batch = []
+            StockDataService.update_job_log(
+                db, job_id=job_id, status='running',
+                stocks_processed=processed, stocks_updated=updated, stocks_failed=failed
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.fetch_stock, symbol): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                processed += 1
+                stock_data = future.result()
+                if stock_data:
+                    batch.append(stock_data)
+                else:
+                    failed += 1
+
+                if processed % self.batch_size == 0:
+                    flush()
+                    print(f"Progress: {processed}/{len(symbols)} stocks")
+        flush()
+
+        return processed, updated, failed
+
+    def fetch_history(self, symbol: str, start_date: date) -> Optional[List[Dict[str, Any]]]:
         """
-        with get_db_session() as db:
-            # Tạo job log
-            job_log = StockDataService.create_job_log(db, job_type='update_stale')
+        Lấy nến ngày của 1 mã từ start_date, thử lại với backoff có jitter
 
+        Return None nếu vẫn thất bại sau max_retries lần thử lại
+        """
+        for attempt in range(self.max_retries + 1):
             try:
-                # Lấy danh sách cổ phiếu cần update
-                stale_stocks = StockDataService.get_stale_stocks(
-                    db, max_age_hours=24, limit=max_stocks
-                )
+                return self.screener.get_price_bars(symbol, start_date)
+            except SystemExit as e:
+                # Rate limit từ vnstock
+                print(f"✗ Rate limit fetching history for {symbol} (attempt {attempt + 1}): {e}")
+            except Exception as e:
+                print(f"✗ Error fetching history for {symbol} (attempt {attempt + 1}): {e}")
 
-                print(f"Found {len(stale_stocks)} stale stocks to update")
+            if attempt < self.max_retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return None
 
-                processed = 0
-                updated = 0
-                failed = 0
+    @staticmethod
+    def history_tasks(db, max_symbols: Optional[int] = None) -> List[Tuple[str, date]]:
+        """
+        Các mã cần tải nến ngày và ngày bắt đầu tải
 
-                for stock in stale_stocks:
-                    symbol = stock.symbol
+        - Mã chưa có đủ HISTORY_SESSIONS phiên: tải toàn bộ FACTOR_LOOKBACK_DAYS ngày
+        - Mã có nến mới nhất cũ hơn phiên mới nhất của thị trường: tải từ nến mới nhất đã lưu
 
-                    # Update stock
-                    success = self.update_single_stock(symbol)
+        Mã có ít nến nhất được xếp trước.
+        """
+        from ..services.screening_factors import FACTOR_LOOKBACK_DAYS, HISTORY_SESSIONS
+
+        coverage = StockDataService.get_daily_bar_coverage(db)
+        latest = StockDataService.get_latest_bar_date(db)
+        full_start = date.today() - timedelta(days=FACTOR_LOOKBACK_DAYS)
+
+        tasks = []
+        for stock in StockDataService.get_all_stocks(db):
+            count, last_date = coverage.get(stock.symbol, (0, None))
+            if count < HISTORY_SESSIONS:
+                tasks.append((count, stock.symbol, full_start))
+            elif last_date < latest:
+                tasks.append((count, stock.symbol, last_date))
+        tasks.sort()
+        return [(symbol, start) for _, symbol, start in tasks[:max_symbols]]
+
+    def backfill_history(self, max_symbols: Optional[int] = None,
+                         max_workers: Optional[int] = None) -> Tuple[int, int, int]:
+        """
+        Tải lịch sử nến ngày còn thiếu (lần đầu: toàn bộ, sau đó: các phiên bị thiếu)
 
-                    processed += 1
-                    if success:
-                        updated += 1
-                    else:
-                        failed += 1
+        Args:
+            max_symbols: Số mã tối đa mỗi lần chạy (mặc định: tất cả)
+            max_workers: Số mã được lấy song song (mặc định: self.max_workers)
 
-                    # Delay để tránh rate limit
-                    if processed < len(stale_stocks):
-                        time.sleep(delay_seconds)
+        Returns:
+            Tuple (processed, updated, failed)
+        """
+        max_workers = max_workers or self.max_workers
+        with get_db_session() as db:
+            job_log = StockDataService.create_job_log(db, job_type='history_backfill')
+            try:
+                tasks = self.history_tasks(db, max_symbols)
+                print(f"history_backfill: {len(tasks)} stocks, {max_workers} workers")
+
+                processed = updated = failed = 0
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {
+                        executor.submit(self.fetch_history, symbol, start): symbol for symbol, start in tasks
+                    }
+                    for future in as_completed(futures):
+                        processed += 1
+                        bars = future.result()
+                        if bars is None:
+                            failed += 1
+                        elif bars:
+                            StockDataService.upsert_daily_bars(db, futures[future], bars, commit=False)
+                            updated += 1
+
+                        if processed % self.batch_size == 0:
+                            db.commit()
+                            StockDataService.update_job_log(
+                                db, job_id=job_log.id, status='running',
+                                stocks_processed=processed, stocks_updated=updated, stocks_failed=failed
+                            )
+                db.commit()
 
-                # Update job log
                 StockDataService.update_job_log(
                     db,
                     job_id=job_log.id,
@@ -89,55 +224,140 @@ class StockDataUpdater:
                     stocks_updated=updated,
                     stocks_failed=failed
                 )
+                return processed, updated, failed
+
+            except Exception as e:
+                db.rollback()
+                StockDataService.update_job_log(db, job_id=job_log.id, status='failed', error_message=str(e))
+                print(f"history_backfill failed: {e}")
+                raise
 
-                print(f"Job completed: {processed} processed, {updated} updated, {failed} failed")
+    def fetch_financial_statements(self, symbol: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Lấy báo cáo tài chính mọi kỳ (năm/quý) của 1 mã, thử lại với backoff có jitter
+
+        Return None nếu vẫn thất bại sau max_retries lần thử lại
+        """
+        from ..core.rate_limiter import get_upstream_rate_limiter
+        from ..services.fundamental_history_service import PERIOD_TYPES
+        from ..services.vnstock_service import VNStockService
 
+        for attempt in range(self.max_retries + 1):
+            try:
+                service = VNStockService()
+                statements = {}
+                for period in PERIOD_TYPES:
+                    get_upstream_rate_limiter().acquire(FINANCIAL_STATEMENT_REQUESTS)
+                    statements[period] = service.get_financial_statements(symbol, period=period)
+                return statements
+            except SystemExit as e:
+                # Rate limit từ vnstock
+                print(f"✗ Rate limit fetching financial statements for {symbol} (attempt {attempt + 1}): {e}")
             except Exception as e:
-                # Update job log with error
+                print(f"✗ Error fetching financial statements for {symbol} (attempt {attempt + 1}): {e}")
+
+            if attempt < self.max_retries:
+                time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+        return None
+
+    def refresh_fundamental_history(self, max_workers: Optional[int] = None) -> Tuple[int, int, int]:
+        """
+        Tính lại chỉ số cơ bản theo kỳ (báo cáo quý/năm) cho các mã active
+
+        Báo cáo tài chính được lấy song song trong ngân sách request dùng chung,
+        chỉ số được tính và ghi database từ luồng chính.
+
+        Args:
+            max_workers: Số mã được lấy song song (mặc định: self.max_workers)
+
+        Returns:
+            Tuple (processed, updated, failed)
+        """
+        from ..services.fundamental_history_service import FundamentalHistoryService
+
+        max_workers = max_workers or self.max_workers
+        with get_db_session() as db:
+            job_log = StockDataService.create_job_log(db, job_type='fundamental_history')
+            try:
+                symbols = [stock.symbol for stock in StockDataService.get_all_stocks(db)]
+                print(f"fundamental_history: {len(symbols)} stocks, {max_workers} workers")
+
+                processed = updated = failed = 0
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    futures = {
+                        executor.submit(self.fetch_financial_statements, symbol): symbol for symbol in symbols
+                    }
+                    for future in as_completed(futures):
+                        symbol = futures[future]
+                        processed += 1
+                        statements = future.result()
+                        if statements is None:
+                            failed += 1
+                        else:
+                            try:
+                                for period, financial_statements in statements.items():
+                                    FundamentalHistoryService.refresh_symbol(
+                                        db, symbol, period, financial_statements=financial_statements
+                                    )
+                                updated += 1
+                            except Exception as e:
+                                db.rollback()
+                                failed += 1
+                                print(f"✗ Error updating fundamental history for {symbol}: {e}")
+
+                        if processed % self.batch_size == 0:
+                            StockDataService.update_job_log(
+                                db, job_id=job_log.id, status='running',
+                                stocks_processed=processed, stocks_updated=updated, stocks_failed=failed
+                            )
+
                 StockDataService.update_job_log(
                     db,
                     job_id=job_log.id,
-                    status='failed',
-                    error_message=str(e)
+                    status='completed',
+                    stocks_processed=processed,
+                    stocks_updated=updated,
+                    stocks_failed=failed
                 )
-                print(f"Job failed: {e}")
+                return processed, updated, failed
+
+            except Exception as e:
+                db.rollback()
+                StockDataService.update_job_log(db, job_id=job_log.id, status='failed', error_message=str(e))
+                print(f"fundamental_history failed: {e}")
                 raise
 
-    def scan_all_symbols(self, exchange: str = 'HOSE', delay_seconds: int = 3):
+    def update_single_stock(self, symbol: str) -> bool:
         """
-        Scan tất cả symbols từ một sàn
-        Dùng cho lần đầu tiên populate database
+        Cập nhật dữ liệu cho 1 cổ phiếu
+        Return True nếu thành công, False nếu thất bại
         """
-        with get_db_session() as db:
-            # Tạo job log
-            job_log = StockDataService.create_job_log(db, job_type='full_scan')
-
-            try:
-                # Lấy tất cả symbols
-                symbols = self.screener.get_all_symbols(exchange)
-                print(f"Found {len(symbols)} symbols on {exchange}")
+        stock_data = self.fetch_stock(symbol)
+        if not stock_data:
+            return False
 
-                processed = 0
-                updated = 0
-                failed = 0
+        try:
+            with get_db_session() as db:
+                self._write_batch(db, [stock_data])
+            print(f"✓ Updated {symbol}")
+            return True
+        except Exception as e:
+            print(f"✗ Error updating {symbol}: {e}")
+            return False
 
-                for symbol in symbols:
-                    # Update stock
-                    success = self.update_single_stock(symbol)
+    def _run_job(self, job_type: str, symbols_loader, max_workers: Optional[int] = None) -> Tuple[int, int, int]:
+        """Chạy cập nhật cho danh sách mã trong một job log"""
+        from ..services.screening_factors import ScreeningFactorService
 
-                    processed += 1
-                    if success:
-                        updated += 1
-                    else:
-                        failed += 1
+        with get_db_session() as db:
+            # Tạo job log
+            job_log = StockDataService.create_job_log(db, job_type=job_type)
 
-                    # Delay để tránh rate limit
-                    if processed < len(symbols):
-                        time.sleep(delay_seconds)
+            try:
+                symbols = symbols_loader(db)
+                print(f"{job_type}: {len(symbols)} stocks, {max_workers or self.max_workers} workers")
 
-                    # Log progress every 10 stocks
-                    if processed % 10 == 0:
-                        print(f"Progress: {processed}/{len(symbols)} stocks")
+                processed, updated, failed = self.update_symbols(db, job_log.id, symbols, max_workers)
 
                 # Update job log
                 StockDataService.update_job_log(
@@ -148,31 +368,185 @@ class StockDataUpdater:
                     stocks_updated=updated,
                     stocks_failed=failed
                 )
-
-                print(f"Full scan completed: {processed} processed, {updated} updated, {failed} failed")
+                # Điểm theo từng mã chỉ là tạm tính (thiếu factor và so sánh theo ngành):
+                # tính lại cho toàn thị trường trước khi dựng snapshot
+                ScreeningFactorService.rescore(db)
+                rebuild_screener_snapshot(db)
+                return processed, updated, failed
 
             except Exception as e:
                 # Update job log with error
+                db.rollback()
                 StockDataService.update_job_log(
                     db,
                     job_id=job_log.id,
                     status='failed',
                     error_message=str(e)
                 )
-                print(f"Full scan failed: {e}")
+                print(f"{job_type} failed: {e}")
                 raise
 
+    def update_stale_stocks(self, max_stocks: int = 50, max_age_hours: int = 24,
+                            max_workers: Optional[int] = None):
+        """
+        Cập nhật các cổ phiếu có dữ liệu cũ
+        """
+        processed, updated, failed = self._run_job(
+            'update_stale',
+            lambda db: [stock.symbol for stock in StockDataService.get_stale_stocks(
+                db, max_age_hours=max_age_hours, limit=max_stocks
+            )],
+            max_workers
+        )
+        print(f"Job completed: {processed} processed, {updated} updated, {failed} failed")
+
+    def update_missing_symbols(self, symbols: List[str], max_workers: Optional[int] = None):
+        """
+        Cập nhật theo từng mã các mã không có trong dữ liệu hàng loạt (MarketSnapshotIngestor)
+        """
+        if not symbols:
+            return
+        processed, updated, failed = self._run_job('update_missing', lambda db: symbols, max_workers)
+        print(f"Missing symbols update completed: {processed} processed, {updated} updated, {failed} failed")
+
+    def scan_all_symbols(self, exchange: str = 'HOSE', max_workers: Optional[int] = None):
+        """
+        Scan tất cả symbols từ một sàn
+        Dùng cho lần đầu tiên populate database
+        """
+        processed, updated, failed = self._run_job(
+            'full_scan',
+            lambda db: self.screener.get_all_symbols(exchange),
+            max_workers
+        )
+        print(f"Full scan completed: {processed} processed, {updated} updated, {failed} failed")
+
 
 # Global updater instance
 stock_updater = StockDataUpdater()
 
 
+def rebuild_screener_snapshot(db=None):
+    """Dựng lại snapshot screener trong bộ nhớ sau khi dữ liệu screening thay đổi"""
+    from ..services.screener_snapshot import get_screener_engine
+
+    try:
+        snapshot = get_screener_engine().rebuild(db)
+        print(f"[{datetime.now()}] Screener snapshot rebuilt: {len(snapshot)} stocks")
+    except Exception as e:
+        print(f"[{datetime.now()}] Screener snapshot rebuild failed: {e}")
+
+
+def run_market_snapshot_update() -> Optional[Dict[str, Any]]:
+    """
+    Cập nhật giá, nến phiên và chỉ số toàn thị trường bằng các request hàng loạt
+
+    Returns:
+        Kết quả của MarketSnapshotIngestor.ingest (None nếu thất bại)
+    """
+    from ..services.market_snapshot import MarketSnapshotIngestor
+
+    try:
+        with get_db_session() as db:
+            job_log = StockDataService.create_job_log(db, job_type='market_snapshot')
+            try:
+                result = MarketSnapshotIngestor().ingest(db)
+                StockDataService.update_job_log(
+                    db,
+                    job_id=job_log.id,
+                    status='completed',
+                    stocks_processed=result['symbols'],
+                    stocks_updated=result['updated'],
+                    stocks_failed=len(result['missing'])
+                )
+                rebuild_screener_snapshot(db)
+            except Exception as e:
+                db.rollback()
+                StockDataService.update_job_log(db, job_id=job_log.id, status='failed', error_message=str(e))
+                raise
+        print(f"[{datetime.now()}] Market snapshot {result['session_date']}: "
+              f"{result['updated']}/{result['symbols']} updated, {result['bars']} bars, "
+              f"{len(result['missing'])} left for per-symbol update")
+        return result
+    except Exception as e:
+        print(f"[{datetime.now()}] Market snapshot failed: {e}")
+        return None
+
+
+def run_history_backfill(max_symbols: Optional[int] = None):
+    """Tải lịch sử nến ngày còn thiếu (trước daily update để factor có đủ 52 tuần)"""
+    print(f"[{datetime.now()}] Running history backfill...")
+    try:
+        processed, updated, failed = stock_updater.backfill_history(max_symbols=max_symbols)
+        print(f"[{datetime.now()}] History backfill completed: {updated}/{processed} updated, {failed} failed")
+    except Exception as e:
+        print(f"[{datetime.now()}] History backfill failed: {e}")
+
+
+def run_screening_factor_update():
+    """Tính lại các factor kỹ thuật/cơ bản của bảng screening từ dữ liệu đã lưu"""
+    from ..services.screening_factors import ScreeningFactorService
+
+    try:
+        with get_db_session() as db:
+            job_log = StockDataService.create_job_log(db, job_type='screening_factors')
+            try:
+                result = ScreeningFactorService.refresh(db)
+                StockDataService.update_job_log(
+                    db,
+                    job_id=job_log.id,
+                    status='completed',
+                    stocks_processed=result['symbols'],
+                    stocks_updated=result['technical']
+                )
+                rebuild_screener_snapshot(db)
+            except Exception as e:
+                db.rollback()
+                StockDataService.update_job_log(db, job_id=job_log.id, status='failed', error_message=str(e))
+                raise
+        print(f"[{datetime.now()}] Screening factors refreshed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] Screening factor update failed: {e}")
+
+
+def run_screening_snapshot_update(session_date: Optional[date] = None):
+    """
+    Lưu ảnh chụp dữ liệu screening của phiên gần nhất (mỗi ngày giao dịch một lần)
+
+    Args:
+        session_date: Phiên của bảng giá vừa cập nhật (mặc định: phiên mới nhất có nến ngày)
+    """
+    from ..services.screening_history_service import ScreeningHistoryService
+
+    try:
+        with get_db_session() as db:
+            snapshot_date = session_date or ScreeningHistoryService.latest_trading_date(db)
+            previous = ScreeningHistoryService.latest_snapshot_date(db)
+            if previous is not None and snapshot_date <= previous:
+                # Ngày không tăng: dữ liệu giá không được cập nhật (hoặc job chạy lại trong ngày)
+                print(f"[{datetime.now()}] ⚠ Screening snapshot date {snapshot_date} does not advance "
+                      f"past {previous}; price data may be stale, snapshot skipped")
+                return
+            count = ScreeningHistoryService.write_snapshot(db, snapshot_date)
+        print(f"[{datetime.now()}] Screening snapshot {snapshot_date}: {count} stocks written")
+    except Exception as e:
+        print(f"[{datetime.now()}] Screening snapshot failed: {e}")
+
+
 def run_daily_update():
     """Job chạy hàng ngày để update dữ liệu"""
     print(f"[{datetime.now()}] Running daily stock update...")
     try:
-        stock_updater.update_stale_stocks(max_stocks=100, delay_seconds=2)
+        # Cập nhật hàng loạt trước; mã không có trong dữ liệu hàng loạt hoặc chưa có nến phiên
+        # mới được cập nhật theo từng mã
+        snapshot = run_market_snapshot_update()
+        if snapshot:
+            stock_updater.update_missing_symbols(snapshot['missing'][:100])
+        stock_updater.update_stale_stocks(max_stocks=100)
+        run_screening_factor_update()
+        run_screening_snapshot_update(snapshot['session_date'] if snapshot else None)
         print(f"[{datetime.now()}] Daily update completed")
+        run_fundamental_rank_update()
     except Exception as e:
         print(f"[{datetime.now()}] Daily update failed: {e}")
 
@@ -181,7 +555,75 @@ def run_hourly_update():
     """Job chạy hàng giờ để update một số cổ phiếu"""
     print(f"[{datetime.now()}] Running hourly stock update...")
     try:
-        stock_updater.update_stale_stocks(max_stocks=20, delay_seconds=3)
+        snapshot = run_market_snapshot_update()
+        if snapshot:
+            stock_updater.update_missing_symbols(snapshot['missing'][:20])
+        stock_updater.update_stale_stocks(max_stocks=20)
+        run_screening_factor_update()
         print(f"[{datetime.now()}] Hourly update completed")
+        run_fundamental_rank_update()
     except Exception as e:
         print(f"[{datetime.now()}] Hourly update failed: {e}")
+
+
+def run_pattern_outcome_update():
+    """Job chạy hàng ngày để cập nhật thống kê kết quả sau mô hình nến (sau daily update)"""
+    from ..services.pattern_outcome_service import PatternOutcomeService
+
+    print(f"[{datetime.now()}] Running pattern outcome update...")
+    try:
+        with get_db_session() as db:
+            job_log = StockDataService.create_job_log(db, job_type='pattern_outcomes')
+            try:
+                result = PatternOutcomeService.refresh(db)
+                StockDataService.update_job_log(
+                    db,
+                    job_id=job_log.id,
+                    status='completed',
+                    stocks_processed=result['symbols'],
+                    stocks_updated=result['symbols']
+                )
+            except Exception as e:
+                db.rollback()
+                StockDataService.update_job_log(db, job_id=job_log.id, status='failed', error_message=str(e))
+                raise
+        print(f"[{datetime.now()}] Pattern outcome update completed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] Pattern outcome update failed: {e}")
+
+
+def run_fundamental_history_update():
+    """Job chạy hàng tuần để tính lại chỉ số cơ bản theo kỳ (báo cáo quý/năm) cho các mã active"""
+    print(f"[{datetime.now()}] Running fundamental history update...")
+    try:
+        processed, updated, failed = stock_updater.refresh_fundamental_history()
+        print(f"[{datetime.now()}] Fundamental history update completed: {updated}/{processed} updated")
+        run_screening_factor_update()
+        run_fundamental_rank_update()
+    except Exception as e:
+        print(f"[{datetime.now()}] Fundamental history update failed: {e}")
+
+
+def run_fundamental_rank_update():
+    """Dựng lại bảng xếp hạng chỉ số cơ bản theo ngành (chạy sau mỗi job cập nhật dữ liệu)"""
+    from ..services.fundamental_rank_service import FundamentalRankService
+
+    try:
+        with get_db_session() as db:
+            result = FundamentalRankService.refresh(db)
+        print(f"[{datetime.now()}] Fundamental ranks refreshed: {result}")
+    except Exception as e:
+        print(f"[{datetime.now()}] Fundamental rank refresh failed: {e}")
+
+
+def run_symbol_universe_update():
+    """Job chạy hàng ngày để tải lại danh sách mã niêm yết (trước daily update)"""
+    from ..services.symbol_universe import get_symbol_universe
+
+    print(f"[{datetime.now()}] Running symbol universe update...")
+    try:
+        with get_db_session() as db:
+            count = get_symbol_universe().refresh(db)
+        print(f"[{datetime.now()}] Symbol universe update completed: {count} symbols")
+    except Exception as e:
+        print(f"[{datetime.now()}] Symbol universe update failed: {e}")
@@ -0,0 +1,129 @@
+"""
+Service lưu và truy vấn chuỗi chỉ số cơ bản theo kỳ báo cáo
+
+Mỗi lần refresh lấy báo cáo tài chính của một mã, tính mọi chỉ số cho mọi kỳ trong một
+lượt (FundamentalAnalyzer.calculate_historical_indicators) và ghi đè vào bảng
+fundamental_period. Truy vấn xu hướng chỉ đọc bảng, không tính lại.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..core.cache import get_cache
+from ..database.models import FundamentalPeriodData
+from ..utils.fundamental_indicators import FundamentalAnalyzer, HISTORY_METRICS
+from .vnstock_service import VNStockService
+
+PERIOD_TYPES = ('year', 'quarter')
+
+
+def validate_period(period: str) -> str:
+    """Kiểm tra loại kỳ báo cáo ('year' hoặc 'quarter')"""
+    if period not in PERIOD_TYPES:
+        raise ValueError(f"Invalid period: {period}. Must be one of {list(PERIOD_TYPES)}")
+    return period
+
+
+def validate_metrics(metrics: Optional[List[str]]) -> List[str]:
+    """Kiểm tra danh sách chỉ số (mặc định: tất cả HISTORY_METRICS)"""
+    if not metrics:
+        return list(HISTORY_METRICS)
+    invalid = [m for m in metrics if m not in HISTORY_METRICS]
+    if invalid:
+        raise ValueError(f"Invalid metrics: {invalid}. Must be in {HISTORY_METRICS}")
+    return metrics
+
+
+class FundamentalHistoryService:
+    """Tính, lưu và đọc chỉ số cơ bản theo kỳ"""
+
+    @staticmethod
+    def store(db: Session, symbol: str, period: str, history: pd.DataFrame) -> int:
+        """
+        Ghi đè toàn bộ các kỳ của một mã (báo cáo có thể được điều chỉnh hồi tố)
+
+        Args:
+            symbol: Mã cổ phiếu
+            period: 'year' hoặc 'quarter'
+            history: DataFrame từ calculate_historical_indicators
+
+        Returns:
+            Số kỳ đã ghi
+        """
+        symbol = symbol.upper()
+        now = datetime.utcnow()
+        values = history.astype(object).where(history.notna(), None)
+        rows = [
+            {**record, 'symbol': symbol, 'period_type': period, 'last_updated': now}
+            for record in values.to_dict('records')
+        ]
+
+        db.query(FundamentalPeriodData).filter(
+            FundamentalPeriodData.symbol == symbol,
+            FundamentalPeriodData.period_type == period
+        ).delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(FundamentalPeriodData, rows)
+        db.commit()
+
+        # Chỉ số trên mỗi cổ phiếu dùng cho định giá (ValuationService) đã đổi
+        get_cache().delete(f"per_share_{symbol}")
+        return len(rows)
+
+    @staticmethod
+    def refresh_symbol(db: Session, symbol: str, period: str = 'quarter',
+                       financial_statements: Optional[Dict[str, pd.DataFrame]] = None) -> int:
+        """
+        Lấy báo cáo tài chính, tính chỉ số mọi kỳ và lưu vào database
+
+        Args:
+            symbol: Mã cổ phiếu
+            period: 'year' hoặc 'quarter'
+            financial_statements: Báo cáo đã có sẵn (mặc định: lấy từ vnstock)
+
+        Returns:
+            Số kỳ đã ghi
+        """
+        if financial_statements is None:
+            financial_statements = VNStockService().get_financial_statements(symbol.upper(), period=period)
+
+        history = FundamentalAnalyzer(financial_statements).calculate_historical_indicators(period)
+        if history.empty:
+            return 0
+        return FundamentalHistoryService.store(db, symbol, period, history)
+
+    @staticmethod
+    def get_history(db: Session, symbol: str, period: str = 'quarter',
+                    metrics: Optional[List[str]] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Đọc chuỗi chỉ số theo kỳ đã lưu
+
+        Args:
+            symbol: Mã cổ phiếu
+            period: 'year' hoặc 'quarter'
+            metrics: Các chỉ số cần lấy (mặc định: tất cả)
+            limit: Chỉ lấy N kỳ gần nhất
+
+        Returns:
+            Danh sách kỳ, cũ nhất trước
+        """
+        metrics = validate_metrics(metrics)
+        query = db.query(FundamentalPeriodData).filter(
+            FundamentalPeriodData.symbol == symbol.upper(),
+            FundamentalPeriodData.period_type == period
+        ).order_by(FundamentalPeriodData.year.desc(), FundamentalPeriodData.quarter.desc())
+        if limit:
+            query = query.limit(limit)
+
+        records = []
+        for row in reversed(query.all()):
+            data = row.to_dict()
+            record = {'year': data['year'], 'quarter': data['quarter']}
+            for metric in metrics:
+                value = data[metric]
+                record[metric] = round(value, 4) if value is not None and np.isfinite(value) else None
+            records.append(record)
+        return records
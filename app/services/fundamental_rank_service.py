@@ -0,0 +1,123 @@
+"""
+Xếp hạng phần trăm (percentile) các chỉ số cơ bản theo ngành ICB và toàn thị trường
+
+Bảng xếp hạng được dựng lại sau mỗi lần scheduler cập nhật dữ liệu, từ dữ liệu đã lưu:
+- StockScreeningData: P/E, P/B, ROE, EPS, vốn hóa, biến động giá 30 ngày
+- FundamentalPeriodData: kỳ gần nhất của ROE TTM, biên lợi nhuận, D/E, tăng trưởng...
+
+Toàn bộ giá trị được xếp thành bảng dài (mã, chỉ số, ngành, giá trị) và xếp hạng bằng
+groupby().rank(pct=True) một lượt; API chỉ cần đọc các dòng của một mã.
+"""
+from datetime import datetime
+from typing import Any, Dict
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..database.models import StockScreeningData, FundamentalPeriodData, FundamentalRank
+
+# Chỉ số lấy từ StockScreeningData
+SCREENING_RANK_METRICS = ['pe', 'pb', 'roe', 'eps', 'market_cap', 'price_change_30d']
+
+# Chỉ số lấy từ kỳ gần nhất trong FundamentalPeriodData
+PERIOD_RANK_METRICS = ['roe_ttm', 'roa_ttm', 'eps_ttm', 'npm', 'gross_margin', 'de', 'current_ratio',
+                       'revenue_growth', 'net_income_growth', 'eps_growth']
+
+# Chỉ số định giá chỉ có nghĩa khi dương (P/E âm khi lỗ) nên không được xếp hạng
+POSITIVE_ONLY_METRICS = {'pe', 'pb'}
+
+UNKNOWN_SECTOR = 'Others'
+
+
+class FundamentalRankService:
+    """Dựng và truy vấn bảng xếp hạng chỉ số cơ bản"""
+
+    @staticmethod
+    def _load_values(db: Session) -> pd.DataFrame:
+        """Giá trị các chỉ số của mọi mã active dạng bảng dài (symbol, sector, metric, value)"""
+        screening = pd.DataFrame(
+            db.query(
+                StockScreeningData.symbol, StockScreeningData.industry, StockScreeningData.sector,
+                *(getattr(StockScreeningData, m) for m in SCREENING_RANK_METRICS)
+            ).filter(StockScreeningData.is_active == True).all(),
+            columns=['symbol', 'industry', 'sector'] + SCREENING_RANK_METRICS
+        )
+        if screening.empty:
+            return pd.DataFrame(columns=['symbol', 'sector', 'metric', 'value'])
+
+        # Ngành ICB cấp 3, thiếu thì dùng cấp 2
+        screening['sector'] = screening['industry'].fillna(screening['sector']).fillna(UNKNOWN_SECTOR)
+        screening = screening.drop(columns='industry')
+
+        # Kỳ gần nhất của từng mã, ưu tiên báo cáo quý ('quarter' < 'year')
+        periods = pd.DataFrame(
+            db.query(
+                FundamentalPeriodData.symbol, FundamentalPeriodData.period_type,
+                FundamentalPeriodData.year, FundamentalPeriodData.quarter,
+                *(getattr(FundamentalPeriodData, m) for m in PERIOD_RANK_METRICS)
+            ).all(),
+            columns=['symbol', 'period_type', 'year', 'quarter'] + PERIOD_RANK_METRICS
+        )
+        if not periods.empty:
+            periods = periods.sort_values(
+                ['symbol', 'period_type', 'year', 'quarter'], ascending=[True, True, False, False]
+            ).drop_duplicates('symbol')
+            screening = screening.merge(periods[['symbol'] + PERIOD_RANK_METRICS], on='symbol', how='left')
+
+        values = screening.melt(id_vars=['symbol', 'sector'], var_name='metric', value_name='value')
+        values['value'] = pd.to_numeric(values['value'], errors='coerce')
+        values = values[values['value'].notna()]
+        return values[~(values['metric'].isin(POSITIVE_ONLY_METRICS) & (values['value'] <= 0))]
+
+    @staticmethod
+    def build_ranks(values: pd.DataFrame) -> pd.DataFrame:
+        """
+        Xếp hạng percentile theo ngành và toàn thị trường cho mọi chỉ số trong một lượt
+
+        Args:
+            values: Bảng dài (symbol, sector, metric, value)
+
+        Returns:
+            values kèm các cột sector_percentile, sector_count, market_percentile, market_count
+        """
+        by_market = values.groupby('metric')['value']
+        by_sector = values.groupby(['metric', 'sector'])['value']
+        return values.assign(
+            market_percentile=(by_market.rank(pct=True, method='max') * 100).round(2),
+            market_count=by_market.transform('count'),
+            sector_percentile=(by_sector.rank(pct=True, method='max') * 100).round(2),
+            sector_count=by_sector.transform('count'),
+        )
+
+    @staticmethod
+    def refresh(db: Session) -> Dict[str, int]:
+        """
+        Dựng lại toàn bộ bảng xếp hạng từ dữ liệu đã lưu
+
+        Returns:
+            Dictionary {'symbols', 'rows'}
+        """
+        ranks = FundamentalRankService.build_ranks(FundamentalRankService._load_values(db))
+        now = datetime.utcnow()
+        rows = [
+            {**record, 'computed_at': now}
+            for record in ranks[['symbol', 'metric', 'value', 'sector', 'sector_percentile', 'sector_count',
+                                 'market_percentile', 'market_count']].to_dict('records')
+        ]
+
+        db.query(FundamentalRank).delete(synchronize_session=False)
+        if rows:
+            db.bulk_insert_mappings(FundamentalRank, rows)
+        db.commit()
+        return {'symbols': int(ranks['symbol'].nunique()), 'rows': len(rows)}
+
+    @staticmethod
+    def get_ranks(db: Session, symbol: str) -> Dict[str, Dict[str, Any]]:
+        """
+        Xếp hạng các chỉ số của một mã
+
+        Returns:
+            Dictionary {chỉ số: {'value', 'sector', 'sector_percentile', ...}}
+        """
+        rows = db.query(FundamentalRank).filter(FundamentalRank.symbol == symbol.upper()).all()
+        return {row.metric: row.to_dict() for row in rows}
@@ -0,0 +1,132 @@
+"""
+Nhận dạng mô hình nến trên nến intraday theo kiểu tăng dần (incremental)
+
+Mỗi (symbol, interval) giữ một state gồm thời điểm nến đã đóng gần nhất, vài nến đóng
+cuối cùng (đủ cho mô hình dài nhất) và các mô hình đã phát hiện. Mỗi lần poll chỉ các nến
+vừa đóng được đánh giá, nên chi phí là O(số nến mới) thay vì quét lại toàn bộ phiên.
+"""
+from collections import deque
+from threading import Lock
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.candlestick_patterns import PatternScanner, PATTERN_NAMES, MAX_PATTERN_SPAN
+
+# Số mô hình gần nhất được giữ lại cho mỗi (symbol, interval)
+MAX_EVENTS_PER_STREAM = 200
+
+
+class IntradayPatternTracker:
+    """Giữ state nhận dạng mô hình nến cho từng (symbol, interval)"""
+
+    def __init__(self, max_events: int = MAX_EVENTS_PER_STREAM):
+        """
+        Args:
+            max_events: Số mô hình gần nhất giữ lại cho mỗi stream
+        """
+        self.max_events = max_events
+        self._states: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = Lock()
+
+    def _get_state(self, symbol: str, interval: str) -> Dict[str, Any]:
+        key = (symbol.upper(), interval)
+        state = self._states.get(key)
+        if state is None:
+            state = {
+                'last_time': None,
+                # Các nến đóng cuối cùng làm ngữ cảnh cho mô hình nhiều nến
+                'context': deque(maxlen=MAX_PATTERN_SPAN - 1),
+                'events': deque(maxlen=self.max_events),
+            }
+            self._states[key] = state
+        return state
+
+    def update(self, symbol: str, interval: str, candles: List[Dict[str, Any]],
+               include_last: bool = False) -> Dict[str, Any]:
+        """
+        Cập nhật state với danh sách nến mới nhất và nhận dạng mô hình trên các nến vừa đóng
+
+        Args:
+            symbol: Mã cổ phiếu
+            interval: Khung thời gian (5m, 15m, 1h...)
+            candles: Nến intraday sắp xếp tăng dần theo thời gian
+                     (như IntradayService.get_intraday_candles)
+            include_last: Coi nến cuối cùng là đã đóng (mặc định nến cuối có thể đang hình thành)
+
+        Returns:
+            Dictionary {'new_patterns', 'patterns', 'last_closed', 'evaluated_candles'}
+        """
+        closed = candles if include_last else candles[:-1]
+
+        with self._lock:
+            state = self._get_state(symbol, interval)
+            last_time = state['last_time']
+            new = [c for c in closed if last_time is None or c['time'] > last_time]
+
+            new_events = self._evaluate(state['context'], new)
+            state['events'].extend(new_events)
+            state['context'].extend(new)
+            if new:
+                state['last_time'] = new[-1]['time']
+
+            return {
+                'new_patterns': new_events,
+                # Mới nhất trước, cùng nến theo thứ tự PATTERN_NAMES (sort ổn định)
+                'patterns': sorted(state['events'], key=lambda e: e['time'], reverse=True),
+                'last_closed': state['last_time'],
+                'evaluated_candles': len(new)
+            }
+
+    @staticmethod
+    def _evaluate(context: Deque[Dict[str, Any]], new: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Quét các nến mới cùng vài nến đóng trước đó, trả về mô hình kết thúc tại nến mới"""
+        if not new:
+            return []
+
+        window = list(context) + new
+        scanner = PatternScanner(*(np.array([c[field] for c in window], dtype=np.float64)
+                                   for field in ('open', 'high', 'low', 'close')))
+        events = scanner.scan()
+        events = events[events[:, 0] >= len(context)]
+
+        return [
+            {
+                'time': window[bar]['time'],
+                'close': float(window[bar]['close']),
+                'pattern_name': PATTERN_NAMES[pattern_id]
+            }
+            for bar, pattern_id in events.tolist()
+        ]
+
+    def reset(self, symbol: Optional[str] = None, interval: Optional[str] = None):
+        """Xóa state (tất cả, theo symbol hoặc theo (symbol, interval))"""
+        with self._lock:
+            if symbol is None:
+                self._states.clear()
+                return
+            for key in list(self._states.keys()):
+                if key[0] == symbol.upper() and (interval is None or key[1] == interval):
+                    del self._states[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Thống kê state"""
+        with self._lock:
+            return {
+                'streams': len(self._states),
+                'total_events': sum(len(s['events']) for s in self._states.values())
+            }
+
+
+# Global tracker instance
+_global_tracker = IntradayPatternTracker()
+
+
+def get_intraday_pattern_tracker() -> IntradayPatternTracker:
+    """
+    Lấy global intraday pattern tracker
+
+    Returns:
+        IntradayPatternTracker instance
+    """
+    return _global_tracker
@@ -5,6 +5,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from vnstock import Vnstock
+from ..utils.ohlcv import OHLCVFrame
 
 
 class IntradayService:
@@ -198,6 +199,39 @@ class IntradayService:
 
         return candles
 
+    def get_intraday_frame(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 5000
+    ) -> OHLCVFrame:
+        """
+        Get 1-minute base candles as an OHLCVFrame from a single tick fetch
+
+        Coarser intervals (5m, 15m, 1h...) can then be built locally with
+        OHLCVFrame.resample() without fetching the ticks again.
+
+        Args:
+            symbol: Stock symbol
+            start_date: Start date (YYYY-MM-DD) - optional
+            end_date: End date (YYYY-MM-DD) - optional
+            limit: Maximum number of ticks to fetch
+
+        Returns:
+            OHLCVFrame of 1-minute candles (empty if no ticks)
+        """
+        stock = self.stock_api.stock(symbol=symbol, source=self.source)
+        tick_data = stock.quote.intraday(symbol=symbol, page_size=limit, show_log=False)
+
+        candles = []
+        if tick_data is not None and len(tick_data) > 0:
+            if start_date or end_date:
+                tick_data = self._filter_by_date_range(tick_data, start_date, end_date)
+            candles = self._aggregate_ticks_to_candles(tick_data, '1m')
+
+        return OHLCVFrame.from_dataframe(pd.DataFrame(candles, columns=['time'] + list(OHLCVFrame.FIELDS)))
+
     def get_supported_intervals(self) -> List[str]:
         """Get list of supported time intervals"""
         return list(self.INTERVAL_MINUTES.keys())
@@ -2,15 +2,15 @@
 Market Screener Service
 Quét toàn bộ thị trường VN để tìm cơ hội đầu tư
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from vnstock import Vnstock
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import os
 import random
 
+from ..core.rate_limiter import get_upstream_rate_limiter
 from ..database import get_db_session
-from .stock_data_service import StockDataService
 
 
 class MarketScreener:
@@ -25,7 +25,16 @@ class MarketScreener:
         """
         Lấy danh sách tất cả mã cổ phiếu
         exchange: HOSE, HNX, UPCOM, ALL
+
+        Dùng danh sách niêm yết đầy đủ (SymbolUniverse); nếu chưa tải được thì dùng
+        danh sách các mã thanh khoản cao bên dưới.
         """
+        from .symbol_universe import get_symbol_universe
+
+        symbols = get_symbol_universe().get_symbols(exchange)
+        if symbols:
+            return symbols
+
         # Top liquid stocks (limit to reduce API calls and rate limit)
         HOSE_STOCKS = [
             # VN30 Blue chips - Most liquid stocks
@@ -57,10 +66,16 @@ class MarketScreener:
         self,
         filters: Dict[str, Any],
         exchange: str = "ALL",
-        limit: int = 50
+        limit: int = 50,
+        as_of: Optional[date] = None,
+        profile: Optional[str] = None,
+        after: Optional[Tuple[Optional[float], str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Quét cổ phiếu theo bộ lọc
+        Nếu có as_of, quét trên ảnh chụp dữ liệu screening của ngày đó (ScreeningHistoryService)
+        Nếu có profile, xếp hạng theo điểm của scoring profile đó (xem scoring_profiles)
+        Nếu có after (khóa (score, symbol) từ cursor), trả về trang kế tiếp sau khóa đó
         Nếu use_database=True, sẽ query từ database (nhanh, không rate limit)
         Nếu use_database=False, sẽ gọi API trực tiếp (chậm, có rate limit)
 
@@ -74,41 +89,65 @@ class MarketScreener:
             'price_change_max': 50,
             'volume_min': 100000,
             'rsi_min': 0,
-            'rsi_max': 30  # oversold
+            'rsi_max': 30,  # oversold
+            'expression': "pe < 15 AND (roe > 20 OR pb < 1)"  # xem screener_expression
         }
+
+        Raises:
+            ValueError: Biểu thức hoặc scoring profile không hợp lệ
         """
+        from .screener_expression import compile_expression
+        from .scoring_profiles import get_profile
+
+        expression = compile_expression(filters['expression']) if filters.get('expression') else None
+        if profile is not None:
+            get_profile(profile)
+
+        if as_of is not None:
+            from .screening_history_service import ScreeningHistoryService
+
+            with get_db_session() as db:
+                snapshot = ScreeningHistoryService.get_snapshot(db, as_of)
+            return snapshot.screen(filters, exchange if exchange != "ALL" else None, limit, expression, profile, after)
+
         # Use database for fast screening
         if self.use_database:
-            return self._screen_from_database(filters, exchange, limit)
+            return self._screen_from_database(filters, exchange, limit, expression, profile, after)
 
         # Fallback to API (slow, with rate limit)
-        return self._screen_from_api(filters, exchange, limit)
+        return self._screen_from_api(filters, exchange, limit, expression, profile, after)
 
     def _screen_from_database(
         self,
         filters: Dict[str, Any],
         exchange: str = "ALL",
-        limit: int = 50
+        limit: int = 50,
+        expression=None,
+        profile: Optional[str] = None,
+        after: Optional[Tuple[Optional[float], str]] = None
     ) -> List[Dict[str, Any]]:
-        """Screen stocks từ database - Nhanh, không rate limit"""
-        with get_db_session() as db:
-            stocks = StockDataService.screen_stocks(
-                db=db,
-                filters=filters,
-                exchange=exchange if exchange != "ALL" else None,
-                limit=limit
-            )
-
-            # Convert to dict
-            results = [stock.to_dict() for stock in stocks]
-            print(f"✓ Found {len(results)} stocks from database")
-            return results
+        """Screen stocks từ snapshot dữ liệu database trong bộ nhớ - Nhanh, không rate limit"""
+        from .screener_snapshot import get_screener_engine
+
+        results = get_screener_engine().screen(
+            filters,
+            exchange=exchange if exchange != "ALL" else None,
+            limit=limit,
+            expression=expression,
+            profile=profile,
+            after=after
+        )
+        print(f"✓ Found {len(results)} stocks from database")
+        return results
 
     def _screen_from_api(
         self,
         filters: Dict[str, Any],
         exchange: str = "ALL",
-        limit: int = 50
+        limit: int = 50,
+        expression=None,
+        profile: Optional[str] = None,
+        after: Optional[Tuple[Optional[float], str]] = None
     ) -> List[Dict[str, Any]]:
         """Screen stocks từ API - Chậm, có rate limit"""
         symbols = self.get_all_symbols(exchange)
@@ -120,12 +159,10 @@ class MarketScreener:
             try:
                 stock_data = self._get_stock_screening_data(symbol)
 
+                # Không dừng sớm: thứ hạng (score, symbol) và cursor trang sau cần toàn bộ mã khớp
                 if stock_data and self._matches_filters(stock_data, filters):
                     results.append(stock_data)
 
-                    if len(results) >= limit:
-                        break
-
             except SystemExit as e:
                 # Handle rate limit from vnstock - skip this stock and continue
                 print(f"Rate limit or system exit for {symbol}: {e}")
@@ -134,10 +171,11 @@ class MarketScreener:
                 print(f"Error screening {symbol}: {e}")
                 continue
 
-        # Sort by score (can customize scoring logic)
-        results.sort(key=lambda x: x.get('score', 0), reverse=True)
-
-        return results[:limit]
+        # Cùng đường xếp hạng với snapshot database: (score, symbol), biểu thức, profile, cursor
+        from .screener_snapshot import ScreenerSnapshot
+        return ScreenerSnapshot(results).screen(
+            {}, limit=limit, expression=expression, profile=profile, after=after
+        )
 
     def _get_mock_screening_data(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Generate mock data for screening (for demo purposes)"""
@@ -161,8 +199,23 @@ class MarketScreener:
 
         return mock_data
 
-    def _get_stock_screening_data(self, symbol: str) -> Optional[Dict[str, Any]]:
-        """Lấy dữ liệu cần thiết cho screening"""
+    @staticmethod
+    def _first_overview_value(overview: pd.DataFrame, keys: List[str]) -> Optional[str]:
+        """Giá trị đầu tiên có dữ liệu trong các cột của overview (None nếu không có)"""
+        for key in keys:
+            if key in overview.columns and pd.notna(overview[key].iloc[0]):
+                return str(overview[key].iloc[0])
+        return None
+
+    def _get_stock_screening_data(self, symbol: str, include_price_bars: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Lấy dữ liệu cần thiết cho screening
+
+        Args:
+            symbol: Mã cổ phiếu
+            include_price_bars: Kèm nến ngày vừa lấy (key 'price_bars') để lưu vào database,
+                                không phát sinh thêm request (bỏ qua khi dùng cache)
+        """
         # Use mock data if enabled
         if self.use_mock:
             return self._get_mock_screening_data(symbol)
@@ -175,8 +228,8 @@ class MarketScreener:
                 return cached_data
 
         try:
-            import time
-            time.sleep(2)  # Increase delay to 2 seconds to avoid rate limit
+            # 3 request (overview, ratio, history) trong ngân sách request dùng chung
+            get_upstream_rate_limiter().acquire(3)
             stock = Vnstock().stock(symbol=symbol, source='VCI')
 
             # Get company overview
@@ -247,12 +300,19 @@ class MarketScreener:
                 'rsi': float(rsi) if rsi else None,
                 'score': score,
                 'exchange': overview.get('exchange', 'N/A') if isinstance(overview, dict) else \
-                           overview['exchange'].iloc[0] if 'exchange' in overview.columns else 'N/A'
+                           overview['exchange'].iloc[0] if 'exchange' in overview.columns else 'N/A',
+                # Ngành ICB cấp 3 / cấp 2 (dùng cho xếp hạng theo ngành)
+                'industry': self._first_overview_value(overview, ['icb_name3', 'icbName3']),
+                'sector': self._first_overview_value(overview, ['icb_name2', 'icbName2'])
             }
 
             # Cache the result
             self.cache[cache_key] = (result, datetime.now())
 
+            if include_price_bars:
+                columns = ['time', 'open', 'high', 'low', 'close', 'volume']
+                return {**result, 'price_bars': price_data[columns].to_dict('records')}
+
             return result
 
         except SystemExit as e:
@@ -263,6 +323,28 @@ class MarketScreener:
             print(f"Error getting data for {symbol}: {e}")
             return None
 
+    def get_price_bars(self, symbol: str, start_date: date, end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Lấy nến ngày của một mã từ upstream (một request trong ngân sách request dùng chung)
+
+        Args:
+            symbol: Mã cổ phiếu
+            start_date: Ngày bắt đầu
+            end_date: Ngày kết thúc (mặc định: hôm nay)
+
+        Returns:
+            Danh sách dict có các key time, open, high, low, close, volume (rỗng nếu không có dữ liệu)
+        """
+        end_date = end_date or date.today()
+        get_upstream_rate_limiter().acquire(1)
+        history = Vnstock().stock(symbol=symbol, source='VCI').quote.history(
+            start=start_date.strftime('%Y-%m-%d'), end=end_date.strftime('%Y-%m-%d')
+        )
+        if history is None or history.empty:
+            return []
+        columns = ['time', 'open', 'high', 'low', 'close', 'volume']
+        return history[columns].to_dict('records')
+
     def _extract_ratio(self, ratios_df: pd.DataFrame, key: str) -> Optional[float]:
         """Extract ratio value from multi-level DataFrame"""
         try:
@@ -363,65 +445,15 @@ class MarketScreener:
 
     def _calculate_screening_score(self, data: Dict[str, Any]) -> float:
         """
-        Calculate screening score (0-100)
+        Calculate screening score (0-100) theo profile mặc định (scoring_profiles)
         Higher score = better opportunity
-        """
-        score = 50  # Base score
 
-        try:
-            # PE score: Lower is better (but not negative)
-            if data.get('pe') and data['pe'] > 0:
-                if data['pe'] < 10:
-                    score += 15
-                elif data['pe'] < 15:
-                    score += 10
-                elif data['pe'] < 20:
-                    score += 5
-                elif data['pe'] > 30:
-                    score -= 10
-
-            # PB score: Lower is better
-            if data.get('pb'):
-                if data['pb'] < 1:
-                    score += 10
-                elif data['pb'] < 2:
-                    score += 5
-                elif data['pb'] > 3:
-                    score -= 5
-
-            # ROE score: Higher is better
-            if data.get('roe'):
-                if data['roe'] > 20:
-                    score += 15
-                elif data['roe'] > 15:
-                    score += 10
-                elif data['roe'] > 10:
-                    score += 5
-                elif data['roe'] < 5:
-                    score -= 10
-
-            # Price momentum
-            if data.get('price_change'):
-                if 0 < data['price_change'] < 20:  # Positive but not too high
-                    score += 10
-                elif data['price_change'] > 50:  # Too hot
-                    score -= 5
-                elif data['price_change'] < -20:  # Falling too much
-                    score -= 10
-
-            # RSI score
-            if data.get('rsi'):
-                if 20 < data['rsi'] < 40:  # Oversold but not extreme
-                    score += 15
-                elif 40 < data['rsi'] < 60:  # Neutral
-                    score += 5
-                elif data['rsi'] > 70:  # Overbought
-                    score -= 10
-
-            return max(0, min(100, score))  # Clamp to 0-100
+        Điểm tạm tính cho một mã: factor so sánh theo ngành và các cột factor chỉ có khi
+        chấm cả thị trường (ScreeningFactorService.rescore, chạy sau mỗi job cập nhật).
+        """
+        from .scoring_profiles import score_records
 
-        except:
-            return 50
+        return float(score_records([data])[0])
 
     def get_preset_screens(self) -> Dict[str, Dict[str, Any]]:
         """
@@ -0,0 +1,284 @@
+"""
+Cập nhật dữ liệu screening cho toàn thị trường bằng các API lấy dữ liệu hàng loạt
+
+Thay vì 3 request (overview, ratio, lịch sử 30 ngày) và 2 giây chờ cho mỗi mã:
+- Giá và khối lượng: bảng giá (Trading.price_board) theo từng nhóm mã
+- P/E, P/B, ROE, EPS, vốn hóa, ngành: bộ lọc cổ phiếu của vnstock (Screener) cho cả sàn
+- Nến của phiên hiện tại: từ bảng giá (mở cửa, cao, thấp, khớp, khối lượng), ghi vào
+  StockDailyBar trước khi tính các chỉ số từ nến ngày
+- Biến động giá 30 ngày và RSI: tính từ nến ngày đã lưu (StockDailyBar), không gọi upstream
+
+Chỉ các mã được ghi nến phiên mới được đánh dấu vừa cập nhật (last_updated); mã khác vẫn
+được cập nhật theo từng mã (StockDataUpdater). Các mã không có trong dữ liệu hàng loạt
+được trả về trong 'missing' và được cập nhật theo từng mã ngay sau đó (run_daily_update).
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..database.models import StockScreeningData
+from .market_screener import MarketScreener
+from .stock_data_service import StockDataService
+from .symbol_universe import get_symbol_universe
+
+# Số mã mỗi request bảng giá
+PRICE_BOARD_CHUNK_SIZE = 200
+
+# Bảng giá trả giá theo đồng, lịch sử giá (và database) theo nghìn đồng
+PRICE_BOARD_PRICE_SCALE = 1000
+
+# Số mã tối đa lấy từ bộ lọc cổ phiếu (lớn hơn số mã niêm yết)
+SCREENER_LIMIT = 2000
+
+# Giờ mở cửa (giờ địa phương): trước giờ này bảng giá vẫn là phiên trước
+MARKET_OPEN_HOUR = 9
+
+# Tên cột có thể gặp trong kết quả upstream -> tên cột chuẩn
+PRICE_BOARD_COLUMNS = {
+    'symbol': ['symbol', 'ticker'],
+    'current_price': ['match_price', 'close_price', 'matchPrice'],
+    'volume': ['accumulated_volume', 'total_volume', 'accumulatedVolume'],
+    'open': ['open_price', 'open', 'openPrice'],
+    'high': ['highest', 'high_price', 'high', 'highest_price'],
+    'low': ['lowest', 'low_price', 'low', 'lowest_price'],
+}
+
+# Các cột giá của bảng giá (theo đồng, được đổi sang nghìn đồng)
+PRICE_BOARD_PRICE_COLUMNS = ('current_price', 'open', 'high', 'low')
+SCREENER_COLUMNS = {
+    'symbol': ['ticker', 'symbol'],
+    'pe': ['pe'],
+    'pb': ['pb'],
+    'roe': ['roe'],
+    'eps': ['eps'],
+    'market_cap': ['market_cap', 'marketCap'],
+    'industry': ['industry', 'industryName'],
+}
+
+
+def _select_columns(df: pd.DataFrame, mapping: Dict[str, List[str]]) -> pd.DataFrame:
+    """
+    Chọn và đổi tên các cột theo bảng ánh xạ (cột không có mang NaN)
+
+    Multi-level columns (bảng giá) được so khớp theo cấp cuối.
+    """
+    if isinstance(df.columns, pd.MultiIndex):
+        df = df.copy()
+        df.columns = [col[-1] for col in df.columns]
+        df = df.loc[:, ~df.columns.duplicated()]
+
+    result = pd.DataFrame(index=df.index)
+    for target, names in mapping.items():
+        source = next((name for name in names if name in df.columns), None)
+        result[target] = df[source] if source is not None else np.nan
+    return result
+
+
+def board_session_date(now: Optional[datetime] = None) -> date:
+    """Phiên giao dịch mà bảng giá đang hiển thị (trước giờ mở cửa hoặc cuối tuần: phiên trước)"""
+    now = now or datetime.now()
+    session = now.date()
+    if now.hour < MARKET_OPEN_HOUR:
+        session -= timedelta(days=1)
+    while session.weekday() >= 5:
+        session -= timedelta(days=1)
+    return session
+
+
+def price_features(bars: pd.DataFrame, rsi_period: int = 14, change_days: int = 30) -> pd.DataFrame:
+    """
+    Biến động giá (%) trong `change_days` ngày và RSI từ nến ngày đã lưu
+
+    Args:
+        bars: DataFrame dạng long (symbol, trade_date, close...) từ get_daily_bars_frame
+
+    Returns:
+        DataFrame index symbol, các cột price_change_30d, rsi
+    """
+    close = bars.pivot(index='trade_date', columns='symbol', values='close').sort_index()
+    last = close.ffill().iloc[-1]
+
+    # Giá tại phiên đầu tiên trong cửa sổ `change_days` ngày (như lịch sử 30 ngày trước đây)
+    window_start = close.index[-1] - timedelta(days=change_days)
+    first = close[close.index >= window_start].bfill().iloc[0]
+
+    delta = close.diff()
+    gain = delta.where(delta > 0, 0).rolling(window=rsi_period).mean().iloc[-1]
+    loss = (-delta.where(delta < 0, 0)).rolling(window=rsi_period).mean().iloc[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100 - 100 / (1 + gain / loss)
+
+    return pd.DataFrame({
+        'price_change_30d': (last - first) / first * 100,
+        'rsi': rsi,
+    }).replace([np.inf, -np.inf], np.nan)
+
+
+class MarketSnapshotIngestor:
+    """Cập nhật giá và chỉ số của toàn bộ mã bằng vài request hàng loạt"""
+
+    def __init__(self, chunk_size: int = PRICE_BOARD_CHUNK_SIZE):
+        """
+        Args:
+            chunk_size: Số mã mỗi request bảng giá
+        """
+        self.chunk_size = chunk_size
+        self.screener = MarketScreener()
+
+    def fetch_price_board(self, symbols: List[str]) -> pd.DataFrame:
+        """
+        Giá khớp và khối lượng của danh sách mã từ bảng giá
+
+        Returns:
+            DataFrame index symbol, các cột current_price, volume, open, high, low
+        """
+        from vnstock import Trading
+
+        trading = Trading(source='VCI')
+        frames = []
+        for start in range(0, len(symbols), self.chunk_size):
+            chunk = symbols[start:start + self.chunk_size]
+            try:
+                board = trading.price_board(chunk)
+                if board is not None and not board.empty:
+                    frames.append(_select_columns(board, PRICE_BOARD_COLUMNS))
+            except Exception as e:
+                print(f"Error getting price board for {chunk[0]}..{chunk[-1]}: {e}")
+
+        if not frames:
+            return pd.DataFrame(columns=list(PRICE_BOARD_COLUMNS)[1:])
+        board = pd.concat(frames, ignore_index=True).dropna(subset=['symbol'])
+        board['symbol'] = board['symbol'].astype(str).str.upper()
+        for column in PRICE_BOARD_PRICE_COLUMNS:
+            board[column] = pd.to_numeric(board[column], errors='coerce') / PRICE_BOARD_PRICE_SCALE
+        board['volume'] = pd.to_numeric(board['volume'], errors='coerce')
+        return board.drop_duplicates('symbol').set_index('symbol')
+
+    @staticmethod
+    def fetch_ratios(exchange: str = 'ALL') -> pd.DataFrame:
+        """
+        P/E, P/B, ROE, EPS, vốn hóa, ngành của cả sàn từ bộ lọc cổ phiếu
+
+        Returns:
+            DataFrame index symbol
+        """
+        from vnstock import Screener
+
+        exchanges = 'HOSE,HNX,UPCOM' if exchange.upper() == 'ALL' else exchange.upper()
+        try:
+            ratios = Screener().stock(params={'exchangeName': exchanges}, limit=SCREENER_LIMIT)
+        except Exception as e:
+            print(f"Error getting screener ratios: {e}")
+            return pd.DataFrame(columns=list(SCREENER_COLUMNS)[1:])
+
+        if ratios is None or ratios.empty:
+            return pd.DataFrame(columns=list(SCREENER_COLUMNS)[1:])
+        ratios = _select_columns(ratios, SCREENER_COLUMNS).dropna(subset=['symbol'])
+        ratios['symbol'] = ratios['symbol'].astype(str).str.upper()
+        return ratios.drop_duplicates('symbol').set_index('symbol')
+
+    @staticmethod
+    def store_session_bars(db: Session, board: pd.DataFrame, session_date: date) -> List[str]:
+        """
+        Ghi nến phiên `session_date` từ bảng giá (chưa commit)
+
+        Bỏ qua mã thiếu giá mở cửa/cao/thấp/khớp, không có khối lượng, hoặc có giá khớp và
+        khối lượng trùng nến trước đó (bảng giá còn hiển thị phiên cũ, ví dụ ngày nghỉ lễ).
+
+        Returns:
+            Danh sách mã đã ghi nến
+        """
+        fields = ['open', 'high', 'low', 'current_price', 'volume']
+        board = board.reindex(columns=fields).dropna()
+        board = board[board['volume'] > 0]
+        previous = StockDataService.get_previous_bars(db, session_date)
+
+        bars = {}
+        for symbol, row in board.iterrows():
+            if previous.get(symbol) == (row['current_price'], row['volume']):
+                continue
+            bars[symbol] = {'open': row['open'], 'high': row['high'], 'low': row['low'],
+                            'close': row['current_price'], 'volume': row['volume']}
+        StockDataService.upsert_session_bars(db, session_date, bars, commit=False)
+        return list(bars)
+
+    def ingest(self, db: Session, exchange: str = 'ALL',
+               symbols: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Cập nhật dữ liệu screening của toàn sàn
+
+        Args:
+            exchange: HOSE, HNX, UPCOM hoặc ALL
+            symbols: Danh sách mã (mặc định: toàn bộ mã niêm yết của sàn)
+
+        Returns:
+            Dictionary {'symbols', 'updated', 'price_board', 'ratios', 'bars', 'session_date', 'missing'}
+        """
+        symbols = [s.upper() for s in (symbols or self.screener.get_all_symbols(exchange))]
+        board = self.fetch_price_board(symbols)
+        ratios = self.fetch_ratios(exchange)
+
+        # Nến phiên hiện tại được ghi trước để biến động giá/RSI tính cả phiên này
+        session_date = board_session_date()
+        refreshed = set(self.store_session_bars(db, board, session_date))
+
+        # Giá trị đang lưu làm nền: trường không có trong dữ liệu hàng loạt được giữ nguyên
+        existing = pd.DataFrame(
+            [stock.to_dict() for stock in db.query(StockScreeningData).filter(
+                StockScreeningData.symbol.in_(symbols)
+            ).all()],
+            columns=['symbol', 'exchange', 'industry', 'current_price', 'volume',
+                     'pe', 'pb', 'roe', 'eps', 'market_cap', 'price_change_30d', 'rsi']
+        ).set_index('symbol')
+
+        bars = StockDataService.get_daily_bars_frame(db, date.today() - timedelta(days=60))
+        bars = bars[bars['symbol'].isin(symbols)]
+        features = price_features(bars) if not bars.empty else pd.DataFrame()
+
+        board = board[['current_price', 'volume']]
+        combined = board.combine_first(ratios).combine_first(features).combine_first(existing)
+        combined = combined.reindex(symbols)
+        covered = combined.index.isin(board.index) | combined.index.isin(ratios.index)
+
+        universe = get_symbol_universe()
+        rows = []
+        for symbol, row in combined[covered].iterrows():
+            data = {key: (float(value) if not isinstance(value, str) else value)
+                    for key, value in row.items() if pd.notna(value)}
+            # Sàn và ngành ICB theo danh sách niêm yết (thống nhất với xếp hạng theo ngành)
+            info = universe.get_info(symbol) or {}
+            for key in ('exchange', 'industry', 'sector'):
+                if info.get(key):
+                    data[key] = info[key]
+            data['symbol'] = symbol
+            if symbol not in refreshed and symbol not in existing.index:
+                # Mã mới chưa có nến: để trống last_updated để được cập nhật theo từng mã
+                data['last_updated'] = None
+            rows.append(data)
+
+        # Chỉ mã vừa có nến phiên mới được coi là đã cập nhật từ upstream
+        updated = StockDataService.bulk_upsert_stock_data(
+            db, [data for data in rows if data['symbol'] in refreshed], commit=False
+        )
+        updated += StockDataService.bulk_upsert_stock_data(
+            db, [data for data in rows if data['symbol'] not in refreshed], commit=False, touch_last_updated=False
+        )
+        db.commit()
+
+        # Điểm được tính lại từ dữ liệu đã lưu (kèm các cột factor kỹ thuật/cơ bản
+        # mà dữ liệu hàng loạt không có), cùng một lượt cho mọi mã
+        from .screening_factors import ScreeningFactorService
+        ScreeningFactorService.rescore(db)
+
+        return {
+            'symbols': len(symbols),
+            'updated': updated,
+            'price_board': int(combined.index.isin(board.index).sum()),
+            'ratios': int(combined.index.isin(ratios.index).sum()),
+            'bars': len(refreshed),
+            'session_date': session_date,
+            'missing': combined.index[~covered].tolist()
+        }
@@ -0,0 +1,195 @@
+"""
+Thống kê kết quả sau mô hình nến (backtest đơn giản)
+
+Với mỗi mô hình, đếm số lần giá đóng cửa sau 1/5/20 phiên cao hơn giá đóng cửa tại nến
+hoàn thành mô hình, theo từng mã và toàn thị trường.
+
+Cách tính:
+- Nến ngày đã lưu (StockDailyBar) của mỗi mã được quét trên chuỗi phiên của chính mã đó
+  qua AnalyticsExecutor (ngày tạm ngừng giao dịch không được tính là phiên)
+- Lợi nhuận tương lai cho mỗi horizon được tính bằng phép dịch mảng trên cùng chuỗi phiên,
+  sau đó ghép với các sự kiện (bar, mô hình) bằng fancy indexing
+- Lịch sử nến đủ cho horizon 20 phiên có sẵn nhờ StockDataUpdater.backfill_history
+- Kết quả được cộng dồn vào bảng PatternOutcomeStat; mỗi (mã, horizon) có mốc
+  evaluated_through nên lần refresh sau chỉ xử lý các sự kiện mới
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.analytics_executor import get_analytics_executor
+from ..database.models import PatternOutcomeStat
+from ..utils.candlestick_patterns import PATTERN_NAMES
+from ..utils.ohlcv import OHLCVFrame
+from .stock_data_service import StockDataService
+
+# Số phiên sau mô hình dùng để đánh giá kết quả
+OUTCOME_HORIZONS = (1, 5, 20)
+
+# Symbol của dòng thống kê toàn thị trường
+MARKET_SYMBOL = 'ALL'
+
+
+def forward_returns(close: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Ma trận lợi nhuận (%) sau `horizon` phiên theo trục cuối
+
+    Các phiên chưa đủ `horizon` phiên phía sau mang NaN.
+    """
+    result = np.full(close.shape, np.nan)
+    if close.shape[-1] > horizon:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[..., :-horizon] = (close[..., horizon:] / close[..., :-horizon] - 1) * 100
+    return result
+
+
+class PatternOutcomeService:
+    """Tính và truy vấn thống kê kết quả sau mô hình nến"""
+
+    @staticmethod
+    def _load_watermarks(db: Session) -> Dict[Tuple[str, int], date]:
+        """Mốc evaluated_through của từng (mã, horizon)"""
+        rows = db.query(
+            PatternOutcomeStat.symbol, PatternOutcomeStat.horizon,
+            func.min(PatternOutcomeStat.evaluated_through)
+        ).filter(
+            PatternOutcomeStat.symbol != MARKET_SYMBOL
+        ).group_by(PatternOutcomeStat.symbol, PatternOutcomeStat.horizon).all()
+        return {(symbol, horizon): through for symbol, horizon, through in rows}
+
+    @staticmethod
+    def refresh(db: Session) -> Dict[str, Any]:
+        """
+        Cập nhật tăng dần thống kê kết quả sau mô hình từ nến ngày đã lưu
+
+        Returns:
+            Dictionary {'symbols', 'events_added', 'evaluated_through'}
+        """
+        watermarks = PatternOutcomeService._load_watermarks(db)
+        known_symbols = {symbol for symbol, _ in watermarks}
+
+        # Chỉ tải lại từ mốc sớm nhất (cộng vài phiên làm ngữ cảnh); mã mới cần toàn bộ lịch sử
+        active_symbols = {s.symbol for s in StockDataService.get_all_stocks(db)}
+        if watermarks and active_symbols <= known_symbols:
+            start = min(watermarks.values()) - timedelta(days=10)
+        else:
+            start = date.min
+        bars = StockDataService.get_daily_bars_frame(db, start)
+        if bars.empty:
+            return {'symbols': 0, 'events_added': 0, 'evaluated_through': None}
+
+        # Mỗi mã quét trên các phiên của chính nó (cùng cách với /patterns/scan)
+        frames = OHLCVFrame.from_daily_bars(bars)
+        found = get_analytics_executor().run('pattern_events', frames)
+        symbols = list(frames)
+        session_dates = {
+            symbol: frame.dates.view('datetime64[ns]').astype('datetime64[D]') for symbol, frame in frames.items()
+        }
+
+        existing = {
+            (stat.symbol, stat.pattern_name, stat.horizon): stat
+            for stat in db.query(PatternOutcomeStat).filter(
+                PatternOutcomeStat.symbol.in_(symbols)
+            ).all()
+        }
+
+        events_added = 0
+        for horizon in OUTCOME_HORIZONS:
+            for symbol in symbols:
+                # Nến cuối cùng có đủ `horizon` phiên của mã phía sau
+                dates = session_dates[symbol]
+                if len(dates) <= horizon:
+                    continue
+                through = dates[-1 - horizon].astype(date)
+                old = watermarks.get((symbol, horizon))
+                if old is not None and through <= old:
+                    continue
+
+                events = np.array(found.get(symbol, []), dtype=np.int64).reshape(-1, 2)
+                bar_idx, pattern_ids = events[:, 0], events[:, 1]
+                returns = forward_returns(frames[symbol].close, horizon)[bar_idx]
+                valid = ~np.isnan(returns) & (dates[bar_idx] > np.datetime64(old or date.min, 'D'))
+
+                counts = np.bincount(pattern_ids[valid], minlength=len(PATTERN_NAMES))
+                hits = np.bincount(pattern_ids[valid & (returns > 0)], minlength=len(PATTERN_NAMES))
+                ret_sums = np.bincount(pattern_ids[valid], weights=returns[valid], minlength=len(PATTERN_NAMES))
+                events_added += int(valid.sum())
+
+                for pattern_id, pattern_name in enumerate(PATTERN_NAMES):
+                    key = (symbol, pattern_name, horizon)
+                    stat = existing.get(key)
+                    if stat is None:
+                        stat = PatternOutcomeStat(symbol=symbol, pattern_name=pattern_name, horizon=horizon,
+                                                  occurrences=0, hits=0, return_sum=0.0)
+                        db.add(stat)
+                        existing[key] = stat
+                    stat.occurrences += int(counts[pattern_id])
+                    stat.hits += int(hits[pattern_id])
+                    stat.return_sum += float(ret_sums[pattern_id])
+                    stat.evaluated_through = through
+                    stat.last_updated = datetime.utcnow()
+
+        db.flush()
+        PatternOutcomeService._refresh_market_rows(db)
+        db.commit()
+
+        return {
+            'symbols': len(symbols),
+            'events_added': events_added,
+            'evaluated_through': max(bars['trade_date']).isoformat()
+        }
+
+    @staticmethod
+    def _refresh_market_rows(db: Session):
+        """Tổng hợp lại các dòng toàn thị trường (symbol = 'ALL') từ thống kê theo mã"""
+        totals = db.query(
+            PatternOutcomeStat.pattern_name, PatternOutcomeStat.horizon,
+            func.sum(PatternOutcomeStat.occurrences), func.sum(PatternOutcomeStat.hits),
+            func.sum(PatternOutcomeStat.return_sum), func.max(PatternOutcomeStat.evaluated_through)
+        ).filter(
+            PatternOutcomeStat.symbol != MARKET_SYMBOL
+        ).group_by(PatternOutcomeStat.pattern_name, PatternOutcomeStat.horizon).all()
+
+        market = {
+            (stat.pattern_name, stat.horizon): stat
+            for stat in db.query(PatternOutcomeStat).filter(PatternOutcomeStat.symbol == MARKET_SYMBOL).all()
+        }
+        for pattern_name, horizon, occurrences, hits, return_sum, through in totals:
+            stat = market.get((pattern_name, horizon))
+            if stat is None:
+                stat = PatternOutcomeStat(symbol=MARKET_SYMBOL, pattern_name=pattern_name, horizon=horizon)
+                db.add(stat)
+            stat.occurrences = int(occurrences or 0)
+            stat.hits = int(hits or 0)
+            stat.return_sum = float(return_sum or 0)
+            stat.evaluated_through = through
+            stat.last_updated = datetime.utcnow()
+
+    @staticmethod
+    def get_stats(db: Session, symbol: str,
+                  patterns: Optional[List[str]] = None) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Lấy tỷ lệ thắng của các mô hình cho một mã và toàn thị trường
+
+        Args:
+            symbol: Mã cổ phiếu
+            patterns: Chỉ lấy các mô hình này (mặc định: tất cả)
+
+        Returns:
+            Dictionary {mô hình: {'symbol': {horizon: ...}, 'market': {horizon: ...}}}
+        """
+        query = db.query(PatternOutcomeStat).filter(
+            PatternOutcomeStat.symbol.in_([symbol.upper(), MARKET_SYMBOL])
+        )
+        if patterns is not None:
+            query = query.filter(PatternOutcomeStat.pattern_name.in_(patterns))
+
+        result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for stat in query.all():
+            scope = 'market' if stat.symbol == MARKET_SYMBOL else 'symbol'
+            entry = result.setdefault(stat.pattern_name, {'symbol': {}, 'market': {}})
+            entry[scope][str(stat.horizon)] = stat.to_dict()
+        return result
@@ -0,0 +1,111 @@
+"""
+Service quét mô hình nến Nhật cho toàn thị trường
+
+Dùng nến ngày đã lưu trong database (StockDailyBar, được cập nhật bởi scheduler) cho
+mọi mã đang active trong StockScreeningData, không gọi upstream. Mỗi mã được quét
+trên chuỗi phiên của chính nó qua AnalyticsExecutor (process pool nếu được bật).
+"""
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from ..core.analytics_executor import get_analytics_executor
+from ..core.cache import get_cache
+from ..database import get_db_session
+from ..utils.candlestick_patterns import PATTERN_NAMES, MAX_PATTERN_SPAN, validate_patterns
+from ..utils.ohlcv import OHLCVFrame
+from .stock_data_service import StockDataService
+
+# Kết quả quét được cache theo ngày giao dịch mới nhất (key đổi khi có nến mới)
+PATTERN_SCAN_CACHE_TTL = 24 * 3600
+
+
+class PatternScanService:
+    """Quét mô hình nến trên nến ngày của toàn bộ mã active"""
+
+    def __init__(self):
+        self.cache = get_cache()
+
+    def scan(
+        self,
+        patterns: Optional[List[str]] = None,
+        exchange: Optional[str] = None,
+        days: int = 1,
+        as_of: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """
+        Tìm các mã xuất hiện mô hình nến trong N phiên gần nhất
+
+        Args:
+            patterns: Các mô hình cần tìm (mặc định: tất cả)
+            exchange: Lọc theo sàn (HOSE, HNX, UPCOM)
+            days: Số phiên gần nhất cần xét (1 = chỉ phiên mới nhất)
+            as_of: Ngày giao dịch cuối (mặc định: ngày mới nhất trong database)
+
+        Returns:
+            Dictionary {'as_of', 'dates', 'symbols_scanned', 'patterns': {tên: [...]}, 'total'}
+        """
+        names = validate_patterns(patterns)
+
+        with get_db_session() as db:
+            latest = as_of or StockDataService.get_latest_bar_date(db)
+            if latest is None:
+                return self._empty_result(None, names)
+
+            cache_key = f"pattern_scan_{latest}_{exchange}_{','.join(names)}_{days}"
+            cached = self.cache.get(cache_key)
+            if cached:
+                return {**cached, 'cached': True}
+
+            # Khoảng ngày lịch ước lượng từ số phiên cần thiết (5 phiên/tuần + dự phòng nghỉ lễ)
+            sessions = days + MAX_PATTERN_SPAN - 1
+            start = latest - timedelta(days=sessions * 7 // 5 + 10)
+            bars = StockDataService.get_daily_bars_frame(db, start, latest, exchange)
+
+        if bars.empty:
+            return self._empty_result(latest, names)
+
+        trade_dates = sorted(bars['trade_date'].unique())[-days:]
+        since = pd.Timestamp(trade_dates[0]).value
+
+        # Mỗi mã quét trên các phiên của chính nó (phiên tạm ngừng không chặn mô hình nhiều nến);
+        # chỉ cần MAX_PATTERN_SPAN - 1 phiên trước cửa sổ N phiên
+        frames = {symbol: frame.tail(sessions) for symbol, frame in OHLCVFrame.from_daily_bars(bars).items()}
+        found = get_analytics_executor().run('pattern_events', frames, patterns=names, since=since)
+
+        events = [
+            (frames[symbol].dates[bar], symbol, pattern_id, float(frames[symbol].close[bar]))
+            for symbol, symbol_events in found.items()
+            for bar, pattern_id in symbol_events
+        ]
+        # Phiên mới nhất trước, cùng phiên theo mã
+        events.sort(key=lambda event: (-event[0], event[1]))
+
+        result = self._empty_result(latest, names)
+        for day, symbol, pattern_id, close in events:
+            result['patterns'][PATTERN_NAMES[pattern_id]].append({
+                'symbol': symbol,
+                'date': pd.Timestamp(day).date().isoformat(),
+                'close': close
+            })
+
+        result.update({
+            'dates': [d.isoformat() for d in trade_dates],
+            'symbols_scanned': len(frames),
+            'total': len(events)
+        })
+
+        self.cache.set(cache_key, result, ttl=PATTERN_SCAN_CACHE_TTL)
+        return {**result, 'cached': False}
+
+    @staticmethod
+    def _empty_result(latest: Optional[date], names: List[str]) -> Dict[str, Any]:
+        """Kết quả rỗng với đủ các key"""
+        return {
+            'as_of': latest.isoformat() if latest else None,
+            'dates': [],
+            'symbols_scanned': 0,
+            'patterns': {name: [] for name in names},
+            'total': 0
+        }
@@ -0,0 +1,220 @@
+"""
+Mô hình chấm điểm screening dạng khai báo, tính vector hóa cho toàn thị trường
+
+Một profile gồm điểm gốc, khoảng giới hạn và danh sách factor; mỗi factor cộng
+weight * điểm thành phần vào tổng:
+- 'steps': bảng điều kiện xét theo thứ tự, điều kiện đầu tiên đúng cho điểm (như if/elif)
+- 'linear': nội suy tuyến tính từng đoạn qua các điểm (x, điểm), ngoài khoảng giữ điểm đầu/cuối
+- 'sector_zscore': z-score của trường trong cùng ngành (cắt ở ±ZSCORE_CLIP), nhân weight
+
+Giá trị thiếu (NaN) cho điểm 0 (profile có 'zero_is_missing' coi cả giá trị 0 là thiếu,
+như bảng điểm cũ). Điểm của toàn bộ mã được tính bằng các phép toán mảng
+NumPy trong một lượt; profile 'classic' cho kết quả như bảng điểm if/elif trước đây.
+"""
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+# z-score theo ngành được cắt trong khoảng này
+ZSCORE_CLIP = 3.0
+
+# Số mã tối thiểu có dữ liệu trong ngành để tính z-score
+ZSCORE_MIN_GROUP = 3
+
+SCORING_PROFILES: Dict[str, Dict[str, Any]] = {
+    'classic': {
+        'description': 'Bảng điểm mặc định: P/E, P/B, ROE, biến động giá 30 ngày, RSI',
+        'base': 50,
+        'clip': (0, 100),
+        'zero_is_missing': True,
+        'factors': [
+            # P/E thấp tốt (chỉ tính khi P/E dương)
+            {'field': 'pe', 'type': 'steps', 'require': {'gt': 0}, 'rules': [
+                ({'lt': 10}, 15), ({'lt': 15}, 10), ({'lt': 20}, 5), ({'gt': 30}, -10)
+            ]},
+            # P/B thấp tốt
+            {'field': 'pb', 'type': 'steps', 'rules': [
+                ({'lt': 1}, 10), ({'lt': 2}, 5), ({'gt': 3}, -5)
+            ]},
+            # ROE cao tốt
+            {'field': 'roe', 'type': 'steps', 'rules': [
+                ({'gt': 20}, 15), ({'gt': 15}, 10), ({'gt': 10}, 5), ({'lt': 5}, -10)
+            ]},
+            # Tăng giá vừa phải tốt, tăng quá nóng hoặc giảm sâu bị trừ
+            {'field': 'price_change_30d', 'type': 'steps', 'rules': [
+                ({'between': (0, 20)}, 10), ({'gt': 50}, -5), ({'lt': -20}, -10)
+            ]},
+            # RSI quá bán nhẹ tốt, quá mua bị trừ
+            {'field': 'rsi', 'type': 'steps', 'rules': [
+                ({'between': (20, 40)}, 15), ({'between': (40, 60)}, 5), ({'gt': 70}, -10)
+            ]},
+        ],
+    },
+    'value': {
+        'description': 'Định giá thấp so với ngành, sinh lời tốt',
+        'base': 50,
+        'clip': (0, 100),
+        'factors': [
+            {'field': 'pe', 'type': 'linear', 'require': {'gt': 0}, 'points': [(5, 15), (15, 5), (30, -10)]},
+            {'field': 'pb', 'type': 'linear', 'points': [(0.5, 10), (2, 0), (4, -10)]},
+            {'field': 'pe', 'type': 'sector_zscore', 'require': {'gt': 0}, 'weight': -4},
+            {'field': 'pb', 'type': 'sector_zscore', 'weight': -3},
+            {'field': 'roe', 'type': 'linear', 'points': [(0, -10), (15, 5), (25, 15)]},
+        ],
+    },
+    'momentum': {
+        'description': 'Xu hướng giá: trên SMA 200, MACD dương, gần đỉnh 52 tuần',
+        'base': 50,
+        'clip': (0, 100),
+        'factors': [
+            {'field': 'price_change_30d', 'type': 'linear', 'points': [(-20, -10), (0, 0), (15, 10), (50, 0)]},
+            {'field': 'sma_200_distance', 'type': 'linear', 'points': [(-20, -10), (0, 0), (20, 10), (60, 0)]},
+            {'field': 'macd_histogram', 'type': 'steps', 'rules': [({'gt': 0}, 5), ({'lt': 0}, -5)]},
+            {'field': 'macd_cross', 'type': 'steps', 'rules': [({'gt': 0}, 5), ({'lt': 0}, -5)]},
+            {'field': 'high_52w_distance', 'type': 'linear', 'points': [(-40, -10), (-10, 5), (0, 10)]},
+            {'field': 'rsi', 'type': 'linear', 'points': [(30, -5), (55, 5), (70, 5), (85, -10)]},
+        ],
+    },
+    'quality': {
+        'description': 'Chất lượng so với ngành: ROE, biên lợi nhuận gộp, đòn bẩy, tăng trưởng EPS',
+        'base': 50,
+        'clip': (0, 100),
+        'factors': [
+            {'field': 'roe', 'type': 'sector_zscore', 'weight': 6},
+            {'field': 'gross_margin', 'type': 'sector_zscore', 'weight': 4},
+            {'field': 'de', 'type': 'sector_zscore', 'weight': -4},
+            {'field': 'eps_growth', 'type': 'sector_zscore', 'weight': 3},
+            {'field': 'revenue_growth', 'type': 'sector_zscore', 'weight': 2},
+        ],
+    },
+}
+
+# Profile dùng cho điểm được lưu trong database
+DEFAULT_SCORING_PROFILE = os.getenv('SCORING_PROFILE', 'classic')
+
+
+def get_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lấy profile theo tên (mặc định: DEFAULT_SCORING_PROFILE)
+
+    Raises:
+        ValueError: Profile không tồn tại
+    """
+    name = name or DEFAULT_SCORING_PROFILE
+    if name not in SCORING_PROFILES:
+        raise ValueError(f"Invalid scoring profile: {name}. Must be one of {list(SCORING_PROFILES)}")
+    return SCORING_PROFILES[name]
+
+
+def list_profiles() -> Dict[str, Dict[str, Any]]:
+    """Tên, mô tả và các trường của mọi profile"""
+    return {
+        name: {
+            'description': profile['description'],
+            'fields': sorted({factor['field'] for factor in profile['factors']}),
+            'default': name == DEFAULT_SCORING_PROFILE
+        }
+        for name, profile in SCORING_PROFILES.items()
+    }
+
+
+def profile_fields(profile: Dict[str, Any]) -> List[str]:
+    """Các trường số mà profile cần"""
+    return sorted({factor['field'] for factor in profile['factors']})
+
+
+def _condition(values: np.ndarray, condition: Dict[str, Any]) -> np.ndarray:
+    """Mask của một điều kiện {'lt': x}, {'gt': x} hoặc {'between': (a, b)} (không tính hai đầu)"""
+    if 'lt' in condition:
+        return values < condition['lt']
+    if 'gt' in condition:
+        return values > condition['gt']
+    low, high = condition['between']
+    return (values > low) & (values < high)
+
+
+def _sector_zscore(values: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    """z-score trong từng ngành (0 khi thiếu dữ liệu hoặc ngành quá ít mã)
+
+    Args:
+        groups: Số thứ tự ngành của từng mã (np.unique(..., return_inverse=True))
+    """
+    valid = ~np.isnan(values)
+    size = groups.max() + 1 if groups.size else 0
+
+    count = np.bincount(groups[valid], minlength=size)
+    total = np.bincount(groups[valid], weights=values[valid], minlength=size)
+    squares = np.bincount(groups[valid], weights=values[valid] ** 2, minlength=size)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean ** 2, 0))
+        z = (values - mean[groups]) / std[groups]
+
+    usable = valid & (count[groups] >= ZSCORE_MIN_GROUP) & (std[groups] > 0)
+    return np.where(usable, np.clip(z, -ZSCORE_CLIP, ZSCORE_CLIP), 0.0)
+
+
+def score_columns(columns: Dict[str, np.ndarray], profile: Optional[Dict[str, Any]] = None,
+                  sectors: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Tính điểm cho nhiều mã trong một lượt
+
+    Args:
+        columns: Dictionary {trường: mảng float}, NaN là thiếu dữ liệu
+        profile: Profile chấm điểm (mặc định: DEFAULT_SCORING_PROFILE)
+        sectors: Ngành của từng mã (cần cho factor 'sector_zscore')
+
+    Returns:
+        Mảng điểm float
+    """
+    profile = profile or get_profile()
+    size = len(next(iter(columns.values()))) if columns else 0
+    score = np.full(size, float(profile['base']))
+    groups = None
+
+    with np.errstate(invalid='ignore'):
+        for factor in profile['factors']:
+            values = np.asarray(columns.get(factor['field'], np.full(size, np.nan)), dtype=float)
+            valid = ~np.isnan(values)
+            if profile.get('zero_is_missing'):
+                valid &= values != 0
+            if 'require' in factor:
+                valid &= _condition(values, factor['require'])
+
+            if factor['type'] == 'steps':
+                conditions = [valid & _condition(values, rule) for rule, _ in factor['rules']]
+                points = np.select(conditions, [p for _, p in factor['rules']], default=0.0)
+            elif factor['type'] == 'linear':
+                xs, ys = zip(*factor['points'])
+                points = np.where(valid, np.interp(values, xs, ys), 0.0)
+            elif factor['type'] == 'sector_zscore':
+                if groups is None:
+                    sector_values = np.zeros(size, dtype=object) if sectors is None else sectors
+                    _, groups = np.unique(np.asarray(sector_values, dtype=object), return_inverse=True)
+                points = _sector_zscore(np.where(valid, values, np.nan), groups)
+            else:
+                raise ValueError(f"Unknown factor type: {factor['type']}")
+
+            score += factor.get('weight', 1) * points
+
+    low, high = profile['clip']
+    return np.clip(score, low, high)
+
+
+def score_records(records: Iterable[Dict[str, Any]], profile: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """
+    Tính điểm cho danh sách dict dữ liệu screening
+
+    Biến động giá lấy từ 'price_change_30d' hoặc 'price_change'.
+    """
+    records = list(records)
+    profile = profile or get_profile()
+    columns = {field: np.array([r.get(field) for r in records], dtype=float) for field in profile_fields(profile)}
+    if 'price_change_30d' in columns:
+        fallback = np.array([r.get('price_change') for r in records], dtype=float)
+        columns['price_change_30d'] = np.where(
+            np.isnan(columns['price_change_30d']), fallback, columns['price_change_30d']
+        )
+    sectors = np.array([r.get('industry') or r.get('sector') or '' for r in records], dtype=object)
+    return score_columns(columns, profile, sectors)
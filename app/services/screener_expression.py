@@ -0,0 +1,440 @@
+"""
+Ngôn ngữ biểu thức cho screener
+
+Ví dụ:
+    pe < 15 AND roe >= 15 AND (pb < 2 OR market_cap > 1e13)
+    close > 1.05 * sma_200 AND sector IN ('Ngân hàng', 'Bất động sản')
+    price_change_30d > 0 TOP 3 PER sector BY roe
+
+Cú pháp:
+- So sánh: <, <=, >, >=, =, != giữa trường, số và biểu thức số học (+, -, *, /)
+- Trường chữ (exchange, industry, sector): =, !=, IN (...), NOT IN (...), phân biệt hoa thường
+- Kết hợp: AND, OR, NOT và dấu ngoặc
+- TOP n PER <trường chữ> [BY <trường số>] [ASC|DESC]: giữ n mã đứng đầu mỗi nhóm sau khi
+  lọc (mặc định BY score DESC). Mệnh đề này đứng cuối biểu thức.
+
+Biểu thức được phân tích một lần thành ScreenerExpression (cache theo hash của biểu thức),
+có thể dùng làm mask NumPy trên ScreenerSnapshot hoặc điều kiện WHERE của SQLAlchemy.
+So sánh với giá trị thiếu (NULL/NaN) luôn sai ở cả hai cách.
+"""
+import hashlib
+import re
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, or_, select
+
+from ..database.models import StockScreeningData
+from .screener_snapshot import NUMERIC_FIELDS, TEXT_FIELDS, ScreenerSnapshot
+
+# Tên gọi khác của trường
+FIELD_ALIASES = {
+    'close': 'current_price',
+    'price': 'current_price',
+    'price_change': 'price_change_30d',
+}
+
+KEYWORDS = {'AND', 'OR', 'NOT', 'IN', 'TOP', 'PER', 'BY', 'ASC', 'DESC'}
+
+# Số biểu thức đã phân tích được giữ trong cache
+EXPRESSION_CACHE_SIZE = 256
+
+_TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>\d[\d_]*(?:\.\d+)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<op><=|>=|!=|<>|==|[<>=+\-*/(),])
+    )""", re.VERBOSE)
+
+_NEGATED_COMPARISONS = {'<': '>=', '<=': '>', '>': '<=', '>=': '<', '=': '!=', '!=': '='}
+_COMPARISONS = {
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    '=': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+}
+_ARITHMETIC = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+}
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    """Tách biểu thức thành các token (loại, giá trị)"""
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f"Invalid expression near: {text[position:position + 20]!r}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == 'number':
+            tokens.append(('number', float(value.replace('_', ''))))
+        elif kind == 'string':
+            tokens.append(('string', value[1:-1]))
+        elif kind == 'name' and value.upper() in KEYWORDS:
+            tokens.append(('keyword', value.upper()))
+        elif kind == 'name':
+            tokens.append(('name', value.lower()))
+        else:
+            tokens.append(('op', {'<>': '!=', '==': '='}.get(value, value)))
+    return tokens
+
+
+class _Parser:
+    """Recursive descent parser, trả về cây cú pháp dạng tuple"""
+
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, kind: str, value: Any = None) -> bool:
+        if self.position >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.position]
+        return token_kind == kind and (value is None or token_value == value)
+
+    def take(self, kind: str, value: Any = None) -> Any:
+        if not self.peek(kind, value):
+            found = self.tokens[self.position][1] if self.position < len(self.tokens) else 'end of expression'
+            raise ValueError(f"Expected {value or kind}, found {found!r}")
+        self.position += 1
+        return self.tokens[self.position - 1][1]
+
+    def parse(self) -> Tuple[Optional[tuple], Optional[Dict[str, Any]]]:
+        where = None if self.peek('keyword', 'TOP') else self.parse_or()
+        top = self.parse_top() if self.peek('keyword', 'TOP') else None
+        if self.position < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.position][1]!r}")
+        return where, top
+
+    def parse_top(self) -> Dict[str, Any]:
+        self.take('keyword', 'TOP')
+        n = self.take('number')
+        if n < 1 or n != int(n):
+            raise ValueError("TOP requires a positive integer")
+        self.take('keyword', 'PER')
+        group = self.field(self.take('name'))
+        if group not in TEXT_FIELDS:
+            raise ValueError(f"PER requires a text field: {list(TEXT_FIELDS)}")
+        by, descending = 'score', True
+        if self.peek('keyword', 'BY'):
+            self.take('keyword', 'BY')
+            by = self.field(self.take('name'))
+            if by not in NUMERIC_FIELDS:
+                raise ValueError(f"BY requires a numeric field: {list(NUMERIC_FIELDS)}")
+        if self.peek('keyword', 'ASC') or self.peek('keyword', 'DESC'):
+            descending = self.take('keyword') == 'DESC'
+        return {'n': int(n), 'per': group, 'by': by, 'descending': descending}
+
+    def parse_or(self) -> tuple:
+        node = self.parse_and()
+        while self.peek('keyword', 'OR'):
+            self.take('keyword', 'OR')
+            node = ('or', node, self.parse_and())
+        return node
+
+    def parse_and(self) -> tuple:
+        node = self.parse_not()
+        while self.peek('keyword', 'AND'):
+            self.take('keyword', 'AND')
+            node = ('and', node, self.parse_not())
+        return node
+
+    def parse_not(self) -> tuple:
+        if self.peek('keyword', 'NOT'):
+            self.take('keyword', 'NOT')
+            return ('not', self.parse_not())
+        return self.parse_condition()
+
+    def parse_condition(self) -> tuple:
+        # Dấu ngoặc quanh điều kiện (không phải quanh biểu thức số học)
+        if self.peek('op', '('):
+            start = self.position
+            self.take('op', '(')
+            try:
+                node = self.parse_or()
+                self.take('op', ')')
+                return node
+            except ValueError:
+                self.position = start
+
+        left = self.parse_sum()
+        if left[0] == 'text':
+            return self.parse_text_condition(left[1])
+
+        op = self.take('op')
+        if op not in _COMPARISONS:
+            raise ValueError(f"Expected comparison operator, found {op!r}")
+        right = self.parse_sum()
+        if right[0] == 'text':
+            raise ValueError(f"Cannot compare number with text field {right[1]!r}")
+        return ('cmp', op, left, right)
+
+    def parse_text_condition(self, field: str) -> tuple:
+        negate = False
+        if self.peek('keyword', 'NOT'):
+            self.take('keyword', 'NOT')
+            negate = True
+        if self.peek('keyword', 'IN'):
+            self.take('keyword', 'IN')
+            self.take('op', '(')
+            values = [self.take('string')]
+            while self.peek('op', ','):
+                self.take('op', ',')
+                values.append(self.take('string'))
+            self.take('op', ')')
+        elif not negate and (self.peek('op', '=') or self.peek('op', '!=')):
+            negate = self.take('op') == '!='
+            values = [self.take('string')]
+        else:
+            raise ValueError(f"Text field {field!r} supports =, != and IN (...)")
+        return ('in', field, tuple(values), negate)
+
+    def parse_sum(self) -> tuple:
+        node = self.parse_product()
+        while self.peek('op', '+') or self.peek('op', '-'):
+            node = ('arith', self.take('op'), self.numeric(node), self.numeric(self.parse_product()))
+        return node
+
+    def parse_product(self) -> tuple:
+        node = self.parse_unary()
+        while self.peek('op', '*') or self.peek('op', '/'):
+            node = ('arith', self.take('op'), self.numeric(node), self.numeric(self.parse_unary()))
+        return node
+
+    def parse_unary(self) -> tuple:
+        if self.peek('op', '-'):
+            self.take('op', '-')
+            return ('arith', '-', ('num', 0.0), self.numeric(self.parse_unary()))
+        if self.peek('op', '('):
+            self.take('op', '(')
+            node = self.parse_sum()
+            self.take('op', ')')
+            return node
+        if self.peek('number'):
+            return ('num', self.take('number'))
+        field = self.field(self.take('name'))
+        return ('text', field) if field in TEXT_FIELDS else ('field', field)
+
+    @staticmethod
+    def field(name: str) -> str:
+        field = FIELD_ALIASES.get(name, name)
+        if field not in NUMERIC_FIELDS and field not in TEXT_FIELDS:
+            raise ValueError(
+                f"Unknown field: {name}. Must be one of {sorted(NUMERIC_FIELDS + TEXT_FIELDS + tuple(FIELD_ALIASES))}"
+            )
+        return field
+
+    @staticmethod
+    def numeric(node: tuple) -> tuple:
+        if node[0] == 'text':
+            raise ValueError(f"Text field {node[1]!r} cannot be used in arithmetic")
+        return node
+
+
+def _push_not(node: tuple, negate: bool = False) -> tuple:
+    """
+    Đẩy NOT xuống tận các điều kiện (De Morgan, đảo phép so sánh)
+
+    Sau bước này cây không còn NOT nên giá trị thiếu làm điều kiện sai như nhau trong
+    NumPy (NaN) và SQL (NULL): NOT (pe < 15) thành pe >= 15, sai khi pe thiếu.
+    """
+    kind = node[0]
+    if kind == 'not':
+        return _push_not(node[1], not negate)
+    if kind in ('and', 'or'):
+        if negate:
+            kind = 'or' if kind == 'and' else 'and'
+        return (kind, _push_not(node[1], negate), _push_not(node[2], negate))
+    if kind == 'cmp' and negate:
+        return ('cmp', _NEGATED_COMPARISONS[node[1]], node[2], node[3])
+    if kind == 'in' and negate:
+        return ('in', node[1], node[2], not node[3])
+    return node
+
+
+def _compile_mask(node: tuple) -> Callable[[ScreenerSnapshot], np.ndarray]:
+    """Dịch cây cú pháp thành hàm tính mask (hoặc mảng giá trị) trên snapshot"""
+    kind = node[0]
+    if kind == 'num':
+        value = node[1]
+        return lambda snapshot: value
+    if kind == 'field':
+        field = node[1]
+        return lambda snapshot: snapshot.numeric[field]
+    if kind == 'arith':
+        operation, left, right = _ARITHMETIC[node[1]], _compile_mask(node[2]), _compile_mask(node[3])
+
+        def arith(snapshot):
+            # Chia cho 0 -> NaN (như NULL trong SQL), không phải inf
+            result = operation(left(snapshot), right(snapshot))
+            return np.where(np.isinf(result), np.nan, result)
+        return arith
+    if kind == 'cmp':
+        operation, left, right = _COMPARISONS[node[1]], _compile_mask(node[2]), _compile_mask(node[3])
+        if node[1] == '!=':
+            # NaN != x là True trong NumPy nhưng NULL trong SQL
+            return lambda snapshot: np.asarray(
+                operation(left(snapshot), right(snapshot)) & ~np.isnan(left(snapshot) - right(snapshot))
+            )
+        return lambda snapshot: np.asarray(operation(left(snapshot), right(snapshot)))
+    if kind == 'in':
+        field, values, negate = node[1], list(node[2]), node[3]
+        return lambda snapshot: np.isin(snapshot.text[field], values, invert=negate)
+    if kind in ('and', 'or'):
+        left, right = _compile_mask(node[1]), _compile_mask(node[2])
+        if kind == 'and':
+            return lambda snapshot: left(snapshot) & right(snapshot)
+        return lambda snapshot: left(snapshot) | right(snapshot)
+    raise ValueError(f"Unsupported node: {kind}")
+
+
+def _text_column(field: str):
+    """Cột chữ của StockScreeningData, NULL -> ''"""
+    return func.coalesce(getattr(StockScreeningData, field), '')
+
+
+def _compile_sql(node: tuple):
+    """Dịch cây cú pháp thành biểu thức SQLAlchemy trên StockScreeningData"""
+    kind = node[0]
+    if kind == 'num':
+        return node[1]
+    if kind == 'field':
+        return getattr(StockScreeningData, node[1])
+    if kind == 'arith':
+        return _ARITHMETIC[node[1]](_compile_sql(node[2]), _compile_sql(node[3]))
+    if kind == 'cmp':
+        return _COMPARISONS[node[1]](_compile_sql(node[2]), _compile_sql(node[3]))
+    if kind == 'in':
+        # Trường chữ thiếu được coi là chuỗi rỗng (như snapshot)
+        column = _text_column(node[1])
+        return column.notin_(node[2]) if node[3] else column.in_(node[2])
+    if kind == 'and':
+        return and_(_compile_sql(node[1]), _compile_sql(node[2]))
+    if kind == 'or':
+        return or_(_compile_sql(node[1]), _compile_sql(node[2]))
+    raise ValueError(f"Unsupported node: {kind}")
+
+
+class ScreenerExpression:
+    """Biểu thức screener đã phân tích, dùng cho snapshot NumPy hoặc truy vấn SQL"""
+
+    def __init__(self, text: str, digest: str):
+        """
+        Args:
+            text: Biểu thức
+            digest: Hash của biểu thức (khóa cache)
+        """
+        self.text = text
+        self.digest = digest
+        where, self.top = _Parser(_tokenize(text)).parse()
+        self.where = _push_not(where) if where is not None else None
+        self._mask_plan = _compile_mask(self.where) if self.where is not None else None
+        self._sql_where = _compile_sql(self.where) if self.where is not None else None
+
+    def mask(self, snapshot: ScreenerSnapshot, base: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Mask các mã thỏa mãn biểu thức trên snapshot
+
+        Args:
+            snapshot: ScreenerSnapshot
+            base: Mask của các bộ lọc khác (TOP ... PER áp dụng sau khi kết hợp)
+
+        Returns:
+            Mảng bool cùng độ dài snapshot
+        """
+        mask = np.ones(len(snapshot), dtype=bool) if base is None else base.copy()
+        if self._mask_plan is not None:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mask &= self._mask_plan(snapshot)
+        if self.top is not None:
+            mask = self._top_per_group(snapshot, mask)
+        return mask
+
+    def _top_per_group(self, snapshot: ScreenerSnapshot, mask: np.ndarray) -> np.ndarray:
+        """Giữ n mã đứng đầu mỗi nhóm (giá trị thiếu xếp cuối, cùng giá trị theo symbol)"""
+        candidates = np.flatnonzero(mask)
+        values = snapshot.numeric[self.top['by']][candidates]
+        keys = -values if self.top['descending'] else values
+        keys = np.nan_to_num(keys, nan=np.inf)
+        groups = snapshot.text[self.top['per']][candidates]
+
+        order = np.lexsort((snapshot.symbols[candidates], keys, groups))
+        sorted_groups = groups[order]
+        starts = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+        group_start = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+        rank = np.arange(len(order)) - group_start
+
+        result = np.zeros_like(mask)
+        result[candidates[order[rank < self.top['n']]]] = True
+        return result
+
+    def apply_to_query(self, query):
+        """
+        Thêm điều kiện của biểu thức vào truy vấn StockScreeningData
+
+        Gọi sau khi đã thêm các bộ lọc khác, trước order_by/limit: TOP ... PER được tính
+        bằng row_number() trên kết quả đã lọc.
+        """
+        if self._sql_where is not None:
+            query = query.filter(self._sql_where)
+        if self.top is not None:
+            by = getattr(StockScreeningData, self.top['by'])
+            ordering = by.desc() if self.top['descending'] else by.asc()
+            ranked = query.with_entities(
+                StockScreeningData.id,
+                func.row_number().over(
+                    partition_by=_text_column(self.top['per']),
+                    order_by=(by.is_(None), ordering, StockScreeningData.symbol)
+                ).label('rank')
+            ).subquery()
+            query = query.filter(StockScreeningData.id.in_(
+                select(ranked.c.id).where(ranked.c.rank <= self.top['n'])
+            ))
+        return query
+
+
+_expression_cache: Dict[str, ScreenerExpression] = {}
+_expression_lock = Lock()
+_expression_stats = {'hits': 0, 'misses': 0}
+
+
+def compile_expression(text: str) -> ScreenerExpression:
+    """
+    Phân tích biểu thức screener (cache theo hash của biểu thức đã chuẩn hóa khoảng trắng)
+
+    Raises:
+        ValueError: Biểu thức không hợp lệ
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("Expression must be a non-empty string")
+    normalized = ' '.join(text.split())
+    digest = hashlib.sha1(normalized.encode()).hexdigest()
+
+    expression = _expression_cache.get(digest)
+    if expression is not None:
+        _expression_stats['hits'] += 1
+        return expression
+
+    expression = ScreenerExpression(normalized, digest)
+    with _expression_lock:
+        _expression_stats['misses'] += 1
+        if len(_expression_cache) >= EXPRESSION_CACHE_SIZE:
+            _expression_cache.pop(next(iter(_expression_cache)))
+        _expression_cache[digest] = expression
+    return expression
+
+
+def get_expression_cache_stats() -> Dict[str, int]:
+    """Số biểu thức đang được cache và số lần trúng/trượt cache"""
+    return {'expressions': len(_expression_cache), **_expression_stats}
@@ -0,0 +1,269 @@
+"""
+Screener trong bộ nhớ trên snapshot dạng cột của StockScreeningData
+
+Toàn bộ dữ liệu screening được đọc một lần thành các mảng NumPy (mỗi trường một mảng,
+cùng thứ tự với mảng symbol). Bộ lọc là phép so sánh vector trên mảng, sắp xếp theo
+score dùng argpartition lấy top-k, không truy vấn database.
+
+Snapshot không bị sửa sau khi dựng: mỗi lần rebuild (sau các job cập nhật dữ liệu) tạo
+snapshot mới rồi thay tham chiếu, request đang chạy vẫn đọc snapshot cũ nhất quán.
+
+Phân trang theo keyset (score, symbol): cursor là khóa của dòng cuối trang trước, trang sau
+gồm các mã xếp sau khóa đó nên không cần bỏ qua (OFFSET) các trang đầu.
+"""
+import base64
+import binascii
+import json
+import time
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..database import get_db_session
+from ..database.models import SCREENING_FACTOR_COLUMNS, StockScreeningData
+
+NUMERIC_FIELDS = (
+    'current_price', 'price_change_30d', 'volume', 'pe', 'pb', 'roe', 'eps', 'market_cap', 'rsi', 'score'
+) + SCREENING_FACTOR_COLUMNS
+TEXT_FIELDS = ('exchange', 'industry', 'sector')
+
+# Bộ lọc min/max (như StockDataService.screen_stocks) -> (trường, phép so sánh)
+SNAPSHOT_FILTERS = {
+    'pe_min': ('pe', 'ge'), 'pe_max': ('pe', 'le'),
+    'pb_min': ('pb', 'ge'), 'pb_max': ('pb', 'le'),
+    'roe_min': ('roe', 'ge'), 'roe_max': ('roe', 'le'),
+    'price_change_min': ('price_change_30d', 'ge'), 'price_change_max': ('price_change_30d', 'le'),
+    'volume_min': ('volume', 'ge'),
+    'market_cap_min': ('market_cap', 'ge'),
+    'rsi_min': ('rsi', 'ge'), 'rsi_max': ('rsi', 'le'),
+}
+
+# Snapshot cũ hơn thời gian này được dựng lại khi truy vấn (dữ liệu ghi từ process khác)
+SNAPSHOT_MAX_AGE_SECONDS = 300
+
+
+def encode_cursor(record: Dict[str, Any]) -> str:
+    """Cursor (opaque, base64) của khóa (score, symbol) của một dòng kết quả"""
+    key = json.dumps([record.get('score'), record['symbol']])
+    return base64.urlsafe_b64encode(key.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    """
+    Khóa (score, symbol) từ cursor (score None: mã không có score)
+
+    Raises:
+        ValueError: Cursor không hợp lệ
+    """
+    try:
+        score, symbol = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(symbol, str) or not (score is None or isinstance(score, (int, float))):
+            raise ValueError
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return (float(score) if score is not None else None), symbol
+
+
+class ScreenerSnapshot:
+    """Dữ liệu screening dạng cột (chỉ đọc)"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        """
+        Args:
+            records: Danh sách StockScreeningData.to_dict() của các mã active
+        """
+        self.records = records
+        self.symbols = np.array([r['symbol'] for r in records], dtype=object)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # None -> NaN: so sánh với NaN luôn False, giống NULL trong SQL
+        self.numeric = {
+            field: np.array([r.get(field) for r in records], dtype=float)
+            for field in NUMERIC_FIELDS
+        }
+        self.text = {
+            field: np.array([r.get(field) or '' for r in records], dtype=object)
+            for field in TEXT_FIELDS
+        }
+        self.built_at = time.time()
+        self._profile_scores: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_db(cls, db: Session) -> 'ScreenerSnapshot':
+        """Đọc toàn bộ mã active từ database"""
+        stocks = db.query(StockScreeningData).filter(StockScreeningData.is_active == True).all()
+        return cls([stock.to_dict() for stock in stocks])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def mask(self, filters: Dict[str, Any], exchange: Optional[str] = None) -> np.ndarray:
+        """
+        Mask các mã thỏa mãn bộ lọc
+
+        Args:
+            filters: Bộ lọc min/max (SNAPSHOT_FILTERS), key khác bị bỏ qua
+            exchange: Sàn giao dịch (None: tất cả)
+
+        Returns:
+            Mảng bool cùng độ dài snapshot
+        """
+        mask = np.ones(len(self.records), dtype=bool)
+        if exchange:
+            mask &= self.text['exchange'] == exchange.upper()
+
+        with np.errstate(invalid='ignore'):
+            for key, value in filters.items():
+                if value is None or key not in SNAPSHOT_FILTERS:
+                    continue
+                field, op = SNAPSHOT_FILTERS[key]
+                values = self.numeric[field]
+                mask &= values >= value if op == 'ge' else values <= value
+        return mask
+
+    def profile_scores(self, name: str) -> np.ndarray:
+        """
+        Điểm của mọi mã theo một scoring profile (tính vector hóa một lần cho mỗi snapshot)
+
+        Raises:
+            ValueError: Profile không tồn tại
+        """
+        from .scoring_profiles import get_profile, score_columns
+
+        scores = self._profile_scores.get(name)
+        if scores is None:
+            profile = get_profile(name)
+            sectors = np.where(self.text['industry'] != '', self.text['industry'], self.text['sector'])
+            # Làm tròn như score trả về để thứ tự và cursor khớp với giá trị hiển thị
+            scores = np.round(score_columns(self.numeric, profile, sectors), 2)
+            self._profile_scores[name] = scores
+        return scores
+
+    def top_k(self, mask: np.ndarray, k: int, field: str = 'score',
+              values: Optional[np.ndarray] = None,
+              after: Optional[Tuple[Optional[float], str]] = None) -> np.ndarray:
+        """
+        Vị trí của k mã có `field` (hoặc `values`) cao nhất trong mask (giảm dần, cùng giá trị theo symbol)
+
+        Chỉ các ứng viên được chọn bởi argpartition mới được sắp xếp. Với `after` (khóa
+        (giá trị, symbol) từ decode_cursor), chỉ lấy các mã xếp sau khóa đó.
+        """
+        candidates = np.flatnonzero(mask)
+        if k <= 0 or candidates.size == 0:
+            return candidates[:0]
+
+        values = self.numeric[field] if values is None else values
+        keys = np.nan_to_num(values[candidates], nan=-np.inf)
+        if after is not None:
+            # Mã không có giá trị xếp cuối (như NULLS LAST)
+            after_key = -np.inf if after[0] is None else after[0]
+            keep = (keys < after_key) | ((keys == after_key) & (self.symbols[candidates] > after[1]))
+            candidates, keys = candidates[keep], keys[keep]
+            if candidates.size == 0:
+                return candidates
+        if candidates.size > k:
+            # Giữ cả các mã bằng giá trị thứ k để thứ tự theo symbol ổn định
+            threshold = np.partition(-keys, k - 1)[k - 1]
+            keep = -keys <= threshold
+            candidates, keys = candidates[keep], keys[keep]
+
+        order = np.lexsort((self.symbols[candidates], -keys))
+        return candidates[order[:k]]
+
+    def screen(self, filters: Dict[str, Any], exchange: Optional[str] = None,
+               limit: int = 50, expression=None, profile: Optional[str] = None,
+               after: Optional[Tuple[Optional[float], str]] = None) -> List[Dict[str, Any]]:
+        """
+        Lọc và lấy top `limit` mã theo score
+
+        Args:
+            expression: ScreenerExpression kết hợp (AND) với các bộ lọc min/max
+            profile: Scoring profile để xếp hạng (None: score đã lưu)
+            after: Khóa (score, symbol) của dòng cuối trang trước (decode_cursor)
+
+        Returns:
+            Danh sách dict như StockScreeningData.to_dict() (có profile: 'score' là điểm theo
+            profile và thêm 'score_profile')
+        """
+        mask = self.mask(filters, exchange)
+        if expression is not None:
+            mask = expression.mask(self, mask)
+        if profile is None:
+            positions = self.top_k(mask, limit, after=after)
+            return [dict(self.records[i]) for i in positions]
+
+        scores = self.profile_scores(profile)
+        positions = self.top_k(mask, limit, values=scores, after=after)
+        return [
+            {**self.records[i], 'score': round(float(scores[i]), 2), 'score_profile': profile}
+            for i in positions
+        ]
+
+    def get(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Dữ liệu screening của một mã (None nếu không có)"""
+        position = self.index.get(symbol.upper())
+        return dict(self.records[position]) if position is not None else None
+
+
+class ScreenerEngine:
+    """Giữ snapshot hiện tại và dựng lại khi dữ liệu thay đổi"""
+
+    def __init__(self, max_age_seconds: int = SNAPSHOT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._snapshot: Optional[ScreenerSnapshot] = None
+        self._lock = Lock()
+
+    def rebuild(self, db: Optional[Session] = None) -> ScreenerSnapshot:
+        """
+        Dựng snapshot mới từ database và thay snapshot hiện tại
+
+        Args:
+            db: Database session (mặc định: mở session mới)
+
+        Returns:
+            Snapshot mới
+        """
+        with self._lock:
+            if db is not None:
+                snapshot = ScreenerSnapshot.from_db(db)
+            else:
+                with get_db_session() as session:
+                    snapshot = ScreenerSnapshot.from_db(session)
+            self._snapshot = snapshot
+        return snapshot
+
+    def get_snapshot(self) -> ScreenerSnapshot:
+        """Snapshot hiện tại (dựng lần đầu hoặc khi đã cũ)"""
+        snapshot = self._snapshot
+        if snapshot is None or time.time() - snapshot.built_at > self.max_age_seconds:
+            snapshot = self.rebuild()
+        return snapshot
+
+    def screen(self, filters: Dict[str, Any], exchange: Optional[str] = None,
+               limit: int = 50, expression=None, profile: Optional[str] = None,
+               after: Optional[Tuple[Optional[float], str]] = None) -> List[Dict[str, Any]]:
+        """Lọc trên snapshot hiện tại (xem ScreenerSnapshot.screen)"""
+        return self.get_snapshot().screen(filters, exchange, limit, expression, profile, after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Số mã và thời điểm dựng snapshot"""
+        snapshot = self._snapshot
+        return {
+            'symbols': len(snapshot) if snapshot is not None else 0,
+            'built_at': snapshot.built_at if snapshot is not None else None
+        }
+
+
+# Global screener engine instance
+_global_engine = ScreenerEngine()
+
+
+def get_screener_engine() -> ScreenerEngine:
+    """
+    Lấy global screener engine
+
+    Returns:
+        ScreenerEngine instance
+    """
+    return _global_engine
@@ -0,0 +1,229 @@
+"""
+Tính các factor kỹ thuật và cơ bản cho bảng screening
+
+- Kỹ thuật (SMA, khoảng cách tới SMA, MACD và tín hiệu cắt, ATR%, đỉnh/đáy 52 tuần, giá trị
+  giao dịch trung bình): tính từ nến ngày đã lưu (StockDailyBar) trên chuỗi phiên của
+  từng mã; lịch sử đủ 52 tuần được tải bởi StockDataUpdater.backfill_history
+- Cơ bản (tăng trưởng, biên lợi nhuận gộp, D/E): kỳ báo cáo gần nhất trong fundamental_period
+
+Kết quả được ghi vào các cột factor của StockScreeningData (có index) nên bộ lọc trên các
+factor chỉ là truy vấn/mask trên dữ liệu đã lưu, không tính lại theo từng mã.
+"""
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..database.models import (
+    FUNDAMENTAL_FACTOR_COLUMNS, TECHNICAL_FACTOR_COLUMNS, FundamentalPeriodData, StockScreeningData
+)
+from ..utils.ohlcv import OHLCVFrame
+from ..utils.technical_indicators import TechnicalAnalyzer
+from .scoring_profiles import DEFAULT_SCORING_PROFILE
+from .stock_data_service import StockDataService
+
+# Số phiên của 52 tuần
+SESSIONS_52W = 252
+
+# Số phiên lịch sử cần lưu cho mỗi mã: 52 tuần cộng dự phòng (xem StockDataUpdater.backfill_history)
+HISTORY_SESSIONS = SESSIONS_52W + 20
+
+# Số ngày lịch cần đọc để có HISTORY_SESSIONS phiên (cuối tuần và nghỉ lễ, Tết)
+FACTOR_LOOKBACK_DAYS = 420
+
+# Tín hiệu MACD cắt signal được tính nếu xảy ra trong số phiên gần nhất này
+MACD_CROSS_LOOKBACK = 3
+
+# Giá trong database theo nghìn đồng
+PRICE_UNIT_VND = 1000
+
+
+def _last(columns: Dict[str, pd.Series], name: str) -> float:
+    """Giá trị cuối của một chuỗi chỉ số (NaN khi chưa đủ lịch sử để tính)"""
+    series = columns.get(name)
+    return float(series.iloc[-1]) if series is not None else np.nan
+
+
+def _tail_mean(values: pd.Series, period: int) -> float:
+    """Trung bình `period` phiên cuối (NaN khi chưa đủ lịch sử)"""
+    return float(values.iloc[-period:].mean()) if len(values) >= period else np.nan
+
+
+@np.errstate(divide='ignore', invalid='ignore')
+def symbol_technical_factors(frame: OHLCVFrame) -> Dict[str, Optional[float]]:
+    """
+    Factor kỹ thuật tại phiên gần nhất của một mã
+
+    Các cửa sổ được tính trên chuỗi phiên của chính mã đó (OHLCVFrame.from_daily_bars,
+    không có lỗ NaN); factor cần nhiều phiên hơn lịch sử đang có mang NaN.
+
+    Args:
+        frame: Nến ngày của mã, cũ nhất trước
+
+    Returns:
+        Dictionary {cột TECHNICAL_FACTOR_COLUMNS: giá trị hoặc None}
+    """
+    close, high, low, volume = frame['close'], frame['high'], frame['low'], frame['volume']
+    last = close.iloc[-1]
+
+    # SMA, MACD, ATR dùng chung công thức với /technical (TechnicalAnalyzer)
+    analyzer = TechnicalAnalyzer(frame)
+
+    factors: Dict[str, float] = {}
+    sma = analyzer._sma_series([20, 50, 200])
+    for period in (20, 50, 200):
+        factors[f'sma_{period}'] = _last(sma, f'SMA_{period}')
+    factors['sma_50_distance'] = (last / factors['sma_50'] - 1) * 100
+    factors['sma_200_distance'] = (last / factors['sma_200'] - 1) * 100
+
+    # MACD 12/26/9
+    macd = analyzer._macd_series(12, 26, 9)
+    factors['macd'] = _last(macd, 'MACD')
+    factors['macd_signal'] = _last(macd, 'Signal')
+    factors['macd_histogram'] = _last(macd, 'Histogram')
+
+    # Đổi dấu histogram trong MACD_CROSS_LOOKBACK phiên gần nhất: dấu hiện tại là hướng cắt
+    histogram = macd.get('Histogram', pd.Series(dtype=float))
+    recent = np.sign(histogram.iloc[-(MACD_CROSS_LOOKBACK + 1):]).to_numpy()
+    if len(recent) < 2 or np.isnan(recent).any():
+        factors['macd_cross'] = np.nan
+    else:
+        factors['macd_cross'] = recent[-1] if (np.diff(recent) != 0).any() else 0
+
+    # ATR 14 (Wilder) theo % giá
+    factors['atr_pct'] = _last(analyzer._atr_series(14), 'ATR') / last * 100
+
+    # Đỉnh/đáy 52 tuần: chỉ tính khi có đủ SESSIONS_52W phiên
+    if len(close) >= SESSIONS_52W:
+        factors['high_52w'] = high.iloc[-SESSIONS_52W:].max()
+        factors['low_52w'] = low.iloc[-SESSIONS_52W:].min()
+    else:
+        factors['high_52w'] = factors['low_52w'] = np.nan
+    factors['high_52w_distance'] = (last / factors['high_52w'] - 1) * 100
+    factors['low_52w_distance'] = (last / factors['low_52w'] - 1) * 100
+
+    # Giá trị giao dịch trung bình 20 phiên (VND)
+    factors['avg_value_20d'] = _tail_mean(close * volume * PRICE_UNIT_VND, 20)
+
+    return {
+        column: float(factors[column]) if np.isfinite(factors[column]) else None
+        for column in TECHNICAL_FACTOR_COLUMNS
+    }
+
+
+def technical_factors(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Factor kỹ thuật tại phiên gần nhất của từng mã
+
+    Args:
+        bars: DataFrame dạng long (symbol, trade_date, open, high, low, close, volume)
+
+    Returns:
+        DataFrame index symbol, các cột TECHNICAL_FACTOR_COLUMNS (NaN khi thiếu lịch sử)
+    """
+    from ..core.analytics_executor import get_analytics_executor
+
+    # Mỗi mã tính độc lập trên chuỗi phiên của chính nó: chạy trên process pool nếu được bật
+    results = get_analytics_executor().run('screening_factors', OHLCVFrame.from_daily_bars(bars))
+    return pd.DataFrame.from_dict(results, orient='index', columns=list(TECHNICAL_FACTOR_COLUMNS)).astype(float)
+
+
+def fundamental_factors(db: Session) -> pd.DataFrame:
+    """
+    Factor cơ bản của kỳ báo cáo gần nhất (ưu tiên báo cáo quý)
+
+    Returns:
+        DataFrame index symbol, các cột FUNDAMENTAL_FACTOR_COLUMNS
+    """
+    periods = pd.DataFrame(
+        db.query(
+            FundamentalPeriodData.symbol, FundamentalPeriodData.period_type,
+            FundamentalPeriodData.year, FundamentalPeriodData.quarter,
+            *(getattr(FundamentalPeriodData, c) for c in FUNDAMENTAL_FACTOR_COLUMNS)
+        ).all(),
+        columns=['symbol', 'period_type', 'year', 'quarter'] + list(FUNDAMENTAL_FACTOR_COLUMNS)
+    )
+    if periods.empty:
+        return pd.DataFrame(columns=list(FUNDAMENTAL_FACTOR_COLUMNS))
+
+    # 'quarter' < 'year': kỳ quý gần nhất đứng đầu mỗi mã
+    periods = periods.sort_values(
+        ['symbol', 'period_type', 'year', 'quarter'], ascending=[True, True, False, False]
+    ).drop_duplicates('symbol')
+    return periods.set_index('symbol')[list(FUNDAMENTAL_FACTOR_COLUMNS)].astype(float)
+
+
+class ScreeningFactorService:
+    """Tính và lưu factor của mọi mã active"""
+
+    @staticmethod
+    def refresh(db: Session, as_of: date = None) -> Dict[str, Any]:
+        """
+        Tính lại toàn bộ factor và ghi vào StockScreeningData
+
+        Args:
+            as_of: Ngày tính (mặc định: hôm nay)
+
+        Score được tính lại theo profile mặc định sau khi ghi factor (xem rescore).
+
+        Returns:
+            Dictionary {'symbols', 'technical', 'fundamental', 'scored'}
+        """
+        as_of = as_of or date.today()
+        symbols = [row.symbol for row in db.query(StockScreeningData.symbol).filter(
+            StockScreeningData.is_active == True
+        ).all()]
+        if not symbols:
+            return {'symbols': 0, 'technical': 0, 'fundamental': 0, 'scored': 0}
+
+        bars = StockDataService.get_daily_bars_frame(db, as_of - timedelta(days=FACTOR_LOOKBACK_DAYS), as_of)
+        technical = technical_factors(bars)
+        fundamental = fundamental_factors(db)
+
+        factors = pd.DataFrame(index=pd.Index(symbols, name='symbol'))
+        factors = factors.join(technical).join(fundamental)
+        factors = factors.reindex(columns=list(TECHNICAL_FACTOR_COLUMNS + FUNDAMENTAL_FACTOR_COLUMNS))
+
+        # Cột factor luôn được ghi đè (None khi không tính được) để không giữ giá trị cũ
+        now = datetime.utcnow()
+        values = factors.astype(object).where(factors.notna(), None)
+        rows = [
+            {**record, 'symbol': symbol, 'factors_updated': now}
+            for symbol, record in zip(values.index, values.to_dict('records'))
+        ]
+        for row in rows:
+            if row['macd_cross'] is not None:
+                row['macd_cross'] = int(row['macd_cross'])
+        StockDataService.bulk_upsert_stock_data(db, rows, touch_last_updated=False)
+
+        return {
+            'symbols': len(symbols),
+            'technical': int(factors['sma_20'].notna().sum()),
+            'fundamental': int(factors[list(FUNDAMENTAL_FACTOR_COLUMNS)].notna().any(axis=1).sum()),
+            'scored': ScreeningFactorService.rescore(db)
+        }
+
+    @staticmethod
+    def rescore(db: Session, profile: Optional[str] = None) -> int:
+        """
+        Tính lại cột score của mọi mã active theo một scoring profile (một lượt vector hóa)
+
+        Args:
+            profile: Tên profile (mặc định: DEFAULT_SCORING_PROFILE)
+
+        Returns:
+            Số mã đã ghi
+
+        Raises:
+            ValueError: Profile không tồn tại
+        """
+        from .screener_snapshot import ScreenerSnapshot
+
+        snapshot = ScreenerSnapshot.from_db(db)
+        if not len(snapshot):
+            return 0
+        scores = snapshot.profile_scores(profile or DEFAULT_SCORING_PROFILE)
+        rows = [{'symbol': symbol, 'score': round(float(score), 2)} for symbol, score in zip(snapshot.symbols, scores)]
+        return StockDataService.bulk_upsert_stock_data(db, rows, touch_last_updated=False)
@@ -0,0 +1,164 @@
+"""
+Ảnh chụp dữ liệu screening theo ngày: screen tại một ngày trong quá khứ và lịch sử factor
+
+Mỗi ngày giao dịch, dữ liệu screening hiện tại (chỉ số và factor) của các mã active được
+chép sang bảng screening_snapshot_daily bằng một câu INSERT ... SELECT. Bảng chỉ được thêm
+dòng; index (snapshot_date, symbol) cho screen theo ngày và (symbol, snapshot_date) cho
+lịch sử factor của một mã.
+"""
+from collections import OrderedDict
+from datetime import date
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..database.models import ScreeningSnapshotDaily, StockDailyBar, StockScreeningData
+from .screener_snapshot import NUMERIC_FIELDS, ScreenerSnapshot
+
+# Các cột được chép từ StockScreeningData
+SNAPSHOT_COLUMNS = [
+    column.name for column in ScreeningSnapshotDaily.__table__.columns
+    if column.name not in ('id', 'snapshot_date')
+]
+
+# Số ảnh chụp theo ngày được giữ dạng cột trong bộ nhớ (ảnh chụp cũ không đổi)
+SNAPSHOT_CACHE_SIZE = 8
+
+
+def validate_fields(fields: Optional[List[str]]) -> List[str]:
+    """Kiểm tra danh sách chỉ số của lịch sử factor (mặc định: tất cả chỉ số số)"""
+    if not fields:
+        return list(NUMERIC_FIELDS)
+    invalid = [f for f in fields if f not in NUMERIC_FIELDS]
+    if invalid:
+        raise ValueError(f"Invalid fields: {invalid}. Must be in {list(NUMERIC_FIELDS)}")
+    return fields
+
+
+class ScreeningHistoryService:
+    """Ghi và đọc ảnh chụp dữ liệu screening theo ngày"""
+
+    _snapshots: 'OrderedDict[date, ScreenerSnapshot]' = OrderedDict()
+    _lock = Lock()
+
+    @staticmethod
+    def latest_trading_date(db: Session) -> date:
+        """Phiên gần nhất có nến ngày đã lưu (mặc định: hôm nay)"""
+        return db.query(func.max(StockDailyBar.trade_date)).scalar() or date.today()
+
+    @staticmethod
+    def latest_snapshot_date(db: Session) -> Optional[date]:
+        """Ngày của ảnh chụp mới nhất (None nếu chưa có)"""
+        return db.query(func.max(ScreeningSnapshotDaily.snapshot_date)).scalar()
+
+    @staticmethod
+    def write_snapshot(db: Session, snapshot_date: Optional[date] = None) -> int:
+        """
+        Chép dữ liệu screening hiện tại thành ảnh chụp của một ngày
+
+        Mỗi ngày chỉ ghi một lần: ngày đã có ảnh chụp được giữ nguyên.
+
+        Args:
+            snapshot_date: Ngày của ảnh chụp (mặc định: phiên gần nhất có nến ngày)
+
+        Returns:
+            Số mã đã ghi (0 nếu ngày đã có ảnh chụp)
+        """
+        snapshot_date = snapshot_date or ScreeningHistoryService.latest_trading_date(db)
+        exists = db.query(ScreeningSnapshotDaily.id).filter(
+            ScreeningSnapshotDaily.snapshot_date == snapshot_date
+        ).first()
+        if exists:
+            return 0
+
+        source = select(
+            literal(snapshot_date, ScreeningSnapshotDaily.snapshot_date.type),
+            *(getattr(StockScreeningData, column) for column in SNAPSHOT_COLUMNS)
+        ).where(StockScreeningData.is_active == True)
+        result = db.execute(
+            insert(ScreeningSnapshotDaily).from_select(['snapshot_date'] + SNAPSHOT_COLUMNS, source)
+        )
+        db.commit()
+        return result.rowcount
+
+    @staticmethod
+    def get_dates(db: Session) -> List[date]:
+        """Các ngày đã có ảnh chụp (mới nhất trước)"""
+        return [row[0] for row in db.query(ScreeningSnapshotDaily.snapshot_date).distinct().order_by(
+            ScreeningSnapshotDaily.snapshot_date.desc()
+        ).all()]
+
+    @staticmethod
+    def resolve_date(db: Session, as_of: date) -> date:
+        """
+        Ngày có ảnh chụp gần nhất không sau as_of
+
+        Raises:
+            ValueError: Không có ảnh chụp nào trước as_of
+        """
+        snapshot_date = db.query(func.max(ScreeningSnapshotDaily.snapshot_date)).filter(
+            ScreeningSnapshotDaily.snapshot_date <= as_of
+        ).scalar()
+        if snapshot_date is None:
+            raise ValueError(f"No screening snapshot on or before {as_of.isoformat()}")
+        return snapshot_date
+
+    @classmethod
+    def get_snapshot(cls, db: Session, as_of: date) -> ScreenerSnapshot:
+        """
+        Ảnh chụp tại ngày as_of dạng cột (dùng cùng bộ lọc/biểu thức với screener hiện tại)
+
+        Raises:
+            ValueError: Không có ảnh chụp nào trước as_of
+        """
+        snapshot_date = cls.resolve_date(db, as_of)
+        snapshot = cls._snapshots.get(snapshot_date)
+        if snapshot is not None:
+            return snapshot
+
+        rows = db.query(ScreeningSnapshotDaily).filter(
+            ScreeningSnapshotDaily.snapshot_date == snapshot_date
+        ).all()
+        snapshot = ScreenerSnapshot([
+            {'snapshot_date': snapshot_date.isoformat(),
+             **{column: getattr(row, column) for column in SNAPSHOT_COLUMNS}}
+            for row in rows
+        ])
+
+        with cls._lock:
+            cls._snapshots[snapshot_date] = snapshot
+            while len(cls._snapshots) > SNAPSHOT_CACHE_SIZE:
+                cls._snapshots.popitem(last=False)
+        return snapshot
+
+    @staticmethod
+    def get_factor_history(db: Session, symbol: str, fields: Optional[List[str]] = None,
+                           start_date: Optional[date] = None,
+                           end_date: Optional[date] = None) -> List[Dict[str, Any]]:
+        """
+        Lịch sử factor của một mã từ các ảnh chụp
+
+        Args:
+            symbol: Mã cổ phiếu
+            fields: Các chỉ số cần lấy (mặc định: tất cả)
+            start_date, end_date: Khoảng ngày (mặc định: toàn bộ)
+
+        Returns:
+            Danh sách {'date', <chỉ số>...}, cũ nhất trước
+        """
+        fields = validate_fields(fields)
+        query = db.query(
+            ScreeningSnapshotDaily.snapshot_date,
+            *(getattr(ScreeningSnapshotDaily, field) for field in fields)
+        ).filter(ScreeningSnapshotDaily.symbol == symbol.upper())
+        if start_date:
+            query = query.filter(ScreeningSnapshotDaily.snapshot_date >= start_date)
+        if end_date:
+            query = query.filter(ScreeningSnapshotDaily.snapshot_date <= end_date)
+
+        return [
+            {'date': row[0].isoformat(), **dict(zip(fields, row[1:]))}
+            for row in query.order_by(ScreeningSnapshotDaily.snapshot_date).all()
+        ]
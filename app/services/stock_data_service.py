@@ -1,12 +1,16 @@
 """
 Service for managing stock screening data in database
 """
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+from datetime import datetime, timedelta, date
+from typing import List, Dict, Optional, Tuple
+import pandas as pd
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func
 
-from ..database.models import StockScreeningData, ScreeningJobLog
+from ..database.models import StockScreeningData, StockDailyBar, ScreeningJobLog
+
+# Số ngày lịch sử nến ngày được giữ lại trong database
+DAILY_BAR_RETENTION_DAYS = 730
 
 
 class StockDataService:
@@ -56,6 +60,66 @@ class StockDataService:
             db.refresh(new_stock)
             return new_stock
 
+    @staticmethod
+    def bulk_upsert_stock_data(db: Session, items: List[Dict], commit: bool = True,
+                               touch_last_updated: bool = True) -> int:
+        """
+        Insert or update nhiều cổ phiếu trong một transaction
+
+        Dùng INSERT ... ON CONFLICT(symbol) DO UPDATE (SQLite, PostgreSQL): không SELECT
+        trước, không refresh từng dòng. Chỉ các cột có trong dict được ghi đè, cột khác giữ
+        nguyên giá trị đang lưu. Các dialect khác dùng ORM như upsert_stock_data.
+
+        Args:
+            items: Danh sách dict dữ liệu screening (như upsert_stock_data)
+            commit: Commit ngay (False khi caller tự commit)
+            touch_last_updated: Cập nhật last_updated (False khi chỉ ghi dữ liệu dẫn xuất như
+                factor, để không làm mã có vẻ đã được cập nhật từ upstream)
+
+        Returns:
+            Số cổ phiếu đã ghi
+        """
+        columns = set(StockScreeningData.__table__.columns.keys()) - {'id'}
+        now = datetime.utcnow()
+        rows = {}
+        for item in items:
+            symbol = (item.get('symbol') or '').upper()
+            if symbol:
+                row = {key: value for key, value in item.items() if key in columns}
+                row['symbol'] = symbol
+                if touch_last_updated:
+                    row['last_updated'] = now
+                rows[symbol] = row
+        if not rows:
+            return 0
+
+        dialect = db.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        elif dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            for row in rows.values():
+                StockDataService.upsert_stock_data(db, row)
+            return len(rows)
+
+        # Mỗi câu lệnh cần cùng một tập cột cập nhật: gom các dòng theo tập key
+        groups = {}
+        for row in rows.values():
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        for keys, group in groups.items():
+            stmt = insert(StockScreeningData.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['symbol'],
+                set_={key: stmt.excluded[key] for key in keys if key != 'symbol'}
+            )
+            db.execute(stmt, group)
+
+        if commit:
+            db.commit()
+        return len(rows)
+
     @staticmethod
     def is_data_fresh(db: Session, symbol: str, max_age_hours: int = 24) -> bool:
         """
@@ -94,10 +158,16 @@ class StockDataService:
         db: Session,
         filters: Dict,
         exchange: Optional[str] = None,
-        limit: int = 50
+        limit: int = 50,
+        expression=None,
+        after: Optional[Tuple[Optional[float], str]] = None
     ) -> List[StockScreeningData]:
         """
         Screen stocks based on filters từ database
+
+        expression: ScreenerExpression (screener_expression) kết hợp với các bộ lọc min/max
+        after: Khóa (score, symbol) của dòng cuối trang trước (phân trang keyset, xem
+               screener_snapshot.decode_cursor)
         """
         query = db.query(StockScreeningData).filter(StockScreeningData.is_active == True)
 
@@ -137,14 +207,160 @@ class StockDataService:
         if 'rsi_max' in filters and filters['rsi_max'] is not None:
             query = query.filter(StockScreeningData.rsi <= filters['rsi_max'])
 
+        if expression is not None:
+            query = expression.apply_to_query(query)
+
+        # Keyset: các mã xếp sau (score, symbol) của trang trước, mã không có score xếp cuối
+        if after is not None:
+            after_score, after_symbol = after
+            if after_score is None:
+                query = query.filter(
+                    StockScreeningData.score.is_(None), StockScreeningData.symbol > after_symbol
+                )
+            else:
+                query = query.filter(or_(
+                    StockScreeningData.score < after_score,
+                    StockScreeningData.score.is_(None),
+                    and_(StockScreeningData.score == after_score, StockScreeningData.symbol > after_symbol)
+                ))
+
         # Order by score descending
-        query = query.order_by(StockScreeningData.score.desc())
+        query = query.order_by(StockScreeningData.score.desc().nulls_last(), StockScreeningData.symbol)
 
         # Limit results
         query = query.limit(limit)
 
         return query.all()
 
+    @staticmethod
+    def upsert_daily_bars(db: Session, symbol: str, bars: List[Dict], commit: bool = True) -> int:
+        """
+        Lưu nến ngày của một cổ phiếu (ghi đè các ngày đã có, xóa nến quá hạn lưu trữ)
+
+        Args:
+            symbol: Mã cổ phiếu
+            bars: Danh sách dict có các key time, open, high, low, close, volume
+            commit: Commit ngay (False khi ghi theo batch, caller tự commit)
+
+        Returns:
+            Số nến đã ghi
+        """
+        symbol = symbol.upper()
+        rows = {}
+        for bar in bars:
+            trade_date = pd.Timestamp(bar['time']).date()
+            rows[trade_date] = {
+                'symbol': symbol,
+                'trade_date': trade_date,
+                'open': float(bar['open']),
+                'high': float(bar['high']),
+                'low': float(bar['low']),
+                'close': float(bar['close']),
+                'volume': float(bar['volume']),
+            }
+
+        if not rows:
+            return 0
+
+        cutoff = date.today() - timedelta(days=DAILY_BAR_RETENTION_DAYS)
+        db.query(StockDailyBar).filter(
+            StockDailyBar.symbol == symbol,
+            or_(StockDailyBar.trade_date.in_(list(rows.keys())), StockDailyBar.trade_date < cutoff)
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(StockDailyBar, list(rows.values()))
+        if commit:
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def upsert_session_bars(db: Session, trade_date: date, bars: Dict[str, Dict], commit: bool = True) -> int:
+        """
+        Lưu nến của một phiên cho nhiều mã (ghi đè nến đã có của phiên đó)
+
+        Args:
+            trade_date: Ngày giao dịch
+            bars: Dictionary {symbol: dict có các key open, high, low, close, volume}
+            commit: Commit ngay (False khi caller tự commit)
+
+        Returns:
+            Số nến đã ghi
+        """
+        rows = [
+            {'symbol': symbol.upper(), 'trade_date': trade_date,
+             **{field: float(bar[field]) for field in ('open', 'high', 'low', 'close', 'volume')}}
+            for symbol, bar in bars.items()
+        ]
+        if not rows:
+            return 0
+
+        db.query(StockDailyBar).filter(
+            StockDailyBar.trade_date == trade_date,
+            StockDailyBar.symbol.in_([row['symbol'] for row in rows])
+        ).delete(synchronize_session=False)
+        db.bulk_insert_mappings(StockDailyBar, rows)
+        if commit:
+            db.commit()
+        return len(rows)
+
+    @staticmethod
+    def get_previous_bars(db: Session, before: date) -> Dict[str, Tuple[float, float]]:
+        """(close, volume) của nến mới nhất trước ngày `before` theo từng mã"""
+        latest = db.query(
+            StockDailyBar.symbol, func.max(StockDailyBar.trade_date).label('trade_date')
+        ).filter(StockDailyBar.trade_date < before).group_by(StockDailyBar.symbol).subquery()
+        rows = db.query(StockDailyBar.symbol, StockDailyBar.close, StockDailyBar.volume).join(
+            latest, and_(StockDailyBar.symbol == latest.c.symbol, StockDailyBar.trade_date == latest.c.trade_date)
+        ).all()
+        return {symbol: (close, volume) for symbol, close, volume in rows}
+
+    @staticmethod
+    def get_daily_bar_coverage(db: Session) -> Dict[str, Tuple[int, date]]:
+        """Số nến ngày đã lưu và ngày của nến mới nhất theo từng mã"""
+        rows = db.query(
+            StockDailyBar.symbol, func.count(StockDailyBar.id), func.max(StockDailyBar.trade_date)
+        ).group_by(StockDailyBar.symbol).all()
+        return {symbol: (count, last_date) for symbol, count, last_date in rows}
+
+    @staticmethod
+    def get_latest_bar_date(db: Session) -> Optional[date]:
+        """Ngày giao dịch mới nhất có trong bảng nến ngày"""
+        return db.query(func.max(StockDailyBar.trade_date)).scalar()
+
+    @staticmethod
+    def get_daily_bars_frame(
+        db: Session,
+        start_date: date,
+        end_date: Optional[date] = None,
+        exchange: Optional[str] = None
+    ) -> pd.DataFrame:
+        """
+        Lấy nến ngày của các cổ phiếu đang active trong khoảng ngày
+
+        Returns:
+            DataFrame dạng long: symbol, trade_date, open, high, low, close, volume
+            (sắp xếp theo symbol, trade_date)
+        """
+        query = db.query(
+            StockDailyBar.symbol, StockDailyBar.trade_date,
+            StockDailyBar.open, StockDailyBar.high, StockDailyBar.low,
+            StockDailyBar.close, StockDailyBar.volume
+        ).join(
+            StockScreeningData, StockScreeningData.symbol == StockDailyBar.symbol
+        ).filter(
+            StockScreeningData.is_active == True,
+            StockDailyBar.trade_date >= start_date
+        )
+
+        if end_date:
+            query = query.filter(StockDailyBar.trade_date <= end_date)
+        if exchange:
+            query = query.filter(StockScreeningData.exchange == exchange.upper())
+
+        rows = query.order_by(StockDailyBar.symbol, StockDailyBar.trade_date).all()
+        return pd.DataFrame(
+            rows, columns=['symbol', 'trade_date', 'open', 'high', 'low', 'close', 'volume']
+        )
+
     @staticmethod
     def create_job_log(
         db: Session,
@@ -0,0 +1,228 @@
+"""
+Danh sách mã niêm yết toàn thị trường (HOSE, HNX, UPCOM)
+
+Được tải từ listing của vnstock (symbols_by_exchange, symbols_by_industries,
+symbols_by_group cho VN30/HNX30), lưu vào bảng symbol_listing, làm mới hàng ngày bởi
+scheduler và phục vụ tra cứu từ bộ nhớ.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from ..database import get_db_session
+from ..database.models import SymbolListing
+
+# Tên sàn từ listing -> tên sàn dùng trong API
+EXCHANGE_ALIASES = {'HSX': 'HOSE', 'HOSE': 'HOSE', 'HNX': 'HNX', 'UPCOM': 'UPCOM'}
+
+# Các rổ chỉ số được lưu thành phần
+INDEX_GROUPS = ('VN30', 'HNX30')
+
+# Danh sách cũ hơn thời gian này sẽ được tải lại khi tra cứu
+UNIVERSE_MAX_AGE_HOURS = 24
+
+# Khoảng cách tối thiểu giữa hai lần thử tải lại khi upstream lỗi
+UNIVERSE_RETRY_MINUTES = 10
+
+
+def _first_column(df: pd.DataFrame, names: List[str]) -> Optional[str]:
+    """Tên cột đầu tiên có trong DataFrame (None nếu không có)"""
+    for name in names:
+        if name in df.columns:
+            return name
+    return None
+
+
+class SymbolUniverse:
+    """Danh sách mã niêm yết, giữ trong bộ nhớ"""
+
+    def __init__(self):
+        self._listings: Dict[str, Dict[str, Any]] = {}
+        self._by_exchange: Dict[str, List[str]] = {}
+        self._by_index: Dict[str, List[str]] = {}
+        self._loaded_at: Optional[datetime] = None
+        self._last_attempt: Optional[datetime] = None
+        self._lock = Lock()
+
+    @staticmethod
+    def _fetch_listing() -> pd.DataFrame:
+        """
+        Tải danh sách mã từ vnstock
+
+        Returns:
+            DataFrame các cột symbol, exchange, company_name, industry, sector, indices
+        """
+        from vnstock import Vnstock
+
+        listing = Vnstock().stock(symbol='VNM', source='VCI').listing
+
+        symbols = listing.symbols_by_exchange()
+        if symbols is None or symbols.empty:
+            return pd.DataFrame()
+
+        if 'type' in symbols.columns:
+            symbols = symbols[symbols['type'].astype(str).str.upper() == 'STOCK']
+        name_col = _first_column(symbols, ['organ_name', 'organName', 'organ_short_name'])
+        result = pd.DataFrame({
+            'symbol': symbols[_first_column(symbols, ['symbol', 'ticker'])].astype(str).str.upper(),
+            'exchange': symbols[_first_column(symbols, ['exchange', 'comGroupCode'])].map(
+                lambda x: EXCHANGE_ALIASES.get(str(x).upper())
+            ),
+            'company_name': symbols[name_col] if name_col else None,
+        })
+        result = result[result['exchange'].notna()].drop_duplicates('symbol')
+
+        # Ngành ICB
+        try:
+            industries = listing.symbols_by_industries()
+            if industries is not None and not industries.empty:
+                industries = industries.rename(columns={
+                    _first_column(industries, ['symbol', 'ticker']): 'symbol',
+                    _first_column(industries, ['icb_name3', 'icbName3']): 'industry',
+                    _first_column(industries, ['icb_name2', 'icbName2']): 'sector',
+                })
+                industries['symbol'] = industries['symbol'].astype(str).str.upper()
+                columns = [c for c in ('symbol', 'industry', 'sector') if c in industries.columns]
+                result = result.merge(industries[columns].drop_duplicates('symbol'), on='symbol', how='left')
+        except Exception as e:
+            print(f"Error getting industries listing: {e}")
+
+        # Thành phần các rổ chỉ số
+        members = defaultdict(list)
+        for group in INDEX_GROUPS:
+            try:
+                for symbol in listing.symbols_by_group(group):
+                    members[str(symbol).upper()].append(group)
+            except Exception as e:
+                print(f"Error getting {group} constituents: {e}")
+        result['indices'] = result['symbol'].map(lambda s: ','.join(members[s]) if s in members else None)
+
+        return result.reindex(columns=['symbol', 'exchange', 'company_name', 'industry', 'sector', 'indices'])
+
+    def refresh(self, db: Session) -> int:
+        """
+        Tải lại danh sách mã từ vnstock, lưu vào database và bộ nhớ
+
+        Danh sách hiện có được giữ nguyên nếu upstream không trả về dữ liệu.
+
+        Returns:
+            Số mã đã lưu
+        """
+        listing = self._fetch_listing()
+        if listing.empty:
+            return 0
+
+        now = datetime.utcnow()
+        values = listing.astype(object).where(listing.notna(), None)
+        rows = [{**record, 'last_updated': now} for record in values.to_dict('records')]
+
+        db.query(SymbolListing).delete(synchronize_session=False)
+        db.bulk_insert_mappings(SymbolListing, rows)
+        db.commit()
+
+        self._load_rows(rows)
+        return len(rows)
+
+    def _load_rows(self, rows: List[Dict[str, Any]]):
+        """Dựng các bảng tra cứu trong bộ nhớ"""
+        listings = {}
+        by_exchange = defaultdict(list)
+        by_index = defaultdict(list)
+        for row in sorted(rows, key=lambda r: r['symbol']):
+            entry = {
+                'symbol': row['symbol'],
+                'exchange': row['exchange'],
+                'company_name': row['company_name'],
+                'industry': row['industry'],
+                'sector': row['sector'],
+                'indices': row['indices'].split(',') if row['indices'] else []
+            }
+            listings[entry['symbol']] = entry
+            by_exchange[entry['exchange']].append(entry['symbol'])
+            for index in entry['indices']:
+                by_index[index].append(entry['symbol'])
+
+        with self._lock:
+            self._listings = listings
+            self._by_exchange = dict(by_exchange)
+            self._by_index = dict(by_index)
+            self._loaded_at = min((r['last_updated'] for r in rows), default=datetime.utcnow())
+
+    def _ensure_loaded(self):
+        """Đọc danh sách từ database; tải lại từ vnstock nếu chưa có hoặc đã cũ"""
+        now = datetime.utcnow()
+        max_age = timedelta(hours=UNIVERSE_MAX_AGE_HOURS)
+        if self._loaded_at is not None and now - self._loaded_at < max_age:
+            return
+        if self._last_attempt is not None and now - self._last_attempt < timedelta(minutes=UNIVERSE_RETRY_MINUTES):
+            return
+        self._last_attempt = now
+
+        try:
+            with get_db_session() as db:
+                rows = [
+                    {column: getattr(row, column) for column in
+                     ('symbol', 'exchange', 'company_name', 'industry', 'sector', 'indices', 'last_updated')}
+                    for row in db.query(SymbolListing).all()
+                ]
+                if rows:
+                    self._load_rows(rows)
+                if not rows or now - self._loaded_at >= max_age:
+                    self.refresh(db)
+        except Exception as e:
+            print(f"Error loading symbol universe: {e}")
+
+    def get_symbols(self, exchange: str = 'ALL', index: Optional[str] = None) -> List[str]:
+        """
+        Lấy danh sách mã theo sàn và/hoặc rổ chỉ số
+
+        Args:
+            exchange: HOSE, HNX, UPCOM hoặc ALL
+            index: Rổ chỉ số (VN30, HNX30), mặc định: không lọc
+
+        Returns:
+            Danh sách mã (rỗng nếu chưa tải được danh sách)
+        """
+        self._ensure_loaded()
+        with self._lock:
+            if exchange and exchange.upper() != 'ALL':
+                symbols = list(self._by_exchange.get(EXCHANGE_ALIASES.get(exchange.upper(), exchange.upper()), []))
+            else:
+                symbols = sorted(self._listings)
+            if index:
+                members = set(self._by_index.get(index.upper(), []))
+                symbols = [s for s in symbols if s in members]
+        return symbols
+
+    def get_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """Thông tin niêm yết của một mã (None nếu không có)"""
+        self._ensure_loaded()
+        return self._listings.get(symbol.upper())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Số mã theo sàn và rổ chỉ số"""
+        with self._lock:
+            return {
+                'total': len(self._listings),
+                'exchanges': {k: len(v) for k, v in self._by_exchange.items()},
+                'indices': {k: len(v) for k, v in self._by_index.items()},
+                'loaded_at': self._loaded_at.isoformat() if self._loaded_at else None
+            }
+
+
+# Global universe instance
+_global_universe = SymbolUniverse()
+
+
+def get_symbol_universe() -> SymbolUniverse:
+    """
+    Lấy global symbol universe
+
+    Returns:
+        SymbolUniverse instance
+    """
+    return _global_universe
@@ -0,0 +1,108 @@
+"""
+Định giá (P/E, P/B, P/S) từ chỉ số trên mỗi cổ phiếu đã lưu và giá gần nhất
+
+EPS TTM, BVPS, SPS của kỳ báo cáo gần nhất được đọc từ bảng fundamental_period (chỉ
+đổi khi có báo cáo mới) và cache; mỗi lần định giá chỉ cần giá đóng cửa gần nhất, không
+tải lại báo cáo tài chính hay toàn bộ lịch sử giá.
+"""
+from typing import Any, Dict, Optional
+
+from ..core.cache import get_cache
+from ..database import get_db_session
+from ..database.models import FundamentalPeriodData
+from .fundamental_history_service import FundamentalHistoryService
+from .vnstock_service import VNStockService
+
+# Chỉ số trên mỗi cổ phiếu chỉ đổi theo kỳ báo cáo
+PER_SHARE_CACHE_TTL = 6 * 3600
+
+
+def _price_multiple(price: Optional[float], per_share: Optional[float]) -> Optional[float]:
+    """Giá / chỉ số trên mỗi cổ phiếu (None nếu thiếu dữ liệu hoặc chỉ số không dương)"""
+    if not price or per_share is None or per_share <= 0:
+        return None
+    return round(price / per_share, 2)
+
+
+class ValuationService:
+    """Tính P/E, P/B, P/S theo giá gần nhất"""
+
+    def __init__(self, service: Optional[VNStockService] = None):
+        """
+        Args:
+            service: VNStockService dùng để lấy giá và báo cáo (mặc định: tạo mới)
+        """
+        self.service = service or VNStockService()
+        self.cache = get_cache()
+
+    def get_per_share(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        EPS TTM, BVPS, SPS của kỳ báo cáo gần nhất (ưu tiên báo cáo quý)
+
+        Nếu database chưa có chỉ số theo kỳ của mã, báo cáo quý được tính và lưu một lần.
+
+        Returns:
+            Dictionary {'period_type', 'year', 'quarter', 'eps_ttm', 'bvps', 'sps'} hoặc None
+        """
+        symbol = symbol.upper()
+        cache_key = f"per_share_{symbol}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        with get_db_session() as db:
+            row = self._latest_period(db, symbol)
+            if row is None:
+                FundamentalHistoryService.refresh_symbol(
+                    db, symbol, 'quarter', self.service.get_financial_statements(symbol, period='quarter')
+                )
+                row = self._latest_period(db, symbol)
+            if row is None:
+                return None
+
+            per_share = {
+                'period_type': row.period_type,
+                'year': row.year,
+                'quarter': row.quarter if row.period_type == 'quarter' else None,
+                'eps_ttm': row.eps_ttm,
+                'bvps': row.bvps,
+                'sps': row.sps
+            }
+
+        self.cache.set(cache_key, per_share, ttl=PER_SHARE_CACHE_TTL)
+        return per_share
+
+    @staticmethod
+    def _latest_period(db, symbol: str) -> Optional[FundamentalPeriodData]:
+        """Kỳ gần nhất có EPS TTM, ưu tiên báo cáo quý"""
+        return db.query(FundamentalPeriodData).filter(
+            FundamentalPeriodData.symbol == symbol,
+            FundamentalPeriodData.eps_ttm.isnot(None)
+        ).order_by(
+            FundamentalPeriodData.period_type.asc(),  # 'quarter' trước 'year'
+            FundamentalPeriodData.year.desc(),
+            FundamentalPeriodData.quarter.desc()
+        ).first()
+
+    def get_valuation(self, symbol: str, price: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Định giá theo giá gần nhất
+
+        Args:
+            symbol: Mã cổ phiếu
+            price: Giá dùng để định giá (mặc định: giá đóng cửa gần nhất)
+
+        Returns:
+            Dictionary {'price', 'PE', 'PB', 'PS', 'per_share'}
+        """
+        if price is None:
+            price = self.service.get_last_price(symbol)
+        per_share = self.get_per_share(symbol) or {}
+
+        return {
+            'price': price,
+            'PE': _price_multiple(price, per_share.get('eps_ttm')),
+            'PB': _price_multiple(price, per_share.get('bvps')),
+            'PS': _price_multiple(price, per_share.get('sps')),
+            'per_share': per_share or None
+        }
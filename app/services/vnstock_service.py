@@ -9,8 +9,15 @@ from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 from ..utils.technical_indicators import TechnicalAnalyzer
 from ..utils.fundamental_indicators import FundamentalAnalyzer
+from ..utils.ohlcv import OHLCVFrame
 from ..core.cache import get_cache
 
+# Báo cáo tài chính chỉ đổi theo quý nên được cache lâu
+FINANCIAL_STATEMENTS_CACHE_TTL = 6 * 3600
+
+# Giá đóng cửa gần nhất (dùng cho định giá) được cache ngắn
+LAST_PRICE_CACHE_TTL = 60
+
 
 class VNStockService:
     """Service tương tác với vnstock API v3.3.0"""
@@ -173,6 +180,55 @@ class VNStockService:
             print(f"Error getting price data: {e}")
             raise
 
+    def get_price_data_window(self, symbol: str, bars: int,
+                              end_date: Optional[str] = None) -> pd.DataFrame:
+        """
+        Lấy N phiên giao dịch gần nhất tính đến end_date (thay vì toàn bộ lịch sử)
+
+        Khoảng ngày lịch được ước lượng từ số phiên (5 phiên/tuần) cộng thêm
+        phần dự phòng cho các kỳ nghỉ lễ, sau đó cắt lấy đúng N dòng cuối.
+
+        Args:
+            symbol: Mã cổ phiếu
+            bars: Số phiên cần lấy
+            end_date: Ngày kết thúc (YYYY-MM-DD), mặc định là hôm nay
+
+        Returns:
+            DataFrame chứa tối đa N phiên gần nhất
+        """
+        end_dt = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
+        calendar_days = int(bars * 7 / 5 * 1.1) + 15
+        start_date = (end_dt - timedelta(days=calendar_days)).strftime('%Y-%m-%d')
+
+        df = self.get_price_data(symbol, start_date, end_dt.strftime('%Y-%m-%d'))
+        return df.iloc[-bars:] if len(df) > bars else df
+
+    def get_last_price(self, symbol: str) -> Optional[float]:
+        """
+        Lấy giá đóng cửa gần nhất (chỉ tải vài phiên cuối, cache ngắn)
+
+        Args:
+            symbol: Mã cổ phiếu
+
+        Returns:
+            Giá đóng cửa gần nhất hoặc None nếu không có dữ liệu
+        """
+        cache_key = f"last_price_{symbol.upper()}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            df = self.get_price_data_window(symbol, 5)
+        except Exception:
+            return None
+        if df.empty:
+            return None
+
+        price = float(df['close'].iloc[-1])
+        self.cache.set(cache_key, price, ttl=LAST_PRICE_CACHE_TTL)
+        return price
+
     def get_financial_statements(self, symbol: str, period: str = 'year',
                                  lang: str = 'vi') -> Dict[str, pd.DataFrame]:
         """
@@ -184,8 +240,13 @@ class VNStockService:
             lang: Ngôn ngữ ('vi' hoặc 'en')
 
         Returns:
-            Dictionary chứa các báo cáo tài chính
+            Dictionary chứa các báo cáo tài chính (dùng chung từ cache, không sửa trực tiếp)
         """
+        cache_key = f"financial_statements_{symbol.upper()}_{period}_{lang}"
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
         result = {
             'balance_sheet': pd.DataFrame(),
             'income_statement': pd.DataFrame(),
@@ -225,6 +286,9 @@ class VNStockService:
         except Exception as e:
             print(f"Error getting financial statements: {e}")
 
+        if any(not df.empty for df in result.values()):
+            self.cache.set(cache_key, result, ttl=FINANCIAL_STATEMENTS_CACHE_TTL)
+
         return result
 
     def get_macro_data(self) -> Dict[str, Any]:
@@ -267,21 +331,24 @@ class VNStockService:
             # 2. Lấy dữ liệu giá
             price_df = self.get_price_data(symbol, start_date, end_date)
 
+            # Dựng OHLCV dạng mảng một lần, dùng chung cho các analyzer
+            ohlcv = OHLCVFrame.from_dataframe(price_df)
+
             # 3. Tính các chỉ số kỹ thuật
-            technical_analyzer = TechnicalAnalyzer(price_df)
+            technical_analyzer = TechnicalAnalyzer(ohlcv)
             technical_indicators = technical_analyzer.calculate_all_indicators()
 
             # 4. Lấy báo cáo tài chính
             financial_statements = self.get_financial_statements(symbol)
 
             # 5. Tính các chỉ số cơ bản
-            current_price = float(price_df['close'].iloc[-1]) if not price_df.empty else 0
+            current_price = float(ohlcv.close[-1]) if len(ohlcv) else 0
 
             # Lấy thông tin từ company info hoặc financial statements
             shares_outstanding = company_info.get('shares_outstanding', 1000000)
             market_cap = company_info.get('market_cap', current_price * shares_outstanding if shares_outstanding else 0)
 
-            fundamental_analyzer = FundamentalAnalyzer(financial_statements, price_df)
+            fundamental_analyzer = FundamentalAnalyzer(financial_statements, ohlcv)
             fundamental_indicators = fundamental_analyzer.calculate_all_indicators(
                 current_price, shares_outstanding, market_cap
             )
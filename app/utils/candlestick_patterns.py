@@ -3,38 +3,378 @@ Module nhận dạng các mô hình nến Nhật (Japanese Candlestick Patterns)
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Union
+
+from .ohlcv import OHLCVFrame
+
+
+# Ngưỡng mặc định của các mô hình (có thể ghi đè từng key khi quét)
+DEFAULT_THRESHOLDS: Dict[str, float] = {
+    'doji_body_ratio': 0.1,               # body/range tối đa của Doji
+    'hammer_body_ratio': 0.3,             # body/range tối đa của Hammer
+    'hammer_shadow_ratio': 2.0,           # lower_shadow/body tối thiểu của Hammer
+    'inverted_hammer_body_ratio': 0.3,
+    'inverted_hammer_shadow_ratio': 2.0,  # upper_shadow/body tối thiểu
+    'shooting_star_body_ratio': 0.3,
+    'shooting_star_shadow_ratio': 2.0,
+    'star_outer_body_ratio': 0.5,         # body/range tối thiểu của nến 1 và 3 (Morning/Evening Star)
+    'star_middle_body_ratio': 0.3,        # body/range tối đa của nến giữa
+    'harami_body_ratio': 0.5,             # body nến hiện tại / body nến trước tối đa
+}
+
+# (tên mô hình, rule, các ngưỡng dùng cho rule) theo thứ tự output; pattern id = vị trí trong danh sách
+PATTERNS = (
+    ('Doji', 'doji', ('doji_body_ratio',)),
+    ('Hammer', 'hammer', ('hammer_body_ratio', 'hammer_shadow_ratio')),
+    ('Inverted_Hammer', 'inverted_hammer', ('inverted_hammer_body_ratio', 'inverted_hammer_shadow_ratio')),
+    ('Shooting_Star', 'inverted_hammer', ('shooting_star_body_ratio', 'shooting_star_shadow_ratio')),
+    ('Bullish_Engulfing', 'engulfing_bullish', ()),
+    ('Bearish_Engulfing', 'engulfing_bearish', ()),
+    ('Morning_Star', 'morning_star', ('star_outer_body_ratio', 'star_middle_body_ratio')),
+    ('Evening_Star', 'evening_star', ('star_outer_body_ratio', 'star_middle_body_ratio')),
+    ('Three_White_Soldiers', 'three_white_soldiers', ()),
+    ('Three_Black_Crows', 'three_black_crows', ()),
+    ('Bullish_Harami', 'harami_bullish', ('harami_body_ratio',)),
+    ('Bearish_Harami', 'harami_bearish', ('harami_body_ratio',)),
+)
+
+PATTERN_NAMES = tuple(name for name, _, _ in PATTERNS)
+PATTERN_IDS = {name: pattern_id for pattern_id, name in enumerate(PATTERN_NAMES)}
+
+# Số nến tạo thành mỗi rule
+RULE_SPANS = {
+    'doji': 1, 'hammer': 1, 'inverted_hammer': 1,
+    'engulfing_bullish': 2, 'engulfing_bearish': 2, 'harami_bullish': 2, 'harami_bearish': 2,
+    'morning_star': 3, 'evening_star': 3, 'three_white_soldiers': 3, 'three_black_crows': 3,
+}
+
+# Số nến của mô hình dài nhất = số bar lịch sử tối thiểu để đánh giá một bar
+MAX_PATTERN_SPAN = max(RULE_SPANS.values())
+
+# Số bar của chunk đầu tiên khi quét ngược từ bar mới nhất (các chunk sau tăng gấp đôi)
+LATEST_SCAN_CHUNK = 64
+
+
+def resolve_thresholds(thresholds: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Gộp ngưỡng người dùng với DEFAULT_THRESHOLDS
+
+    Raises:
+        ValueError nếu có key không hợp lệ
+    """
+    resolved = dict(DEFAULT_THRESHOLDS)
+    for key, value in (thresholds or {}).items():
+        if key not in DEFAULT_THRESHOLDS:
+            raise ValueError(f"Unknown pattern threshold: '{key}'. Supported: {list(DEFAULT_THRESHOLDS.keys())}")
+        resolved[key] = float(value)
+    return resolved
+
+
+def validate_patterns(patterns: Optional[List[str]] = None) -> List[str]:
+    """
+    Chuẩn hóa danh sách mô hình (không phân biệt hoa thường, giữ thứ tự PATTERN_NAMES)
+
+    Raises:
+        ValueError nếu có mô hình không hợp lệ
+    """
+    if not patterns:
+        return list(PATTERN_NAMES)
+
+    lookup = {name.lower(): name for name in PATTERN_NAMES}
+    selected = set()
+    for pattern in patterns:
+        name = lookup.get(pattern.strip().lower())
+        if name is None:
+            raise ValueError(f"Invalid pattern: '{pattern}'. Supported: {list(PATTERN_NAMES)}")
+        selected.add(name)
+    return [name for name in PATTERN_NAMES if name in selected]
+
+
+class PatternScanner:
+    """
+    Quét tất cả mô hình nến trong một lượt
+
+    Các đặc trưng của nến (body, range, bóng nến, tỷ lệ body/range...) được tính một lần,
+    mọi rule dùng chung. Dữ liệu có thể là mảng 1 chiều (một mã) hoặc nhiều chiều
+    (panel nhiều mã), trục thời gian luôn là trục cuối.
+    """
+
+    def __init__(self, open: np.ndarray, high: np.ndarray, low: np.ndarray, close: np.ndarray):
+        """
+        Args:
+            open, high, low, close: Mảng float cùng shape, trục cuối là thời gian
+        """
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+
+        o, h, l, c = self.open, self.high, self.low, self.close
+        self.body = np.abs(c - o)
+        self.range = h - l
+        self.upper_shadow = h - np.maximum(o, c)
+        self.lower_shadow = np.minimum(o, c) - l
+        self.is_bullish = c > o
+        self.is_bearish = c < o
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self.body_ratio = self.body / self.range
+        self.padded_body = self.body + 0.0001  # Tránh chia cho 0 khi tính tỷ lệ bóng nến
+
+    @classmethod
+    def from_ohlcv(cls, frame: OHLCVFrame) -> 'PatternScanner':
+        """Tạo scanner từ OHLCVFrame"""
+        return cls(frame.open, frame.high, frame.low, frame.close)
+
+    @classmethod
+    def scan_latest(cls, frame: OHLCVFrame, n: int, thresholds: Optional[Dict[str, float]] = None,
+                    min_bar: int = 0, chunk_size: int = LATEST_SCAN_CHUNK) -> np.ndarray:
+        """
+        Quét ngược từ bar mới nhất và dừng khi đã tìm đủ n mô hình
+
+        Mỗi chunk chỉ cần thêm MAX_PATTERN_SPAN - 1 bar phía trước để đánh giá đúng
+        các mô hình nhiều nến, nên không phải tính đặc trưng cho toàn bộ lịch sử.
+
+        Args:
+            frame: Dữ liệu OHLCV của một mã
+            n: Số sự kiện cần lấy
+            thresholds: Ngưỡng ghi đè DEFAULT_THRESHOLDS
+            min_bar: Bỏ qua các bar trước vị trí này (VD: cửa sổ dữ liệu không bắt đầu từ
+                     đầu lịch sử nên các bar đầu thiếu nến phía trước)
+            chunk_size: Số bar của chunk đầu tiên
+
+        Returns:
+            Mảng (bar index, pattern id) sắp xếp theo bar giảm dần rồi pattern id, tối đa n dòng
+        """
+        resolve_thresholds(thresholds)
+
+        found = []
+        total = 0
+        end = len(frame)
+        size = max(1, chunk_size)
+        while end > min_bar and total < n:
+            start = max(min_bar, end - size)
+            lo = max(0, start - (MAX_PATTERN_SPAN - 1))
+            window = frame.slice(lo, end)
+
+            events = cls.from_ohlcv(window).scan(thresholds)
+            events = events[events[:, 0] >= start - lo]
+            events[:, 0] += lo
+            events = events[np.lexsort((events[:, 1], -events[:, 0]))]
+
+            found.append(events)
+            total += len(events)
+            end = start
+            size *= 2
+
+        if not found:
+            return np.empty((0, 2), dtype=np.int64)
+        return np.concatenate(found)[:n]
+
+    @property
+    def shape(self) -> tuple:
+        return self.close.shape
+
+    def _aligned(self, feature: str, lag: int, span: int) -> np.ndarray:
+        """
+        Đặc trưng lùi `lag` nến, căn theo nến cuối của mô hình gồm `span` nến
+
+        Các mảng cùng `span` có cùng độ dài nên so sánh trực tiếp được với nhau.
+        """
+        values = getattr(self, feature)
+        return values[..., span - 1 - lag:values.shape[-1] - lag]
+
+    def _pad(self, mask: np.ndarray, span: int) -> np.ndarray:
+        """Đưa mask của mô hình `span` nến về shape dữ liệu (span - 1 nến đầu là False)"""
+        result = np.zeros(self.shape, dtype=bool)
+        result[..., span - 1:] = mask
+        return result
+
+    def _rule_doji(self, body_ratio: float) -> np.ndarray:
+        return self.body_ratio < body_ratio
+
+    def _rule_hammer(self, body_ratio: float, shadow_ratio: float) -> np.ndarray:
+        return (
+            (self.body_ratio < body_ratio) &
+            (self.lower_shadow / self.padded_body > shadow_ratio) &
+            (self.upper_shadow < self.body)
+        )
+
+    def _rule_inverted_hammer(self, body_ratio: float, shadow_ratio: float) -> np.ndarray:
+        return (
+            (self.body_ratio < body_ratio) &
+            (self.upper_shadow / self.padded_body > shadow_ratio) &
+            (self.lower_shadow < self.body)
+        )
+
+    def _rule_engulfing_bullish(self) -> np.ndarray:
+        prev = lambda f: self._aligned(f, 1, 2)
+        curr = lambda f: self._aligned(f, 0, 2)
+        # Nến trước giảm, nến hiện tại tăng và bao phủ hoàn toàn nến trước
+        return self._pad(
+            prev('is_bearish') & curr('is_bullish') &
+            (curr('open') < prev('close')) & (curr('close') > prev('open')), 2)
+
+    def _rule_engulfing_bearish(self) -> np.ndarray:
+        prev = lambda f: self._aligned(f, 1, 2)
+        curr = lambda f: self._aligned(f, 0, 2)
+        # Nến trước tăng, nến hiện tại giảm và bao phủ hoàn toàn nến trước
+        return self._pad(
+            prev('is_bullish') & curr('is_bearish') &
+            (curr('open') > prev('close')) & (curr('close') < prev('open')), 2)
+
+    def _rule_morning_star(self, outer_body_ratio: float, middle_body_ratio: float) -> np.ndarray:
+        c1 = lambda f: self._aligned(f, 2, 3)
+        c2 = lambda f: self._aligned(f, 1, 3)
+        c3 = lambda f: self._aligned(f, 0, 3)
+        # Nến giảm body lớn, nến body nhỏ, nến tăng body lớn đóng cửa trên giữa body nến 1
+        return self._pad(
+            c1('is_bearish') & (c1('body') > c1('range') * outer_body_ratio) &
+            (c2('body') < c2('range') * middle_body_ratio) &
+            c3('is_bullish') & (c3('body') > c3('range') * outer_body_ratio) &
+            (c3('close') > (c1('open') + c1('close')) / 2), 3)
+
+    def _rule_evening_star(self, outer_body_ratio: float, middle_body_ratio: float) -> np.ndarray:
+        c1 = lambda f: self._aligned(f, 2, 3)
+        c2 = lambda f: self._aligned(f, 1, 3)
+        c3 = lambda f: self._aligned(f, 0, 3)
+        # Nến tăng body lớn, nến body nhỏ, nến giảm body lớn đóng cửa dưới giữa body nến 1
+        return self._pad(
+            c1('is_bullish') & (c1('body') > c1('range') * outer_body_ratio) &
+            (c2('body') < c2('range') * middle_body_ratio) &
+            c3('is_bearish') & (c3('body') > c3('range') * outer_body_ratio) &
+            (c3('close') < (c1('open') + c1('close')) / 2), 3)
+
+    def _rule_three_white_soldiers(self) -> np.ndarray:
+        c1 = lambda f: self._aligned(f, 2, 3)
+        c2 = lambda f: self._aligned(f, 1, 3)
+        c3 = lambda f: self._aligned(f, 0, 3)
+        return self._pad(
+            c1('is_bullish') & c2('is_bullish') & c3('is_bullish') &
+            (c2('close') > c1('close')) & (c3('close') > c2('close')) &
+            (c2('open') > c1('open')) & (c3('open') > c2('open')), 3)
+
+    def _rule_three_black_crows(self) -> np.ndarray:
+        c1 = lambda f: self._aligned(f, 2, 3)
+        c2 = lambda f: self._aligned(f, 1, 3)
+        c3 = lambda f: self._aligned(f, 0, 3)
+        return self._pad(
+            c1('is_bearish') & c2('is_bearish') & c3('is_bearish') &
+            (c2('close') < c1('close')) & (c3('close') < c2('close')) &
+            (c2('open') < c1('open')) & (c3('open') < c2('open')), 3)
+
+    def _rule_harami_bullish(self, body_ratio: float) -> np.ndarray:
+        prev = lambda f: self._aligned(f, 1, 2)
+        curr = lambda f: self._aligned(f, 0, 2)
+        # Nến trước giảm lớn, nến hiện tại tăng nhỏ nằm trong body nến trước
+        return self._pad(
+            prev('is_bearish') & curr('is_bullish') &
+            (curr('open') > prev('close')) & (curr('close') < prev('open')) &
+            (curr('body') < prev('body') * body_ratio), 2)
+
+    def _rule_harami_bearish(self, body_ratio: float) -> np.ndarray:
+        prev = lambda f: self._aligned(f, 1, 2)
+        curr = lambda f: self._aligned(f, 0, 2)
+        # Nến trước tăng lớn, nến hiện tại giảm nhỏ nằm trong body nến trước
+        return self._pad(
+            prev('is_bullish') & curr('is_bearish') &
+            (curr('open') < prev('close')) & (curr('close') > prev('open')) &
+            (curr('body') < prev('body') * body_ratio), 2)
+
+    def masks(self, thresholds: Optional[Dict[str, float]] = None,
+              patterns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Mask boolean của các mô hình
+
+        Rule dùng chung với cùng ngưỡng chỉ được tính một lần
+        (VD: Shooting_Star dùng lại kết quả của Inverted_Hammer).
+
+        Args:
+            thresholds: Ngưỡng ghi đè DEFAULT_THRESHOLDS
+            patterns: Các mô hình cần quét (mặc định: tất cả, theo thứ tự PATTERN_NAMES)
+
+        Returns:
+            Mảng bool shape (số mô hình, *shape dữ liệu)
+        """
+        resolved = resolve_thresholds(thresholds)
+        names = validate_patterns(patterns)
+
+        result = np.zeros((len(names),) + self.shape, dtype=bool)
+        computed = {}
+        for i, name in enumerate(names):
+            _, rule, keys = PATTERNS[PATTERN_IDS[name]]
+            params = tuple(resolved[key] for key in keys)
+            if (rule, params) not in computed:
+                computed[(rule, params)] = getattr(self, f'_rule_{rule}')(*params)
+            result[i] = computed[(rule, params)]
+        return result
+
+    def scan(self, thresholds: Optional[Dict[str, float]] = None,
+             patterns: Optional[List[str]] = None) -> np.ndarray:
+        """
+        Quét và trả về các sự kiện mô hình dạng mảng gọn
+
+        Args:
+            thresholds: Ngưỡng ghi đè DEFAULT_THRESHOLDS
+            patterns: Các mô hình cần quét (mặc định: tất cả)
+
+        Returns:
+            Mảng int64 shape (số sự kiện, ndim + 1). Với dữ liệu 1 chiều mỗi dòng là
+            (bar index, pattern id); với panel là (row, ..., bar index, pattern id).
+            Sắp xếp theo row, bar index rồi pattern id.
+        """
+        names = validate_patterns(patterns)
+        masks = self.masks(thresholds, names)
+        events = np.argwhere(np.moveaxis(masks, 0, -1)).astype(np.int64)
+        if len(names) != len(PATTERN_NAMES):
+            ids = np.array([PATTERN_IDS[name] for name in names], dtype=np.int64)
+            events[:, -1] = ids[events[:, -1]]
+        return events
 
 
 class CandlestickPatternDetector:
     """Class nhận dạng các mô hình nến Nhật"""
 
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: Union[pd.DataFrame, OHLCVFrame]):
         """
-        Khởi tạo với DataFrame chứa dữ liệu giá
+        Khởi tạo với dữ liệu giá
 
         Args:
             df: DataFrame với các cột: open, high, low, close, volume
+                hoặc OHLCVFrame đã dựng sẵn (dùng chung giữa các analyzer, không copy)
         """
-        self.df = df.copy()
-
-        # Chuẩn hóa tên cột
-        column_mapping = {
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        }
-        self.df.rename(columns=column_mapping, inplace=True)
-
-        # Tính các giá trị cần thiết
-        self.df['body'] = abs(self.df['close'] - self.df['open'])
-        self.df['upper_shadow'] = self.df['high'] - self.df[['open', 'close']].max(axis=1)
-        self.df['lower_shadow'] = self.df[['open', 'close']].min(axis=1) - self.df['low']
-        self.df['is_bullish'] = self.df['close'] > self.df['open']
-        self.df['is_bearish'] = self.df['close'] < self.df['open']
-        self.df['range'] = self.df['high'] - self.df['low']
+        self.ohlcv = OHLCVFrame.ensure(df)
+        self._scanner: Optional[PatternScanner] = None
+        self._df: Optional[pd.DataFrame] = None
+
+    @property
+    def scanner(self) -> PatternScanner:
+        """Scanner trên toàn bộ lịch sử (lazy, get_latest_patterns không cần đến)"""
+        if self._scanner is None:
+            self._scanner = PatternScanner.from_ohlcv(self.ohlcv)
+        return self._scanner
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Frame đặc trưng dựng từ kết quả của scanner (không tính lại, không copy frame upstream)"""
+        if self._df is None:
+            sc = self.scanner
+            self._df = pd.DataFrame({
+                'open': sc.open,
+                'high': sc.high,
+                'low': sc.low,
+                'close': sc.close,
+                'body': sc.body,
+                'upper_shadow': sc.upper_shadow,
+                'lower_shadow': sc.lower_shadow,
+                'is_bullish': sc.is_bullish,
+                'is_bearish': sc.is_bearish,
+                'range': sc.range,
+            }, copy=False)
+        return self._df
+
+    def _detect(self, pattern: str, thresholds: Optional[Dict[str, float]] = None) -> pd.Series:
+        """Mask của một mô hình dưới dạng Series boolean"""
+        return pd.Series(self.scanner.masks(thresholds, [pattern])[0])
 
     def detect_doji(self, threshold: float = 0.1) -> pd.Series:
         """
@@ -47,8 +387,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Doji
         """
-        body_ratio = self.df['body'] / self.df['range']
-        return body_ratio < threshold
+        return self._detect('Doji', {'doji_body_ratio': threshold})
 
     def detect_hammer(self, body_threshold: float = 0.3, shadow_ratio: float = 2.0) -> pd.Series:
         """
@@ -62,14 +401,8 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Hammer
         """
-        body_ratio = self.df['body'] / self.df['range']
-        lower_shadow_ratio = self.df['lower_shadow'] / (self.df['body'] + 0.0001)  # Tránh chia cho 0
-
-        return (
-            (body_ratio < body_threshold) &
-            (lower_shadow_ratio > shadow_ratio) &
-            (self.df['upper_shadow'] < self.df['body'])
-        )
+        return self._detect('Hammer', {'hammer_body_ratio': body_threshold,
+                                       'hammer_shadow_ratio': shadow_ratio})
 
     def detect_inverted_hammer(self, body_threshold: float = 0.3, shadow_ratio: float = 2.0) -> pd.Series:
         """
@@ -83,14 +416,8 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Inverted Hammer
         """
-        body_ratio = self.df['body'] / self.df['range']
-        upper_shadow_ratio = self.df['upper_shadow'] / (self.df['body'] + 0.0001)
-
-        return (
-            (body_ratio < body_threshold) &
-            (upper_shadow_ratio > shadow_ratio) &
-            (self.df['lower_shadow'] < self.df['body'])
-        )
+        return self._detect('Inverted_Hammer', {'inverted_hammer_body_ratio': body_threshold,
+                                                'inverted_hammer_shadow_ratio': shadow_ratio})
 
     def detect_shooting_star(self, body_threshold: float = 0.3, shadow_ratio: float = 2.0) -> pd.Series:
         """
@@ -104,7 +431,8 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Shooting Star
         """
-        return self.detect_inverted_hammer(body_threshold, shadow_ratio)
+        return self._detect('Shooting_Star', {'shooting_star_body_ratio': body_threshold,
+                                              'shooting_star_shadow_ratio': shadow_ratio})
 
     def detect_engulfing_bullish(self) -> pd.Series:
         """
@@ -114,19 +442,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Bullish Engulfing
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(1, len(self.df)):
-            prev = self.df.iloc[i-1]
-            curr = self.df.iloc[i]
-
-            # Nến trước là bearish, nến hiện tại là bullish
-            # Nến hiện tại bao phủ hoàn toàn nến trước
-            if (prev['is_bearish'] and curr['is_bullish'] and
-                curr['open'] < prev['close'] and curr['close'] > prev['open']):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Bullish_Engulfing')
 
     def detect_engulfing_bearish(self) -> pd.Series:
         """
@@ -136,19 +452,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Bearish Engulfing
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(1, len(self.df)):
-            prev = self.df.iloc[i-1]
-            curr = self.df.iloc[i]
-
-            # Nến trước là bullish, nến hiện tại là bearish
-            # Nến hiện tại bao phủ hoàn toàn nến trước
-            if (prev['is_bullish'] and curr['is_bearish'] and
-                curr['open'] > prev['close'] and curr['close'] < prev['open']):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Bearish_Engulfing')
 
     def detect_morning_star(self) -> pd.Series:
         """
@@ -158,25 +462,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Morning Star
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(2, len(self.df)):
-            candle1 = self.df.iloc[i-2]
-            candle2 = self.df.iloc[i-1]
-            candle3 = self.df.iloc[i]
-
-            # Nến 1: Bearish với body lớn
-            # Nến 2: Body nhỏ (doji hoặc gần doji)
-            # Nến 3: Bullish với body lớn
-            if (candle1['is_bearish'] and
-                candle1['body'] > candle1['range'] * 0.5 and
-                candle2['body'] < candle2['range'] * 0.3 and
-                candle3['is_bullish'] and
-                candle3['body'] > candle3['range'] * 0.5 and
-                candle3['close'] > (candle1['open'] + candle1['close']) / 2):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Morning_Star')
 
     def detect_evening_star(self) -> pd.Series:
         """
@@ -186,25 +472,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Evening Star
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(2, len(self.df)):
-            candle1 = self.df.iloc[i-2]
-            candle2 = self.df.iloc[i-1]
-            candle3 = self.df.iloc[i]
-
-            # Nến 1: Bullish với body lớn
-            # Nến 2: Body nhỏ (doji hoặc gần doji)
-            # Nến 3: Bearish với body lớn
-            if (candle1['is_bullish'] and
-                candle1['body'] > candle1['range'] * 0.5 and
-                candle2['body'] < candle2['range'] * 0.3 and
-                candle3['is_bearish'] and
-                candle3['body'] > candle3['range'] * 0.5 and
-                candle3['close'] < (candle1['open'] + candle1['close']) / 2):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Evening_Star')
 
     def detect_three_white_soldiers(self) -> pd.Series:
         """
@@ -214,20 +482,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Three White Soldiers
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(2, len(self.df)):
-            c1 = self.df.iloc[i-2]
-            c2 = self.df.iloc[i-1]
-            c3 = self.df.iloc[i]
-
-            # 3 nến tăng liên tiếp
-            if (c1['is_bullish'] and c2['is_bullish'] and c3['is_bullish'] and
-                c2['close'] > c1['close'] and c3['close'] > c2['close'] and
-                c2['open'] > c1['open'] and c3['open'] > c2['open']):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Three_White_Soldiers')
 
     def detect_three_black_crows(self) -> pd.Series:
         """
@@ -237,20 +492,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Three Black Crows
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(2, len(self.df)):
-            c1 = self.df.iloc[i-2]
-            c2 = self.df.iloc[i-1]
-            c3 = self.df.iloc[i]
-
-            # 3 nến giảm liên tiếp
-            if (c1['is_bearish'] and c2['is_bearish'] and c3['is_bearish'] and
-                c2['close'] < c1['close'] and c3['close'] < c2['close'] and
-                c2['open'] < c1['open'] and c3['open'] < c2['open']):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Three_Black_Crows')
 
     def detect_harami_bullish(self) -> pd.Series:
         """
@@ -260,19 +502,7 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Bullish Harami
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(1, len(self.df)):
-            prev = self.df.iloc[i-1]
-            curr = self.df.iloc[i]
-
-            # Nến trước bearish lớn, nến hiện tại bullish nhỏ nằm trong body nến trước
-            if (prev['is_bearish'] and curr['is_bullish'] and
-                curr['open'] > prev['close'] and curr['close'] < prev['open'] and
-                curr['body'] < prev['body'] * 0.5):
-                result.iloc[i] = True
-
-        return result
+        return self._detect('Bullish_Harami')
 
     def detect_harami_bearish(self) -> pd.Series:
         """
@@ -282,106 +512,76 @@ class CandlestickPatternDetector:
         Returns:
             Series boolean đánh dấu vị trí có Bearish Harami
         """
-        result = pd.Series([False] * len(self.df), index=self.df.index)
-
-        for i in range(1, len(self.df)):
-            prev = self.df.iloc[i-1]
-            curr = self.df.iloc[i]
-
-            # Nến trước bullish lớn, nến hiện tại bearish nhỏ nằm trong body nến trước
-            if (prev['is_bullish'] and curr['is_bearish'] and
-                curr['open'] < prev['close'] and curr['close'] > prev['open'] and
-                curr['body'] < prev['body'] * 0.5):
-                result.iloc[i] = True
+        return self._detect('Bearish_Harami')
 
-        return result
-
-    def detect_all_patterns(self) -> Dict[str, List[Dict[str, Any]]]:
+    def detect_all_patterns(self, thresholds: Optional[Dict[str, float]] = None) -> Dict[str, List[Dict[str, Any]]]:
         """
         Nhận dạng tất cả các mô hình nến Nhật
 
+        Mọi mô hình được quét trong một lượt bởi PatternScanner (đặc trưng nến chỉ tính một lần).
+
+        Args:
+            thresholds: Ngưỡng ghi đè DEFAULT_THRESHOLDS (VD: {'doji_body_ratio': 0.05})
+
         Returns:
             Dictionary chứa tất cả các mô hình được phát hiện
         """
-        patterns = {
-            'Doji': self.detect_doji(),
-            'Hammer': self.detect_hammer(),
-            'Inverted_Hammer': self.detect_inverted_hammer(),
-            'Shooting_Star': self.detect_shooting_star(),
-            'Bullish_Engulfing': self.detect_engulfing_bullish(),
-            'Bearish_Engulfing': self.detect_engulfing_bearish(),
-            'Morning_Star': self.detect_morning_star(),
-            'Evening_Star': self.detect_evening_star(),
-            'Three_White_Soldiers': self.detect_three_white_soldiers(),
-            'Three_Black_Crows': self.detect_three_black_crows(),
-            'Bullish_Harami': self.detect_harami_bullish(),
-            'Bearish_Harami': self.detect_harami_bearish()
-        }
-
-        # Chuyển đổi sang format dễ đọc
-        result = {}
-        for pattern_name, series in patterns.items():
-            detected_indices = series[series].index.tolist()
-            detected_patterns = []
-
-            for idx in detected_indices:
-                try:
-                    # Try to get date from 'time' column first
-                    if 'time' in self.df.columns:
-                        date_val = self.df.iloc[idx]['time']
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                    # Then try from index
-                    else:
-                        date_val = self.df.index[idx]
-                        if hasattr(date_val, 'strftime'):
-                            date_str = date_val.strftime('%Y-%m-%d')
-                        else:
-                            date_str = str(date_val)
-                except:
-                    date_str = str(idx)
-
-                detected_patterns.append({
-                    'date': date_str,
-                    'index': int(idx),
-                    'close': float(self.df.iloc[idx]['close']),
-                    'pattern_type': pattern_name
-                })
-
-            result[pattern_name] = detected_patterns
+        events = self.scanner.scan(thresholds)
+
+        # Chuyển đổi sang format dễ đọc (chỉ lấy ngày/giá của các bar có mô hình)
+        bars = events[:, 0]
+        dates = self.ohlcv.date_strings('%Y-%m-%d', positions=bars)
+        closes = self.ohlcv.close[bars].astype(float).tolist()
+
+        result = {name: [] for name in PATTERN_NAMES}
+        for (idx, pattern_id), date, close in zip(events.tolist(), dates, closes):
+            pattern_name = PATTERN_NAMES[pattern_id]
+            result[pattern_name].append({
+                'date': date,
+                'index': idx,
+                'close': close,
+                'pattern_type': pattern_name
+            })
 
         # Thêm summary
         result['summary'] = {
-            'total_patterns': sum(len(v) for v in result.values() if isinstance(v, list)),
+            'total_patterns': len(events),
             'patterns_found': [k for k, v in result.items() if isinstance(v, list) and len(v) > 0]
         }
 
         return result
 
-    def get_latest_patterns(self, n: int = 10) -> List[Dict[str, Any]]:
+    def get_latest_patterns(self, n: int = 10, thresholds: Optional[Dict[str, float]] = None,
+                            min_index: int = 0) -> List[Dict[str, Any]]:
         """
         Lấy n mô hình gần nhất
 
+        Quét ngược từ bar mới nhất và dừng khi đủ n mô hình (không nhận dạng toàn bộ lịch sử).
+        Thứ tự: index giảm dần, cùng index theo thứ tự PATTERN_NAMES.
+
         Args:
             n: Số lượng mô hình gần nhất cần lấy
+            thresholds: Ngưỡng ghi đè DEFAULT_THRESHOLDS
+            min_index: Bỏ qua các bar trước vị trí này
 
         Returns:
             Danh sách các mô hình gần nhất
         """
-        all_patterns = self.detect_all_patterns()
-        latest = []
+        events = PatternScanner.scan_latest(self.ohlcv, n, thresholds, min_bar=min_index)
 
-        for pattern_name, detections in all_patterns.items():
-            if pattern_name != 'summary' and isinstance(detections, list):
-                for detection in detections:
-                    latest.append({
-                        **detection,
-                        'pattern_name': pattern_name
-                    })
+        bars = events[:, 0]
+        dates = self.ohlcv.date_strings('%Y-%m-%d', positions=bars)
+        closes = self.ohlcv.close[bars].astype(float).tolist()
 
-        # Sắp xếp theo index giảm dần
-        latest.sort(key=lambda x: x['index'], reverse=True)
-
-        return latest[:n]
+        latest = []
+        for (idx, pattern_id), date, close in zip(events.tolist(), dates, closes):
+            pattern_name = PATTERN_NAMES[pattern_id]
+            latest.append({
+                'date': date,
+                'index': idx,
+                'close': close,
+                'pattern_type': pattern_name,
+                'pattern_name': pattern_name
+            })
+
+        return latest
@@ -0,0 +1,143 @@
+"""
+Module đóng gói chuỗi chỉ số dạng cột (columnar) cho response
+
+Payload dạng cột dùng chung một trục thời gian `dates` và mỗi chỉ số là một mảng float,
+NaN (giai đoạn warm-up) được giữ nguyên thành null. Hỗ trợ thêm encoding nhị phân:
+- msgpack: cần cài `msgpack`, mỗi cột là buffer little-endian (float32/float64)
+- arrow: cần cài `pyarrow`, Arrow IPC stream với null mask cho giai đoạn warm-up
+"""
+import numpy as np
+from typing import Dict, List, Any, Optional, Tuple
+
+# Các format output được hỗ trợ cho chuỗi chỉ số
+SUPPORTED_FORMATS = {'json', 'columnar', 'msgpack', 'arrow'}
+
+MEDIA_TYPES = {
+    'msgpack': 'application/x-msgpack',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Số chữ số thập phân mặc định khi trả JSON ở chế độ float32
+FLOAT32_DECIMALS = 4
+
+
+def validate_format(output_format: str) -> str:
+    """
+    Kiểm tra format output
+
+    Raises:
+        ValueError nếu format không được hỗ trợ
+    """
+    output_format = (output_format or 'json').strip().lower()
+    if output_format not in SUPPORTED_FORMATS:
+        raise ValueError(
+            f"Invalid format: '{output_format}'. Supported: {', '.join(sorted(SUPPORTED_FORMATS))}"
+        )
+    return output_format
+
+
+def _column_to_list(values: np.ndarray, decimals: Optional[int]) -> List[Optional[float]]:
+    """Chuyển mảng float sang list, NaN -> None"""
+    values = values.astype(np.float64)
+    if decimals is not None:
+        values = np.round(values, decimals)
+    mask = np.isnan(values)
+    if not mask.any():
+        return values.tolist()
+    out = values.astype(object)
+    out[mask] = None
+    return out.tolist()
+
+
+def to_columnar_json(dates: List[str], columns: Dict[str, np.ndarray],
+                     float32: bool = False, decimals: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Tạo payload JSON dạng cột
+
+    Args:
+        dates: Trục thời gian dùng chung
+        columns: Dictionary {tên chỉ số: mảng giá trị}
+        float32: Làm tròn về độ chính xác float32 (mặc định 4 chữ số thập phân)
+        decimals: Số chữ số thập phân (ghi đè mặc định của float32)
+
+    Returns:
+        Dictionary {'dates': [...], 'columns': {...}, 'dtype': ...}
+    """
+    if float32 and decimals is None:
+        decimals = FLOAT32_DECIMALS
+
+    return {
+        'dates': dates,
+        'dtype': 'float32' if float32 else 'float64',
+        'columns': {name: _column_to_list(values, decimals) for name, values in columns.items()}
+    }
+
+
+def encode_msgpack(dates: List[str], columns: Dict[str, np.ndarray],
+                   float32: bool = False, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Encode payload dạng cột sang MessagePack
+
+    Mỗi cột là raw buffer little-endian, client đọc bằng np.frombuffer(buf, dtype).
+    NaN được giữ nguyên trong buffer.
+    """
+    try:
+        import msgpack
+    except ImportError:
+        raise ValueError("Format 'msgpack' requires the 'msgpack' package to be installed")
+
+    dtype = np.dtype('<f4') if float32 else np.dtype('<f8')
+    payload = {
+        **(metadata or {}),
+        'dates': dates,
+        'dtype': dtype.str,
+        'columns': {name: np.ascontiguousarray(values, dtype=dtype).tobytes()
+                    for name, values in columns.items()}
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def encode_arrow(dates: List[str], columns: Dict[str, np.ndarray],
+                 float32: bool = False, metadata: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    Encode payload dạng cột sang Arrow IPC stream
+
+    NaN trong giai đoạn warm-up được chuyển thành null.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ValueError("Format 'arrow' requires the 'pyarrow' package to be installed")
+
+    arrow_type = pa.float32() if float32 else pa.float64()
+    arrays = [pa.array(dates, type=pa.string())]
+    names = ['date']
+    for name, values in columns.items():
+        arrays.append(pa.array(values, type=arrow_type, from_pandas=True))
+        names.append(name)
+
+    table = pa.Table.from_arrays(arrays, names=names)
+    if metadata:
+        table = table.replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_binary(output_format: str, dates: List[str], columns: Dict[str, np.ndarray],
+                  float32: bool = False, metadata: Optional[Dict[str, Any]] = None) -> Tuple[bytes, str]:
+    """
+    Encode payload dạng cột sang format nhị phân
+
+    Returns:
+        Tuple (nội dung bytes, media type)
+    """
+    if output_format == 'msgpack':
+        content = encode_msgpack(dates, columns, float32, metadata)
+    elif output_format == 'arrow':
+        content = encode_arrow(dates, columns, float32, metadata)
+    else:
+        raise ValueError(f"Format '{output_format}' is not a binary format")
+    return content, MEDIA_TYPES[output_format]
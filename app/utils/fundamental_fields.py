@@ -0,0 +1,350 @@
+"""
+Bảng ánh xạ trường dữ liệu báo cáo tài chính theo nguồn (source) và ngôn ngữ
+
+Thay vì dò tên dòng/cột bằng vòng lặp lồng nhau ở mỗi lần gọi, vị trí của mọi trường được
+phân giải một lần cho mỗi schema (tập tên cột/dòng của DataFrame upstream) và cache theo
+fingerprint của schema. Các mã cùng nguồn/ngôn ngữ có cùng schema nên dùng chung kết quả.
+
+Kỳ "gần nhất" được chọn nhất quán theo cột năm/kỳ nếu có (thay vì iloc[0] hoặc iloc[:, -1]
+tùy báo cáo).
+"""
+import hashlib
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Tên trường có thể gặp trong từng báo cáo, theo nguồn và ngôn ngữ (ưu tiên theo thứ tự)
+SOURCE_FIELD_CANDIDATES: Dict[str, Dict[str, Dict[str, Dict[str, List[Any]]]]] = {
+    'VCI': {
+        'balance_sheet': {
+            'total_assets': {
+                'vi': ['Tổng tài sản', 'TÀI SẢN', 'TỔNG CỘNG TÀI SẢN (Tỷ đồng)'],
+                'en': ['Total Assets', 'TOTAL ASSETS (Bn. VND)'],
+            },
+            'current_assets': {
+                'vi': ['Tài sản ngắn hạn', 'TÀI SẢN NGẮN HẠN', 'TÀI SẢN NGẮN HẠN (Tỷ đồng)'],
+                'en': ['Current Assets', 'CURRENT ASSETS (Bn. VND)'],
+            },
+            'current_liabilities': {
+                'vi': ['Nợ ngắn hạn', 'NỢ NGẮN HẠN', 'Nợ ngắn hạn (Tỷ đồng)'],
+                'en': ['Current Liabilities', 'Current liabilities (Bn. VND)'],
+            },
+            'total_debt': {
+                'vi': ['Tổng nợ', 'TỔNG NỢ PHẢI TRẢ', 'NỢ PHẢI TRẢ (Tỷ đồng)'],
+                'en': ['Total Debt', 'LIABILITIES (Bn. VND)'],
+            },
+            'shareholders_equity': {
+                'vi': ['Vốn chủ sở hữu', 'VỐN CHỦ SỞ HỮU', 'VỐN CHỦ SỞ HỮU (Tỷ đồng)'],
+                'en': ['Shareholders Equity', "OWNER'S EQUITY(Bn.VND)"],
+            },
+        },
+        'income_statement': {
+            'revenue': {
+                'vi': ['Doanh thu', 'DOANH THU BÁN HÀNG', 'Doanh thu thuần'],
+                'en': ['Revenue', 'Net Sales', 'Revenue (Bn. VND)'],
+            },
+            'net_income': {
+                'vi': ['Lợi nhuận sau thuế', 'LỢI NHUẬN SAU THUẾ',
+                       'Lợi nhuận sau thuế của Cổ đông công ty mẹ (Tỷ đồng)'],
+                'en': ['Net Income', 'Attribute to parent company (Bn. VND)', 'Net Profit For the Year'],
+            },
+            'ebitda': {
+                'vi': ['EBITDA', 'Lợi nhuận trước thuế và lãi vay'],
+                'en': ['EBITDA'],
+            },
+            'gross_profit': {
+                'vi': ['Lợi nhuận gộp', 'Lãi gộp'],
+                'en': ['Gross Profit'],
+            },
+        },
+        'cash_flow': {
+            'operating_cash_flow': {
+                'vi': ['Lưu chuyển tiền tệ ròng từ các hoạt động SXKD',
+                       'Lưu chuyển tiền từ hoạt động kinh doanh'],
+                'en': ['Operating Cash Flow', 'OCF', 'Net cash inflows/outflows from operating activities'],
+            },
+            'investing_cash_flow': {
+                'vi': ['Lưu chuyển từ hoạt động đầu tư', 'Lưu chuyển tiền từ hoạt động đầu tư'],
+                'en': ['Investing Cash Flow', 'Net Cash Flows from Investing Activities'],
+            },
+            'financing_cash_flow': {
+                'vi': ['Lưu chuyển tiền từ hoạt động tài chính'],
+                'en': ['Financing Cash Flow', 'Cash flows from financial activities'],
+            },
+            'capital_expenditure': {
+                'vi': ['Mua sắm TSCĐ', 'Chi phí vốn'],
+                'en': ['Capital Expenditure', 'CAPEX', 'Purchase of fixed assets'],
+            },
+        },
+        'ratio': {
+            'EPS': {'vi': [('Chỉ tiêu định giá', 'EPS (VND)')], 'en': [('Valuation', 'EPS')]},
+            'PE': {'vi': [('Chỉ tiêu định giá', 'P/E')], 'en': [('Valuation', 'P/E')]},
+            'PB': {'vi': [('Chỉ tiêu định giá', 'P/B')], 'en': [('Valuation', 'P/B')]},
+            'PS': {'vi': [('Chỉ tiêu định giá', 'P/S')], 'en': [('Valuation', 'P/S')]},
+            'PCF': {'vi': [('Chỉ tiêu định giá', 'P/Cash Flow')], 'en': [('Valuation', 'P/CF')]},
+            'BVPS': {'vi': [('Chỉ tiêu định giá', 'BVPS (VND)')], 'en': [('Valuation', 'BVPS')]},
+            'EV_EBITDA': {'vi': [('Chỉ tiêu định giá', 'EV/EBITDA')], 'en': [('Valuation', 'EV/EBITDA')]},
+            'ROE': {'vi': [('Chỉ tiêu khả năng sinh lợi', 'ROE (%)')], 'en': [('Profitability', 'ROE')]},
+            'ROA': {'vi': [('Chỉ tiêu khả năng sinh lợi', 'ROA (%)')], 'en': [('Profitability', 'ROA')]},
+            'ROIC': {'vi': [('Chỉ tiêu khả năng sinh lợi', 'ROIC (%)')], 'en': [('Profitability', 'ROIC')]},
+            'NPM': {
+                'vi': [('Chỉ tiêu khả năng sinh lợi', 'Biên lợi nhuận ròng (%)')],
+                'en': [('Profitability', 'Net Profit Margin')],
+            },
+            'GPM': {
+                'vi': [('Chỉ tiêu khả năng sinh lợi', 'Biên lợi nhuận gộp (%)')],
+                'en': [('Profitability', 'Gross Profit Margin')],
+            },
+            'EBIT_MARGIN': {
+                'vi': [('Chỉ tiêu khả năng sinh lợi', 'Biên EBIT (%)')],
+                'en': [('Profitability', 'EBIT Margin')],
+            },
+            'EBITDA': {
+                'vi': [('Chỉ tiêu khả năng sinh lợi', 'EBITDA (Tỷ đồng)')],
+                'en': [('Profitability', 'EBITDA')],
+            },
+            'EBIT': {'vi': [('Chỉ tiêu khả năng sinh lợi', 'EBIT (Tỷ đồng)')], 'en': [('Profitability', 'EBIT')]},
+            'DE': {'vi': [('Chỉ tiêu cơ cấu nguồn vốn', 'Nợ/VCSH')], 'en': [('Capital Structure', 'D/E')]},
+            'CR': {
+                'vi': [('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán hiện thời')],
+                'en': [('Liquidity', 'Current Ratio')],
+            },
+            'QUICK_RATIO': {
+                'vi': [('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán nhanh')],
+                'en': [('Liquidity', 'Quick Ratio')],
+            },
+            'CASH_RATIO': {
+                'vi': [('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán tiền mặt')],
+                'en': [('Liquidity', 'Cash Ratio')],
+            },
+            'DY': {
+                'vi': [('Chỉ tiêu khả năng sinh lợi', 'Tỷ suất cổ tức (%)'),
+                       ('Chỉ tiêu định giá', 'Tỷ suất cổ tức (%)')],
+                'en': [('Valuation', 'Dividend Yield')],
+            },
+            'MARKET_CAP': {
+                'vi': [('Chỉ tiêu định giá', 'Vốn hóa (Tỷ đồng)')],
+                'en': [('Valuation', 'Market Cap')],
+            },
+            'SHARES_OUTSTANDING': {
+                'vi': [('Chỉ tiêu định giá', 'Số CP lưu hành (Triệu CP)')],
+                'en': [('Valuation', 'Shares Outstanding')],
+            },
+        },
+    },
+}
+
+# Cột năm / kỳ báo cáo dùng để xác định kỳ gần nhất
+YEAR_COLUMNS = ['yearReport', 'Năm', 'year', ('Meta', 'Năm'), ('Meta', 'yearReport')]
+PERIOD_COLUMNS = ['lengthReport', 'Kỳ', 'quarter', ('Meta', 'Kỳ'), ('Meta', 'lengthReport')]
+
+DEFAULT_SOURCE = 'VCI'
+
+# Số schema được giữ trong cache (báo cáo dạng cột có tên cột là các kỳ, nên mỗi kỳ
+# báo cáo mới tạo ra một fingerprint mới)
+SCHEMA_CACHE_SIZE = 256
+
+_schema_cache: Dict[str, 'StatementSchema'] = {}
+_schema_lock = Lock()
+
+
+def field_candidates(statement: str, source: str = DEFAULT_SOURCE, lang: str = 'vi') -> Dict[str, List[Any]]:
+    """
+    Danh sách tên ứng viên của từng trường, ngôn ngữ yêu cầu trước rồi đến ngôn ngữ còn lại
+
+    Nguồn chưa có bảng riêng dùng bảng của DEFAULT_SOURCE.
+    """
+    fields = SOURCE_FIELD_CANDIDATES.get(source, SOURCE_FIELD_CANDIDATES[DEFAULT_SOURCE])[statement]
+    result = {}
+    for field, by_lang in fields.items():
+        ordered = list(by_lang.get(lang, []))
+        for other_lang, names in by_lang.items():
+            if other_lang != lang:
+                ordered.extend(names)
+        result[field] = ordered
+    return result
+
+
+class StatementSchema:
+    """
+    Vị trí đã phân giải của các trường trong một schema báo cáo
+
+    orientation = 'rows': mỗi dòng là một kỳ, trường nằm ở cột (vnstock 3.x)
+    orientation = 'columns': mỗi cột là một kỳ, trường nằm ở index
+    """
+
+    __slots__ = ('statement', 'orientation', 'fields', 'positions', 'year_position', 'period_position')
+
+    def __init__(self, statement: str, orientation: str, fields: List[str], positions: List[int],
+                 year_position: Optional[int], period_position: Optional[int]):
+        self.statement = statement
+        self.orientation = orientation
+        self.fields = fields
+        self.positions = positions
+        self.year_position = year_position
+        self.period_position = period_position
+
+    def period_order(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Vị trí các kỳ từ mới nhất đến cũ nhất
+
+        Dùng cột năm/kỳ nếu có; nếu không, giữ quy ước của vnstock: dòng đầu là kỳ mới nhất
+        (orientation 'rows'), cột cuối là kỳ mới nhất (orientation 'columns').
+        """
+        count = len(df) if self.orientation == 'rows' else len(df.columns)
+        if self.orientation == 'rows' and self.year_position is not None:
+            year = pd.to_numeric(df.iloc[:, self.year_position], errors='coerce').fillna(0).to_numpy()
+            period = np.zeros(count)
+            if self.period_position is not None:
+                period = pd.to_numeric(df.iloc[:, self.period_position], errors='coerce').fillna(0).to_numpy()
+            # Sắp xếp ổn định giảm dần theo (năm, kỳ)
+            return np.lexsort((np.arange(count), -period, -year))
+        if self.orientation == 'rows':
+            return np.arange(count)
+        return np.arange(count)[::-1]
+
+    def extract(self, df: pd.DataFrame, periods: Optional[int] = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lấy giá trị của mọi trường đã phân giải trong một lần chọn
+
+        Args:
+            df: DataFrame có cùng schema
+            periods: Số kỳ gần nhất cần lấy (None = tất cả)
+
+        Returns:
+            Tuple (mảng float shape (số kỳ, số trường) từ mới đến cũ, vị trí các kỳ đã lấy)
+        """
+        order = self.period_order(df)
+        if periods is not None:
+            order = order[:periods]
+        if self.orientation == 'rows':
+            block = df.iloc[order, self.positions]
+        else:
+            block = df.iloc[self.positions, order].T
+        try:
+            values = block.to_numpy(dtype=np.float64, na_value=np.nan)
+        except (TypeError, ValueError):
+            values = block.apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        return values, order
+
+    def latest(self, df: pd.DataFrame, periods: int = 1) -> List[Dict[str, float]]:
+        """Các kỳ gần nhất dạng dict {trường: giá trị} (NaN giữ nguyên)"""
+        values, _ = self.extract(df, periods)
+        return [dict(zip(self.fields, row.tolist())) for row in values]
+
+    def period_keys(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Năm và kỳ (quý) của từng kỳ theo vị trí trong DataFrame
+
+        Orientation 'rows' đọc từ cột năm/kỳ; orientation 'columns' đọc từ nhãn cột
+        (vd. '2023', 'Q1/2023', '2023-Q1'). Kỳ không xác định được năm mang NaN.
+
+        Returns:
+            DataFrame hai cột 'year', 'quarter' (float)
+        """
+        if self.orientation == 'rows':
+            count = len(df)
+            year = (pd.to_numeric(df.iloc[:, self.year_position], errors='coerce')
+                    if self.year_position is not None else pd.Series(np.nan, index=range(count)))
+            quarter = (pd.to_numeric(df.iloc[:, self.period_position], errors='coerce')
+                       if self.period_position is not None else pd.Series(np.nan, index=range(count)))
+            return pd.DataFrame({'year': year.to_numpy(dtype=np.float64),
+                                 'quarter': quarter.to_numpy(dtype=np.float64)})
+
+        labels = pd.Series(df.columns.map(str))
+        year = pd.to_numeric(labels.str.extract(r'((?:19|20)\d{2})')[0], errors='coerce')
+        quarter = pd.to_numeric(labels.str.extract(r'[Qq]\s*([1-4])')[0], errors='coerce')
+        return pd.DataFrame({'year': year.to_numpy(dtype=np.float64),
+                             'quarter': quarter.to_numpy(dtype=np.float64)})
+
+    def period_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Toàn bộ các kỳ của báo cáo dạng bảng kỳ x trường (một lần chọn dòng)
+
+        Returns:
+            DataFrame các cột 'year', 'quarter' và các trường đã phân giải, bỏ các kỳ không rõ năm
+        """
+        values, order = self.extract(df, periods=None)
+        keys = self.period_keys(df).iloc[order].reset_index(drop=True)
+        frame = pd.concat([keys, pd.DataFrame(values, columns=self.fields)], axis=1)
+        return frame[frame['year'].notna()]
+
+
+def _fingerprint(df: pd.DataFrame, statement: str, source: str, lang: str) -> str:
+    """Fingerprint của schema: tên cột (và index nếu trường nằm ở index)"""
+    digest = hashlib.md5()
+    digest.update(f"{source}|{lang}|{statement}|".encode())
+    digest.update(repr(tuple(df.columns)).encode())
+    if not isinstance(df.index, pd.RangeIndex):
+        digest.update(b'|index|')
+        digest.update(repr(tuple(df.index)).encode())
+    return digest.hexdigest()
+
+
+def _first_position(labels: pd.Index, candidates: List[Any]) -> Optional[int]:
+    """Vị trí của ứng viên đầu tiên có trong labels (None nếu không có)"""
+    for name in candidates:
+        if name in labels:
+            position = labels.get_loc(name)
+            if isinstance(position, (int, np.integer)):
+                return int(position)
+            # Tên trùng lặp: lấy vị trí đầu tiên
+            return int(np.flatnonzero(np.asarray(position))[0]) if not isinstance(position, slice) \
+                else position.start
+    return None
+
+
+def resolve_schema(df: pd.DataFrame, statement: str, source: str = DEFAULT_SOURCE,
+                   lang: str = 'vi') -> StatementSchema:
+    """
+    Phân giải vị trí các trường của báo cáo (cache theo fingerprint của schema)
+
+    Args:
+        df: DataFrame báo cáo từ vnstock
+        statement: 'balance_sheet', 'income_statement', 'cash_flow' hoặc 'ratio'
+        source: Nguồn dữ liệu (VCI, TCBS...)
+        lang: Ngôn ngữ của báo cáo ('vi' hoặc 'en')
+
+    Returns:
+        StatementSchema
+    """
+    key = _fingerprint(df, statement, source, lang)
+    schema = _schema_cache.get(key)
+    if schema is not None:
+        return schema
+
+    candidates = field_candidates(statement, source, lang)
+
+    # Trường nằm ở cột hay ở index: chọn hướng khớp được nhiều trường hơn (ưu tiên cột)
+    by_column = {f: _first_position(df.columns, names) for f, names in candidates.items()}
+    by_index = {f: _first_position(df.index, names) for f, names in candidates.items()}
+    column_hits = sum(p is not None for p in by_column.values())
+    index_hits = sum(p is not None for p in by_index.values())
+
+    if index_hits > column_hits:
+        orientation, found = 'columns', by_index
+    else:
+        orientation, found = 'rows', by_column
+
+    fields = [f for f, p in found.items() if p is not None]
+    schema = StatementSchema(
+        statement=statement,
+        orientation=orientation,
+        fields=fields,
+        positions=[found[f] for f in fields],
+        year_position=_first_position(df.columns, YEAR_COLUMNS),
+        period_position=_first_position(df.columns, PERIOD_COLUMNS),
+    )
+
+    with _schema_lock:
+        if len(_schema_cache) >= SCHEMA_CACHE_SIZE:
+            _schema_cache.pop(next(iter(_schema_cache)))
+        _schema_cache[key] = schema
+    return schema
+
+
+def get_schema_cache_stats() -> Dict[str, int]:
+    """Số schema đang được cache"""
+    return {'schemas': len(_schema_cache)}
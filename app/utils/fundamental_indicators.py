@@ -3,22 +3,50 @@ Module tính toán các chỉ số cơ bản và tài chính (Fundamental Indica
 """
 import pandas as pd
 import numpy as np
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
+
+from .fundamental_fields import DEFAULT_SOURCE, field_candidates, resolve_schema
+from .ohlcv import OHLCVFrame
+
+# Các trường báo cáo cần cho chuỗi chỉ số theo kỳ
+HISTORY_INPUTS = [
+    'revenue', 'net_income', 'gross_profit', 'total_assets', 'current_assets', 'current_liabilities',
+    'total_debt', 'shareholders_equity', 'operating_cash_flow', 'capital_expenditure',
+    'ratio_eps', 'ratio_bvps', 'ratio_shares'
+]
+
+# Các chỉ số theo kỳ (calculate_historical_indicators, bảng fundamental_period)
+HISTORY_METRICS = [
+    'revenue', 'net_income', 'revenue_ttm', 'net_income_ttm', 'total_assets', 'shareholders_equity',
+    'total_debt', 'operating_cash_flow', 'fcf', 'eps_ttm', 'bvps', 'sps', 'roe', 'roe_ttm', 'roa_ttm',
+    'de', 'current_ratio', 'gross_margin', 'npm', 'revenue_growth', 'net_income_growth', 'eps_growth'
+]
+
+
+def _value_or_zero(value: Optional[float]) -> float:
+    """Giá trị thiếu hoặc NaN được coi là 0 (như các báo cáo fallback)"""
+    return float(value) if value is not None and pd.notna(value) else 0
 
 
 class FundamentalAnalyzer:
     """Class phân tích cơ bản"""
 
-    def __init__(self, financial_data: Dict[str, Any], price_data: Optional[pd.DataFrame] = None):
+    def __init__(self, financial_data: Dict[str, Any],
+                 price_data: Optional[Union[pd.DataFrame, OHLCVFrame]] = None,
+                 source: str = DEFAULT_SOURCE, lang: str = 'vi'):
         """
         Khởi tạo với dữ liệu tài chính
 
         Args:
             financial_data: Dictionary chứa dữ liệu tài chính từ vnstock
-            price_data: DataFrame chứa dữ liệu giá (optional)
+            price_data: DataFrame hoặc OHLCVFrame chứa dữ liệu giá (optional)
+            source: Nguồn của báo cáo (chọn bảng ánh xạ tên trường)
+            lang: Ngôn ngữ của báo cáo ('vi' hoặc 'en')
         """
         self.financial_data = financial_data
-        self.price_data = price_data
+        self.source = source
+        self.lang = lang
+        self.price_data = OHLCVFrame.ensure(price_data) if price_data is not None else None
 
     @staticmethod
     def safe_divide(numerator: float, denominator: float, default: float = 0.0) -> float:
@@ -238,6 +266,19 @@ class FundamentalAnalyzer:
         """
         return operating_cash_flow - capital_expenditure
 
+    def _latest_fields(self, statement_df: pd.DataFrame, statement: str,
+                       periods: int = 1) -> List[Dict[str, float]]:
+        """
+        Lấy các trường của `periods` kỳ gần nhất trong một lần chọn dòng
+
+        Vị trí các trường được phân giải một lần cho mỗi schema (xem fundamental_fields).
+
+        Returns:
+            Danh sách dict {trường: giá trị} từ kỳ mới nhất đến cũ hơn
+        """
+        schema = resolve_schema(statement_df, statement, self.source, self.lang)
+        return schema.latest(statement_df, periods)
+
     def extract_from_balance_sheet(self, balance_sheet: pd.DataFrame) -> Dict[str, float]:
         """
         Trích xuất dữ liệu từ bảng cân đối kế toán
@@ -252,29 +293,11 @@ class FundamentalAnalyzer:
             return {}
 
         try:
-            # Lấy dữ liệu kỳ gần nhất (cột cuối cùng)
-            latest_data = balance_sheet.iloc[:, -1]
-
-            result = {}
-
-            # Mapping các chỉ tiêu (cần điều chỉnh theo cấu trúc thực tế của vnstock)
-            mappings = {
-                'total_assets': ['Tổng tài sản', 'Total Assets', 'TÀI SẢN'],
-                'current_assets': ['Tài sản ngắn hạn', 'Current Assets', 'TÀI SẢN NGẮN HẠN'],
-                'current_liabilities': ['Nợ ngắn hạn', 'Current Liabilities', 'NỢ NGẮN HẠN'],
-                'total_debt': ['Tổng nợ', 'Total Debt', 'TỔNG NỢ PHẢI TRẢ'],
-                'shareholders_equity': ['Vốn chủ sở hữu', 'Shareholders Equity', 'VỐN CHỦ SỞ HỮU']
+            latest = self._latest_fields(balance_sheet, 'balance_sheet')[0]
+            return {
+                key: _value_or_zero(latest.get(key))
+                for key in field_candidates('balance_sheet', self.source, self.lang)
             }
-
-            for key, possible_names in mappings.items():
-                for name in possible_names:
-                    if name in balance_sheet.index:
-                        result[key] = float(latest_data[name]) if pd.notna(latest_data[name]) else 0
-                        break
-                if key not in result:
-                    result[key] = 0
-
-            return result
         except Exception as e:
             print(f"Error extracting balance sheet data: {e}")
             return {}
@@ -287,35 +310,21 @@ class FundamentalAnalyzer:
             income_statement: DataFrame báo cáo kết quả kinh doanh
 
         Returns:
-            Dictionary chứa các chỉ số từ BCKQKD
+            Dictionary chứa các chỉ số từ BCKQKD (kèm previous_* của kỳ trước nếu có)
         """
         if income_statement is None or income_statement.empty:
             return {}
 
         try:
-            # Lấy dữ liệu kỳ gần nhất và kỳ trước
-            latest_data = income_statement.iloc[:, -1]
-            previous_data = income_statement.iloc[:, -2] if len(income_statement.columns) > 1 else None
+            # Kỳ gần nhất và kỳ trước
+            periods = self._latest_fields(income_statement, 'income_statement', periods=2)
+            latest = periods[0]
 
             result = {}
-
-            # Mapping các chỉ tiêu
-            mappings = {
-                'revenue': ['Doanh thu', 'Revenue', 'DOANH THU BÁN HÀNG'],
-                'net_income': ['Lợi nhuận sau thuế', 'Net Income', 'LỢI NHUẬN SAU THUẾ'],
-                'ebitda': ['EBITDA', 'Lợi nhuận trước thuế và lãi vay'],
-                'gross_profit': ['Lợi nhuận gộp', 'Gross Profit']
-            }
-
-            for key, possible_names in mappings.items():
-                for name in possible_names:
-                    if name in income_statement.index:
-                        result[key] = float(latest_data[name]) if pd.notna(latest_data[name]) else 0
-                        if previous_data is not None and name in income_statement.index:
-                            result[f'previous_{key}'] = float(previous_data[name]) if pd.notna(previous_data[name]) else 0
-                        break
-                if key not in result:
-                    result[key] = 0
+            for key in field_candidates('income_statement', self.source, self.lang):
+                result[key] = _value_or_zero(latest.get(key))
+                if len(periods) > 1 and key in latest:
+                    result[f'previous_{key}'] = _value_or_zero(periods[1][key])
 
             return result
         except Exception as e:
@@ -336,46 +345,11 @@ class FundamentalAnalyzer:
             return {}
 
         try:
-            # Lấy dữ liệu kỳ gần nhất (dòng đầu tiên)
-            latest_data = cash_flow.iloc[0]
-
-            result = {}
-
-            # Mapping các chỉ tiêu
-            mappings = {
-                'operating_cash_flow': [
-                    'Lưu chuyển tiền tệ ròng từ các hoạt động SXKD',
-                    'Lưu chuyển tiền từ hoạt động kinh doanh',
-                    'Operating Cash Flow',
-                    'OCF'
-                ],
-                'investing_cash_flow': [
-                    'Lưu chuyển từ hoạt động đầu tư',
-                    'Lưu chuyển tiền từ hoạt động đầu tư',
-                    'Investing Cash Flow'
-                ],
-                'financing_cash_flow': [
-                    'Lưu chuyển tiền từ hoạt động tài chính',
-                    'Financing Cash Flow'
-                ],
-                'capital_expenditure': [
-                    'Mua sắm TSCĐ',
-                    'Chi phí vốn',
-                    'Capital Expenditure',
-                    'CAPEX'
-                ]
+            latest = self._latest_fields(cash_flow, 'cash_flow')[0]
+            return {
+                key: _value_or_zero(latest.get(key))
+                for key in field_candidates('cash_flow', self.source, self.lang)
             }
-
-            # Tìm trong columns thay vì index
-            for key, possible_names in mappings.items():
-                for name in possible_names:
-                    if name in cash_flow.columns:
-                        result[key] = float(latest_data[name]) if pd.notna(latest_data[name]) else 0
-                        break
-                if key not in result:
-                    result[key] = 0
-
-            return result
         except Exception as e:
             print(f"Error extracting cash flow data: {e}")
             return {}
@@ -388,121 +362,14 @@ class FundamentalAnalyzer:
             ratio_df: DataFrame chứa các chỉ số tài chính từ vnstock
 
         Returns:
-            Dictionary chứa các chỉ số tài chính
+            Dictionary chứa các chỉ số tài chính (chỉ các chỉ số có giá trị)
         """
         if ratio_df is None or ratio_df.empty:
             return {}
 
         try:
-            result = {}
-
-            # Lấy dòng gần nhất (dòng đầu tiên)
-            latest_row = ratio_df.iloc[0]
-
-            # Mapping các chỉ tiêu với multi-level column names
-            # Format: (category, indicator_name)
-            mappings = {
-                'EPS': [
-                    ('Chỉ tiêu định giá', 'EPS (VND)'),
-                    ('Valuation', 'EPS'),
-                ],
-                'PE': [
-                    ('Chỉ tiêu định giá', 'P/E'),
-                    ('Valuation', 'P/E'),
-                ],
-                'PB': [
-                    ('Chỉ tiêu định giá', 'P/B'),
-                    ('Valuation', 'P/B'),
-                ],
-                'PS': [
-                    ('Chỉ tiêu định giá', 'P/S'),
-                    ('Valuation', 'P/S'),
-                ],
-                'PCF': [
-                    ('Chỉ tiêu định giá', 'P/Cash Flow'),
-                    ('Valuation', 'P/CF'),
-                ],
-                'BVPS': [
-                    ('Chỉ tiêu định giá', 'BVPS (VND)'),
-                    ('Valuation', 'BVPS'),
-                ],
-                'EV_EBITDA': [
-                    ('Chỉ tiêu định giá', 'EV/EBITDA'),
-                    ('Valuation', 'EV/EBITDA'),
-                ],
-                'ROE': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'ROE (%)'),
-                    ('Profitability', 'ROE'),
-                ],
-                'ROA': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'ROA (%)'),
-                    ('Profitability', 'ROA'),
-                ],
-                'ROIC': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'ROIC (%)'),
-                    ('Profitability', 'ROIC'),
-                ],
-                'NPM': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'Biên lợi nhuận ròng (%)'),
-                    ('Profitability', 'Net Profit Margin'),
-                ],
-                'GPM': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'Biên lợi nhuận gộp (%)'),
-                    ('Profitability', 'Gross Profit Margin'),
-                ],
-                'EBIT_MARGIN': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'Biên EBIT (%)'),
-                    ('Profitability', 'EBIT Margin'),
-                ],
-                'EBITDA': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'EBITDA (Tỷ đồng)'),
-                    ('Profitability', 'EBITDA'),
-                ],
-                'EBIT': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'EBIT (Tỷ đồng)'),
-                    ('Profitability', 'EBIT'),
-                ],
-                'DE': [
-                    ('Chỉ tiêu cơ cấu nguồn vốn', 'Nợ/VCSH'),
-                    ('Capital Structure', 'D/E'),
-                ],
-                'CR': [
-                    ('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán hiện thời'),
-                    ('Liquidity', 'Current Ratio'),
-                ],
-                'QUICK_RATIO': [
-                    ('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán nhanh'),
-                    ('Liquidity', 'Quick Ratio'),
-                ],
-                'CASH_RATIO': [
-                    ('Chỉ tiêu thanh khoản', 'Chỉ số thanh toán tiền mặt'),
-                    ('Liquidity', 'Cash Ratio'),
-                ],
-                'DY': [
-                    ('Chỉ tiêu khả năng sinh lợi', 'Tỷ suất cổ tức (%)'),
-                    ('Chỉ tiêu định giá', 'Tỷ suất cổ tức (%)'),
-                    ('Valuation', 'Dividend Yield'),
-                ],
-                'MARKET_CAP': [
-                    ('Chỉ tiêu định giá', 'Vốn hóa (Tỷ đồng)'),
-                    ('Valuation', 'Market Cap'),
-                ],
-                'SHARES_OUTSTANDING': [
-                    ('Chỉ tiêu định giá', 'Số CP lưu hành (Triệu CP)'),
-                    ('Valuation', 'Shares Outstanding'),
-                ],
-            }
-
-            # Extract data từ multi-level columns
-            for key, possible_columns in mappings.items():
-                for col in possible_columns:
-                    if col in ratio_df.columns:
-                        value = latest_row[col]
-                        if pd.notna(value):
-                            result[key] = float(value)
-                            break
-
-            return result
+            latest = self._latest_fields(ratio_df, 'ratio')[0]
+            return {key: value for key, value in latest.items() if pd.notna(value)}
         except Exception as e:
             print(f"Error extracting ratio data: {e}")
             return {}
@@ -597,3 +464,118 @@ class FundamentalAnalyzer:
                 result[indicator] = round(ratio_data[indicator], 2) if ratio_data[indicator] else None
 
         return result
+
+    def _period_table(self, period: str) -> pd.DataFrame:
+        """
+        Ghép toàn bộ các kỳ của các báo cáo theo (năm, quý), sắp xếp tăng dần
+
+        Báo cáo năm dùng quarter = 0; báo cáo quý bỏ các kỳ không rõ quý.
+        """
+        frames = []
+        for statement in ('balance_sheet', 'income_statement', 'cash_flow', 'ratio'):
+            statement_df = self.financial_data.get(statement)
+            if statement_df is None or statement_df.empty:
+                continue
+            try:
+                frame = resolve_schema(statement_df, statement, self.source, self.lang).period_frame(statement_df)
+            except Exception as e:
+                print(f"Error reading {statement} periods: {e}")
+                continue
+
+            if statement == 'ratio':
+                frame = frame.reindex(columns=['year', 'quarter', 'EPS', 'BVPS', 'SHARES_OUTSTANDING'])
+                frame.columns = ['year', 'quarter', 'ratio_eps', 'ratio_bvps', 'ratio_shares']
+            if period == 'year':
+                frame = frame.assign(quarter=0.0)
+            else:
+                frame = frame[frame['quarter'].between(1, 4)]
+            frames.append(frame.drop_duplicates(['year', 'quarter']).set_index(['year', 'quarter']))
+
+        if not frames:
+            return pd.DataFrame()
+        table = pd.concat(frames, axis=1, join='outer').sort_index()
+        return table.reindex(columns=table.columns.union(HISTORY_INPUTS, sort=False))
+
+    def calculate_historical_indicators(self, period: str = 'year',
+                                        shares_outstanding: Optional[float] = None) -> pd.DataFrame:
+        """
+        Tính các chỉ số cơ bản cho mọi kỳ báo cáo trong một lượt vector hóa
+
+        Các báo cáo được căn theo (năm, quý). Chỉ số TTM là tổng 4 quý liên tiếp (báo cáo
+        năm: chính giá trị năm), tăng trưởng là so với cùng kỳ năm trước.
+
+        Args:
+            period: Loại kỳ của báo cáo ('year' hoặc 'quarter')
+            shares_outstanding: Số cổ phiếu lưu hành, dùng khi bảng ratio không có
+
+        Returns:
+            DataFrame các cột 'year', 'quarter' và HISTORY_METRICS, kỳ cũ nhất trước
+        """
+        table = self._period_table(period)
+        if table.empty:
+            return pd.DataFrame(columns=['year', 'quarter'] + HISTORY_METRICS)
+
+        year = table.index.get_level_values('year').to_numpy(dtype=np.int64)
+        quarter = table.index.get_level_values('quarter').to_numpy(dtype=np.int64)
+        table = table.reset_index(drop=True)
+
+        # Số thứ tự kỳ liên tục: phát hiện kỳ bị thiếu khi cộng dồn TTM và so cùng kỳ
+        if period == 'year':
+            seq, window = year, 1
+        else:
+            seq, window = year * 4 + quarter - 1, 4
+        seq = pd.Series(seq)
+        consecutive = (seq - seq.shift(window - 1)) == window - 1
+
+        def ttm(column: str) -> pd.Series:
+            return table[column].rolling(window).sum().where(consecutive)
+
+        def year_ago(values: pd.Series) -> pd.Series:
+            return pd.Series(values.to_numpy(), index=seq).reindex(seq - window).reset_index(drop=True)
+
+        def pct(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+            return numerator / denominator * 100
+
+        def growth(values: pd.Series) -> pd.Series:
+            previous = year_ago(values)
+            return (values - previous) / previous.abs() * 100
+
+        # Số cổ phiếu theo kỳ từ ratio (triệu CP), thiếu thì dùng giá trị truyền vào
+        shares = (table['ratio_shares'] * 1e6).ffill()
+        if shares_outstanding:
+            shares = shares.fillna(shares_outstanding)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            revenue_ttm = ttm('revenue')
+            net_income_ttm = ttm('net_income')
+            eps_ttm = table['ratio_eps'].where(table['ratio_eps'].notna(), net_income_ttm / shares)
+
+            result = pd.DataFrame({
+                'year': year,
+                'quarter': quarter,
+                'revenue': table['revenue'],
+                'net_income': table['net_income'],
+                'revenue_ttm': revenue_ttm,
+                'net_income_ttm': net_income_ttm,
+                'total_assets': table['total_assets'],
+                'shareholders_equity': table['shareholders_equity'],
+                'total_debt': table['total_debt'],
+                'operating_cash_flow': table['operating_cash_flow'],
+                'fcf': table['operating_cash_flow'] - table['capital_expenditure'],
+                'eps_ttm': eps_ttm,
+                'bvps': table['ratio_bvps'].where(table['ratio_bvps'].notna(),
+                                                  table['shareholders_equity'] / shares),
+                'sps': revenue_ttm / shares,
+                'roe': pct(table['net_income'], table['shareholders_equity']),
+                'roe_ttm': pct(net_income_ttm, table['shareholders_equity']),
+                'roa_ttm': pct(net_income_ttm, table['total_assets']),
+                'de': table['total_debt'] / table['shareholders_equity'],
+                'current_ratio': table['current_assets'] / table['current_liabilities'],
+                'gross_margin': pct(table['gross_profit'], table['revenue']),
+                'npm': pct(table['net_income'], table['revenue']),
+                'revenue_growth': growth(table['revenue']),
+                'net_income_growth': growth(table['net_income']),
+                'eps_growth': growth(eps_ttm),
+            })
+
+        return result.replace([np.inf, -np.inf], np.nan)
@@ -0,0 +1,279 @@
+"""
+Container OHLCV gọn nhẹ dùng chung cho các bộ phân tích (kỹ thuật, nến Nhật, cơ bản)
+
+Thay vì mỗi analyzer tự `df.copy()` toàn bộ DataFrame từ vnstock (kèm mọi cột phụ),
+dữ liệu giá được chuyển một lần thành các mảng NumPy liên tục (float32/float64)
+cộng với mảng ngày int64 (nanosecond từ epoch).
+"""
+import re
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Union
+
+# Giá trị NaT dưới dạng int64
+NAT_INT = np.iinfo(np.int64).min
+
+NS_PER_MINUTE = 60 * 1_000_000_000
+NS_PER_DAY = 24 * 60 * NS_PER_MINUTE
+
+# Khung thời gian intraday dạng bội số phút/giờ (cùng ký hiệu với IntradayService: 5m, 1h...)
+INTRADAY_TIMEFRAME_PATTERN = re.compile(r'^(\d+)(m|h)$')
+
+# Số phiên ngày xấp xỉ trong một bar của khung thời gian (dùng để ước lượng look-back)
+DAILY_BARS_PER_TIMEFRAME = {'D': 1, 'W': 5, 'M': 22}
+
+
+def normalize_timeframe(timeframe: str) -> str:
+    """
+    Chuẩn hóa ký hiệu khung thời gian: D, W, M hoặc bội số intraday (5m, 15m, 1h, 4h...)
+
+    Raises:
+        ValueError nếu khung thời gian không hợp lệ
+    """
+    value = (timeframe or '').strip()
+    if value.upper() in DAILY_BARS_PER_TIMEFRAME:
+        return value.upper()
+
+    match = INTRADAY_TIMEFRAME_PATTERN.match(value.lower())
+    if match and int(match.group(1)) > 0:
+        return value.lower()
+
+    raise ValueError(
+        f"Invalid timeframe: '{timeframe}'. Supported: D, W, M or intraday multiples such as 5m, 15m, 1h"
+    )
+
+
+class OHLCVFrame:
+    """Dữ liệu OHLCV dạng mảng NumPy"""
+
+    FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+    # Tên cột có thể gặp trong DataFrame upstream
+    COLUMN_ALIASES = {
+        'open': ['open', 'Open'],
+        'high': ['high', 'High'],
+        'low': ['low', 'Low'],
+        'close': ['close', 'Close'],
+        'volume': ['volume', 'Volume'],
+    }
+    DATE_COLUMNS = ['time', 'date', 'Time', 'Date']
+
+    __slots__ = ('dates', 'open', 'high', 'low', 'close', 'volume', '_series')
+
+    def __init__(self, dates: np.ndarray, open: np.ndarray, high: np.ndarray,
+                 low: np.ndarray, close: np.ndarray, volume: np.ndarray):
+        """
+        Args:
+            dates: Mảng int64 (nanosecond từ epoch, NAT_INT nếu không có ngày)
+            open, high, low, close: Mảng float cùng độ dài
+            volume: Mảng float hoặc int64 (khi upstream là số nguyên)
+        """
+        self.dates = dates
+        self.open = open
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self._series: Dict[str, pd.Series] = {}
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame, dtype=np.float64) -> 'OHLCVFrame':
+        """
+        Tạo OHLCVFrame từ DataFrame giá (vnstock quote.history hoặc tương tự)
+
+        Không copy toàn bộ frame: chỉ 5 cột giá được chuyển sang mảng liên tục
+        (với float64 thường là view, không cấp phát thêm).
+
+        Args:
+            df: DataFrame với các cột time/date, open, high, low, close, volume
+            dtype: np.float64 (mặc định) hoặc np.float32 để giảm một nửa bộ nhớ
+                   (áp dụng cho giá; volume số nguyên giữ int64)
+
+        Raises:
+            ValueError nếu thiếu cột bắt buộc
+        """
+        arrays = {}
+        for field, aliases in cls.COLUMN_ALIASES.items():
+            column = next((c for c in aliases if c in df.columns), None)
+            if column is None:
+                raise ValueError(f"Missing required column: {field}")
+            values = df[column]
+            if field == 'volume' and pd.api.types.is_integer_dtype(values.dtype):
+                # Khối lượng là số nguyên: giữ int64 để không mất chính xác (OBV vẫn là số nguyên)
+                arrays[field] = np.ascontiguousarray(values.to_numpy(dtype=np.int64))
+            else:
+                arrays[field] = np.ascontiguousarray(values.to_numpy(dtype=dtype, na_value=np.nan))
+
+        return cls(dates=cls._extract_dates(df), **arrays)
+
+    @classmethod
+    def from_daily_bars(cls, bars: pd.DataFrame) -> Dict[str, 'OHLCVFrame']:
+        """
+        Tách nến ngày dạng long (symbol, trade_date, OHLCV) thành OHLCVFrame của từng mã
+
+        Mỗi frame chỉ gồm các phiên mã đó có giá đóng cửa (phiên tạm ngừng giao dịch không
+        để lại lỗ NaN), các mảng là view trên mảng chung của cả batch.
+
+        Args:
+            bars: DataFrame từ StockDataService.get_daily_bars_frame (sắp xếp theo symbol, trade_date)
+
+        Returns:
+            Dictionary {symbol: OHLCVFrame}
+        """
+        bars = bars.dropna(subset=['close']).sort_values(['symbol', 'trade_date'], kind='stable')
+        if bars.empty:
+            return {}
+
+        dates = pd.to_datetime(bars['trade_date']).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        arrays = [np.ascontiguousarray(bars[field].to_numpy(dtype=np.float64, na_value=np.nan))
+                  for field in cls.FIELDS]
+        symbols, starts = np.unique(bars['symbol'].to_numpy(), return_index=True)
+        stops = np.append(starts[1:], len(bars))
+        return {
+            symbol: cls(dates[start:stop], *(values[start:stop] for values in arrays))
+            for symbol, start, stop in zip(symbols.tolist(), starts, stops)
+        }
+
+    @classmethod
+    def ensure(cls, data: Union[pd.DataFrame, 'OHLCVFrame'], dtype=np.float64) -> 'OHLCVFrame':
+        """Trả về OHLCVFrame, chỉ chuyển đổi nếu đầu vào là DataFrame"""
+        if isinstance(data, cls):
+            return data
+        return cls.from_dataframe(data, dtype=dtype)
+
+    @classmethod
+    def _extract_dates(cls, df: pd.DataFrame) -> np.ndarray:
+        """Lấy mảng ngày int64 từ cột time/date hoặc DatetimeIndex"""
+        column = next((c for c in cls.DATE_COLUMNS if c in df.columns), None)
+        if column is not None:
+            dates = pd.to_datetime(df[column])
+            if dates.dt.tz is not None:
+                dates = dates.dt.tz_localize(None)
+            return dates.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        if isinstance(df.index, pd.DatetimeIndex):
+            index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+            return index.to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+        return np.full(len(df), NAT_INT, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def __getitem__(self, name: str) -> pd.Series:
+        """
+        Lấy một cột dưới dạng pd.Series (không copy), dùng cho thư viện `ta`
+
+        Series được cache để các chỉ số dùng chung cùng một đối tượng.
+        """
+        if name not in self.FIELDS:
+            raise KeyError(name)
+        series = self._series.get(name)
+        if series is None:
+            series = pd.Series(getattr(self, name), copy=False, name=name)
+            self._series[name] = series
+        return series
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.FIELDS)
+
+    @property
+    def has_dates(self) -> bool:
+        return len(self.dates) > 0 and self.dates[0] != NAT_INT
+
+    @property
+    def nbytes(self) -> int:
+        """Tổng bộ nhớ của các mảng"""
+        return sum(getattr(self, f).nbytes for f in self.FIELDS) + self.dates.nbytes
+
+    def date_index(self) -> pd.DatetimeIndex:
+        """Trục thời gian dạng DatetimeIndex"""
+        return pd.DatetimeIndex(self.dates.view('datetime64[ns]'))
+
+    def date_strings(self, fmt: Optional[str] = None, positions: Optional[np.ndarray] = None) -> List[str]:
+        """
+        Trục thời gian dạng chuỗi
+
+        Args:
+            fmt: Định dạng strftime. Mặc định YYYY-MM-DD cho dữ liệu ngày,
+                 ISO datetime nếu có giờ/phút (intraday)
+            positions: Chỉ lấy các vị trí bar này (mặc định: tất cả)
+
+        Returns:
+            Danh sách chuỗi ngày, hoặc số thứ tự bar nếu không có ngày
+        """
+        if not self.has_dates:
+            bars = range(len(self)) if positions is None else positions
+            return [str(i) for i in bars]
+
+        index = self.date_index()
+        if fmt is None:
+            fmt = '%Y-%m-%d' if (index.normalize() == index).all() else '%Y-%m-%dT%H:%M:%S'
+        if positions is not None:
+            index = index[positions]
+        return index.strftime(fmt).tolist()
+
+    def slice(self, start: Optional[int] = None, stop: Optional[int] = None) -> 'OHLCVFrame':
+        """Cắt theo vị trí bar, trả về view (không copy)"""
+        window = slice(start, stop)
+        return OHLCVFrame(self.dates[window], *(getattr(self, f)[window] for f in self.FIELDS))
+
+    def tail(self, n: int) -> 'OHLCVFrame':
+        """N bar cuối (view)"""
+        return self.slice(-n if n else len(self), None)
+
+    def resample(self, timeframe: str) -> 'OHLCVFrame':
+        """
+        Gộp bar sang khung thời gian lớn hơn, tính cục bộ từ dữ liệu đã có
+
+        Mỗi bar mới: open của bar đầu, high/low lớn/nhỏ nhất, close của bar cuối, tổng volume.
+        Với D/W/M, ngày của bar mới là phiên cuối cùng trong kỳ (tuần/tháng đang chạy
+        kết thúc ở phiên mới nhất); với intraday là thời điểm bắt đầu của khung (giống
+        IntradayService). Dữ liệu phải được sắp xếp tăng dần theo thời gian.
+
+        Args:
+            timeframe: 'D', 'W' (tuần bắt đầu thứ Hai), 'M' (tháng dương lịch)
+                       hoặc bội số intraday '5m', '15m', '1h'...
+
+        Returns:
+            OHLCVFrame mới (không thay đổi frame hiện tại)
+        """
+        timeframe = normalize_timeframe(timeframe)
+        if len(self) == 0:
+            return self
+        if not self.has_dates:
+            raise ValueError("Cannot resample OHLCV data without dates")
+
+        bucket_ns = None
+        if timeframe == 'D':
+            keys = self.dates // NS_PER_DAY
+        elif timeframe == 'W':
+            days = self.dates // NS_PER_DAY
+            # 1970-01-01 là thứ Năm -> (days + 3) % 7 = 0 vào thứ Hai
+            keys = days - (days + 3) % 7
+        elif timeframe == 'M':
+            keys = self.dates.view('datetime64[ns]').astype('datetime64[M]').view(np.int64)
+        else:
+            match = INTRADAY_TIMEFRAME_PATTERN.match(timeframe)
+            minutes = int(match.group(1)) * (60 if match.group(2) == 'h' else 1)
+            bucket_ns = minutes * NS_PER_MINUTE
+            keys = self.dates // bucket_ns
+
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(self)] - 1
+
+        return OHLCVFrame(
+            dates=self.dates[ends] if bucket_ns is None else keys[starts] * bucket_ns,
+            open=self.open[starts],
+            high=np.maximum.reduceat(self.high, starts),
+            low=np.minimum.reduceat(self.low, starts),
+            close=self.close[ends],
+            volume=np.add.reduceat(self.volume, starts),
+        )
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Chuyển lại sang DataFrame (cột time + OHLCV)"""
+        data = {'time': self.date_index()} if self.has_dates else {}
+        data.update({f: getattr(self, f) for f in self.FIELDS})
+        return pd.DataFrame(data)
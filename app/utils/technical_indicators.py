@@ -1,63 +1,284 @@
 """
 Module tính toán các chỉ số kỹ thuật (Technical Indicators)
 """
+import math
 import pandas as pd
 import numpy as np
 from ta.trend import SMAIndicator, EMAIndicator, MACD, IchimokuIndicator, PSARIndicator, ADXIndicator
 from ta.momentum import RSIIndicator, StochasticOscillator
 from ta.volatility import BollingerBands, AverageTrueRange
 from ta.volume import OnBalanceVolumeIndicator, MFIIndicator, ChaikinMoneyFlowIndicator, AccDistIndexIndicator
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+
+from .ohlcv import OHLCVFrame, DAILY_BARS_PER_TIMEFRAME, normalize_timeframe
 
 
 class TechnicalAnalyzer:
     """Class phân tích kỹ thuật"""
 
-    def __init__(self, df: pd.DataFrame):
+    # Các nhóm chỉ số được tính trong calculate_all_indicators (theo thứ tự trả về)
+    INDICATOR_GROUPS = ['SMA', 'EMA', 'MACD', 'RSI', 'BB', 'ATR', 'OBV',
+                        'Ichimoku', 'PSAR', 'MFI', 'AD', 'CMF', 'ADL']
+
+    # Hệ số số bar cho các chỉ số làm mượt lũy thừa (EMA, Wilder): ln(100) ~ 4.6,
+    # tức ảnh hưởng của dữ liệu trước cửa sổ look-back còn dưới 1%
+    EXP_SMOOTHING_FACTOR = 4.6
+
+    def __init__(self, df: Union[pd.DataFrame, OHLCVFrame]):
         """
-        Khởi tạo với DataFrame chứa dữ liệu giá
+        Khởi tạo với dữ liệu giá
 
         Args:
             df: DataFrame với các cột: time/date, open, high, low, close, volume
+                hoặc OHLCVFrame đã dựng sẵn (dùng chung giữa các analyzer, không copy)
         """
-        self.df = df.copy()
-
-        # Chuẩn hóa tên cột
-        column_mapping = {
-            'time': 'date',
-            'Time': 'date',
-            'Date': 'date',
-            'Open': 'open',
-            'High': 'high',
-            'Low': 'low',
-            'Close': 'close',
-            'Volume': 'volume'
-        }
-        self.df.rename(columns=column_mapping, inplace=True)
+        self.df = OHLCVFrame.ensure(df)
 
-        # Đảm bảo có đủ các cột cần thiết
-        required_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in required_cols:
-            if col not in self.df.columns:
-                raise ValueError(f"Missing required column: {col}")
+    def for_timeframe(self, timeframe: str) -> 'TechnicalAnalyzer':
+        """
+        Tạo analyzer trên khung thời gian khác, resample cục bộ từ dữ liệu hiện có
 
-    def calculate_sma(self, periods: list = [20, 50, 100, 200]) -> Dict[str, Any]:
+        Args:
+            timeframe: 'D', 'W', 'M' hoặc bội số intraday ('15m', '1h'...)
+
+        Returns:
+            TechnicalAnalyzer mới trên dữ liệu đã resample
         """
-        Tính Simple Moving Average
+        return TechnicalAnalyzer(self.df.resample(timeframe))
+
+    @staticmethod
+    def validate_timeframes(timeframes: Optional[List[str]]) -> List[str]:
+        """Chuẩn hóa danh sách khung thời gian (bỏ trùng, giữ thứ tự)"""
+        result = []
+        for timeframe in timeframes or ['D']:
+            value = normalize_timeframe(timeframe)
+            if value not in result:
+                result.append(value)
+        return result
+
+    @classmethod
+    def required_daily_bars(cls, timeframes: List[str], groups: Optional[List[str]] = None,
+                            tail: Optional[int] = None) -> int:
+        """
+        Số phiên ngày cần lấy để mọi khung thời gian có đủ look-back và cửa sổ output
 
         Args:
-            periods: Danh sách các kỳ để tính SMA
+            timeframes: Danh sách khung thời gian ngày/tuần/tháng
+            groups: Các nhóm chỉ số
+            tail: Số bar output trên mỗi khung thời gian
 
         Returns:
-            Dictionary chứa SMA cho các kỳ khác nhau
+            Số phiên ngày
+        """
+        bars_per_frame = (tail or 0) + cls.required_lookback(groups)
+        return max(bars_per_frame * DAILY_BARS_PER_TIMEFRAME.get(tf, 1) for tf in timeframes)
+
+    def calculate_multi_timeframe(self, timeframes: List[str], groups: Optional[List[str]] = None,
+                                  tail: Optional[int] = None, with_dates: bool = False,
+                                  columns: bool = False) -> Dict[str, Any]:
+        """
+        Tính chỉ số trên nhiều khung thời gian từ cùng một lần lấy dữ liệu
+
+        Args:
+            timeframes: Danh sách khung thời gian (VD: ['D', 'W', 'M'])
+            groups: Các nhóm chỉ số (None = tất cả)
+            tail: Số bar output trên mỗi khung thời gian
+            with_dates: Trả về {'dates', 'indicators'} cho mỗi khung thời gian
+            columns: Chỉ số dạng mảng NumPy (calculate_indicator_columns) thay vì list JSON
+
+        Returns:
+            Dictionary {khung thời gian: chỉ số như calculate_all_indicators
+            (hoặc calculate_indicator_columns), kèm ngày nếu with_dates}
         """
+        result = {}
+        for tf in self.validate_timeframes(timeframes):
+            analyzer = self.for_timeframe(tf)
+            if columns:
+                indicators = analyzer.calculate_indicator_columns(groups, tail)
+            else:
+                indicators = analyzer.calculate_all_indicators(groups, tail)
+            result[tf] = {'dates': analyzer.get_dates(tail), 'indicators': indicators} if with_dates else indicators
+        return result
+
+    @staticmethod
+    def _to_list(series: pd.Series, fill_value: float = 0) -> list:
+        """Chuyển series sang list cho format JSON cũ (NaN được thay bằng fill_value)"""
+        return series.fillna(fill_value).tolist()
+
+    def _sma_series(self, periods: list) -> Dict[str, pd.Series]:
         result = {}
         for period in periods:
             if len(self.df) >= period:
                 sma = SMAIndicator(close=self.df['close'], window=period)
-                result[f'SMA_{period}'] = sma.sma_indicator().fillna(0).tolist()
+                result[f'SMA_{period}'] = sma.sma_indicator()
         return result
 
+    def _ema_series(self, periods: list) -> Dict[str, pd.Series]:
+        result = {}
+        for period in periods:
+            if len(self.df) >= period:
+                ema = EMAIndicator(close=self.df['close'], window=period)
+                result[f'EMA_{period}'] = ema.ema_indicator()
+        return result
+
+    def _macd_series(self, fast: int, slow: int, signal: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= slow:
+            macd = MACD(close=self.df['close'], window_fast=fast, window_slow=slow, window_sign=signal)
+            return {
+                'MACD': macd.macd(),
+                'Signal': macd.macd_signal(),
+                'Histogram': macd.macd_diff()
+            }
+        return {}
+
+    def _rsi_series(self, period: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= period:
+            rsi = RSIIndicator(close=self.df['close'], window=period)
+            return {'RSI': rsi.rsi()}
+        return {}
+
+    def _bollinger_series(self, period: int, std_dev: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= period:
+            bb = BollingerBands(close=self.df['close'], window=period, window_dev=std_dev)
+            return {
+                'Upper': bb.bollinger_hband(),
+                'Middle': bb.bollinger_mavg(),
+                'Lower': bb.bollinger_lband(),
+                'BandWidth': bb.bollinger_wband(),
+                'PercentB': bb.bollinger_pband()
+            }
+        return {}
+
+    def _atr_series(self, period: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= period:
+            atr = AverageTrueRange(high=self.df['high'], low=self.df['low'],
+                                   close=self.df['close'], window=period)
+            return {'ATR': atr.average_true_range()}
+        return {}
+
+    def _obv_series(self) -> Dict[str, pd.Series]:
+        obv = OnBalanceVolumeIndicator(close=self.df['close'], volume=self.df['volume'])
+        return {'OBV': obv.on_balance_volume()}
+
+    def _ichimoku_series(self, conversion: int, base: int, span_b: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= span_b:
+            ichimoku = IchimokuIndicator(high=self.df['high'], low=self.df['low'],
+                                        window1=conversion, window2=base, window3=span_b)
+            return {
+                'Tenkan_sen': ichimoku.ichimoku_conversion_line(),
+                'Kijun_sen': ichimoku.ichimoku_base_line(),
+                'Senkou_span_a': ichimoku.ichimoku_a(),
+                'Senkou_span_b': ichimoku.ichimoku_b()
+            }
+        return {}
+
+    def _psar_series(self, step: float, max_step: float) -> Dict[str, pd.Series]:
+        if len(self.df) >= 2:
+            psar = PSARIndicator(high=self.df['high'], low=self.df['low'],
+                                close=self.df['close'], step=step, max_step=max_step)
+            return {
+                'PSAR': psar.psar(),
+                'PSAR_up': psar.psar_up(),
+                'PSAR_down': psar.psar_down()
+            }
+        return {}
+
+    def _mfi_series(self, period: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= period:
+            mfi = MFIIndicator(high=self.df['high'], low=self.df['low'],
+                              close=self.df['close'], volume=self.df['volume'],
+                              window=period)
+            return {'MFI': mfi.money_flow_index()}
+        return {}
+
+    def _ad_series(self) -> Dict[str, pd.Series]:
+        ad = AccDistIndexIndicator(high=self.df['high'], low=self.df['low'],
+                                   close=self.df['close'], volume=self.df['volume'])
+        return {'AD': ad.acc_dist_index()}
+
+    def _cmf_series(self, period: int) -> Dict[str, pd.Series]:
+        if len(self.df) >= period:
+            cmf = ChaikinMoneyFlowIndicator(high=self.df['high'], low=self.df['low'],
+                                           close=self.df['close'], volume=self.df['volume'],
+                                           window=period)
+            return {'CMF': cmf.chaikin_money_flow()}
+        return {}
+
+    def _adl_series(self) -> Dict[str, pd.Series]:
+        price_change = self.df['close'].diff()
+        return {'ADL': price_change.cumsum()}
+
+    @classmethod
+    def validate_groups(cls, groups: Optional[List[str]]) -> List[str]:
+        """
+        Chuẩn hóa danh sách nhóm chỉ số (không phân biệt hoa thường)
+
+        Raises:
+            ValueError nếu có nhóm không hợp lệ
+        """
+        if not groups:
+            return list(cls.INDICATOR_GROUPS)
+
+        lookup = {g.upper(): g for g in cls.INDICATOR_GROUPS}
+        result = []
+        for group in groups:
+            key = group.strip().upper()
+            if key not in lookup:
+                raise ValueError(
+                    f"Invalid indicator group: '{group}'. Supported: {', '.join(cls.INDICATOR_GROUPS)}"
+                )
+            if lookup[key] not in result:
+                result.append(lookup[key])
+        return result
+
+    @classmethod
+    def required_lookback(cls, groups: Optional[List[str]] = None) -> int:
+        """
+        Số bar look-back cần lấy thêm trước cửa sổ output để các chỉ số đã "ấm"
+
+        Chỉ số dạng rolling cần đúng số bar của cửa sổ (SMA_200 -> 200, Ichimoku -> 52 + 26),
+        chỉ số làm mượt lũy thừa cần khoảng 4.6 / alpha bar để sai số seed dưới 1%.
+        OBV, A/D, ADL là chỉ số tích lũy nên mốc 0 luôn là bar đầu tiên được lấy về;
+        PSAR phụ thuộc đường đi và chỉ khớp với chuỗi đầy đủ sau lần đảo chiều đầu tiên trong cửa sổ.
+
+        Args:
+            groups: Danh sách nhóm chỉ số (None = tất cả)
+
+        Returns:
+            Số bar look-back
+        """
+        ema_bars = lambda span: math.ceil(cls.EXP_SMOOTHING_FACTOR * (span + 1) / 2)
+        wilder_bars = lambda period: math.ceil(cls.EXP_SMOOTHING_FACTOR * period)
+
+        lookbacks = {
+            'SMA': 200,
+            'EMA': ema_bars(200),
+            'MACD': ema_bars(26) + ema_bars(9),
+            'RSI': wilder_bars(14),
+            'BB': 20,
+            'ATR': wilder_bars(14),
+            'OBV': 0,
+            'Ichimoku': 52 + 26,
+            'PSAR': 50,
+            'MFI': 14 + 1,
+            'AD': 0,
+            'CMF': 20,
+            'ADL': 0,
+        }
+        return max(lookbacks[g] for g in cls.validate_groups(groups))
+
+    def calculate_sma(self, periods: list = [20, 50, 100, 200]) -> Dict[str, Any]:
+        """
+        Tính Simple Moving Average
+
+        Args:
+            periods: Danh sách các kỳ để tính SMA
+
+        Returns:
+            Dictionary chứa SMA cho các kỳ khác nhau
+        """
+        return {name: self._to_list(s) for name, s in self._sma_series(periods).items()}
+
     def calculate_ema(self, periods: list = [12, 26, 50, 200]) -> Dict[str, Any]:
         """
         Tính Exponential Moving Average
@@ -68,12 +289,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa EMA cho các kỳ khác nhau
         """
-        result = {}
-        for period in periods:
-            if len(self.df) >= period:
-                ema = EMAIndicator(close=self.df['close'], window=period)
-                result[f'EMA_{period}'] = ema.ema_indicator().fillna(0).tolist()
-        return result
+        return {name: self._to_list(s) for name, s in self._ema_series(periods).items()}
 
     def calculate_macd(self, fast: int = 12, slow: int = 26, signal: int = 9) -> Dict[str, Any]:
         """
@@ -87,14 +303,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa MACD, signal và histogram
         """
-        if len(self.df) >= slow:
-            macd = MACD(close=self.df['close'], window_fast=fast, window_slow=slow, window_sign=signal)
-            return {
-                'MACD': macd.macd().fillna(0).tolist(),
-                'Signal': macd.macd_signal().fillna(0).tolist(),
-                'Histogram': macd.macd_diff().fillna(0).tolist()
-            }
-        return {}
+        return {name: self._to_list(s) for name, s in self._macd_series(fast, slow, signal).items()}
 
     def calculate_rsi(self, period: int = 14) -> Dict[str, Any]:
         """
@@ -106,10 +315,10 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị RSI
         """
-        if len(self.df) >= period:
-            rsi = RSIIndicator(close=self.df['close'], window=period)
+        series = self._rsi_series(period)
+        if series:
             return {
-                'RSI': rsi.rsi().fillna(50).tolist(),
+                'RSI': self._to_list(series['RSI'], 50),
                 'period': period
             }
         return {}
@@ -125,16 +334,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa upper, middle, lower bands
         """
-        if len(self.df) >= period:
-            bb = BollingerBands(close=self.df['close'], window=period, window_dev=std_dev)
-            return {
-                'Upper': bb.bollinger_hband().fillna(0).tolist(),
-                'Middle': bb.bollinger_mavg().fillna(0).tolist(),
-                'Lower': bb.bollinger_lband().fillna(0).tolist(),
-                'BandWidth': bb.bollinger_wband().fillna(0).tolist(),
-                'PercentB': bb.bollinger_pband().fillna(0).tolist()
-            }
-        return {}
+        return {name: self._to_list(s) for name, s in self._bollinger_series(period, std_dev).items()}
 
     def calculate_atr(self, period: int = 14) -> Dict[str, Any]:
         """
@@ -146,11 +346,10 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị ATR
         """
-        if len(self.df) >= period:
-            atr = AverageTrueRange(high=self.df['high'], low=self.df['low'],
-                                   close=self.df['close'], window=period)
+        series = self._atr_series(period)
+        if series:
             return {
-                'ATR': atr.average_true_range().fillna(0).tolist(),
+                'ATR': self._to_list(series['ATR']),
                 'period': period
             }
         return {}
@@ -162,10 +361,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị OBV
         """
-        obv = OnBalanceVolumeIndicator(close=self.df['close'], volume=self.df['volume'])
-        return {
-            'OBV': obv.on_balance_volume().fillna(0).tolist()
-        }
+        return {name: self._to_list(s) for name, s in self._obv_series().items()}
 
     def calculate_ichimoku(self, conversion: int = 9, base: int = 26,
                           span_b: int = 52, displacement: int = 26) -> Dict[str, Any]:
@@ -181,16 +377,8 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa các đường Ichimoku
         """
-        if len(self.df) >= span_b:
-            ichimoku = IchimokuIndicator(high=self.df['high'], low=self.df['low'],
-                                        window1=conversion, window2=base, window3=span_b)
-            return {
-                'Tenkan_sen': ichimoku.ichimoku_conversion_line().fillna(0).tolist(),
-                'Kijun_sen': ichimoku.ichimoku_base_line().fillna(0).tolist(),
-                'Senkou_span_a': ichimoku.ichimoku_a().fillna(0).tolist(),
-                'Senkou_span_b': ichimoku.ichimoku_b().fillna(0).tolist()
-            }
-        return {}
+        return {name: self._to_list(s)
+                for name, s in self._ichimoku_series(conversion, base, span_b).items()}
 
     def calculate_psar(self, step: float = 0.02, max_step: float = 0.2) -> Dict[str, Any]:
         """
@@ -203,15 +391,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị PSAR
         """
-        if len(self.df) >= 2:
-            psar = PSARIndicator(high=self.df['high'], low=self.df['low'],
-                                close=self.df['close'], step=step, max_step=max_step)
-            return {
-                'PSAR': psar.psar().fillna(0).tolist(),
-                'PSAR_up': psar.psar_up().fillna(0).tolist(),
-                'PSAR_down': psar.psar_down().fillna(0).tolist()
-            }
-        return {}
+        return {name: self._to_list(s) for name, s in self._psar_series(step, max_step).items()}
 
     def calculate_mfi(self, period: int = 14) -> Dict[str, Any]:
         """
@@ -223,12 +403,10 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị MFI
         """
-        if len(self.df) >= period:
-            mfi = MFIIndicator(high=self.df['high'], low=self.df['low'],
-                              close=self.df['close'], volume=self.df['volume'],
-                              window=period)
+        series = self._mfi_series(period)
+        if series:
             return {
-                'MFI': mfi.money_flow_index().fillna(50).tolist(),
+                'MFI': self._to_list(series['MFI'], 50),
                 'period': period
             }
         return {}
@@ -240,11 +418,7 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị A/D
         """
-        ad = AccDistIndexIndicator(high=self.df['high'], low=self.df['low'],
-                                   close=self.df['close'], volume=self.df['volume'])
-        return {
-            'AD': ad.acc_dist_index().fillna(0).tolist()
-        }
+        return {name: self._to_list(s) for name, s in self._ad_series().items()}
 
     def calculate_cmf(self, period: int = 20) -> Dict[str, Any]:
         """
@@ -256,12 +430,10 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị CMF
         """
-        if len(self.df) >= period:
-            cmf = ChaikinMoneyFlowIndicator(high=self.df['high'], low=self.df['low'],
-                                           close=self.df['close'], volume=self.df['volume'],
-                                           window=period)
+        series = self._cmf_series(period)
+        if series:
             return {
-                'CMF': cmf.chaikin_money_flow().fillna(0).tolist(),
+                'CMF': self._to_list(series['CMF']),
                 'period': period
             }
         return {}
@@ -274,31 +446,95 @@ class TechnicalAnalyzer:
         Returns:
             Dictionary chứa giá trị ADL
         """
-        price_change = self.df['close'].diff()
-        adl = price_change.cumsum()
-        return {
-            'ADL': adl.fillna(0).tolist()
-        }
+        return {name: self._to_list(s) for name, s in self._adl_series().items()}
 
-    def calculate_all_indicators(self) -> Dict[str, Any]:
+    def calculate_all_indicators(self, groups: Optional[List[str]] = None,
+                                 tail: Optional[int] = None) -> Dict[str, Any]:
         """
         Tính toán tất cả các chỉ số kỹ thuật
 
+        Args:
+            groups: Chỉ tính các nhóm chỉ số này (None = tất cả)
+            tail: Chỉ trả về N giá trị cuối của mỗi chuỗi (None = toàn bộ)
+
         Returns:
             Dictionary chứa tất cả các chỉ số
         """
-        return {
-            'SMA': self.calculate_sma(),
-            'EMA': self.calculate_ema(),
-            'MACD': self.calculate_macd(),
-            'RSI': self.calculate_rsi(),
-            'BB': self.calculate_bollinger_bands(),
-            'ATR': self.calculate_atr(),
-            'OBV': self.calculate_obv(),
-            'Ichimoku': self.calculate_ichimoku(),
-            'PSAR': self.calculate_psar(),
-            'MFI': self.calculate_mfi(),
-            'AD': self.calculate_ad(),
-            'CMF': self.calculate_cmf(),
-            'ADL': self.calculate_adl()
+        calculators = {
+            'SMA': self.calculate_sma,
+            'EMA': self.calculate_ema,
+            'MACD': self.calculate_macd,
+            'RSI': self.calculate_rsi,
+            'BB': self.calculate_bollinger_bands,
+            'ATR': self.calculate_atr,
+            'OBV': self.calculate_obv,
+            'Ichimoku': self.calculate_ichimoku,
+            'PSAR': self.calculate_psar,
+            'MFI': self.calculate_mfi,
+            'AD': self.calculate_ad,
+            'CMF': self.calculate_cmf,
+            'ADL': self.calculate_adl
         }
+
+        result = {}
+        for group in self.validate_groups(groups):
+            values = calculators[group]()
+            if tail:
+                values = {k: v[-tail:] if isinstance(v, list) else v for k, v in values.items()}
+            result[group] = values
+        return result
+
+    def _group_series(self, group: str) -> Dict[str, pd.Series]:
+        """Tính series thô (giữ NaN) cho một nhóm chỉ số với tham số mặc định"""
+        builders = {
+            'SMA': lambda: self._sma_series([20, 50, 100, 200]),
+            'EMA': lambda: self._ema_series([12, 26, 50, 200]),
+            'MACD': lambda: self._macd_series(12, 26, 9),
+            'RSI': lambda: self._rsi_series(14),
+            'BB': lambda: self._bollinger_series(20, 2),
+            'ATR': lambda: self._atr_series(14),
+            'OBV': self._obv_series,
+            'Ichimoku': lambda: self._ichimoku_series(9, 26, 52),
+            'PSAR': lambda: self._psar_series(0.02, 0.2),
+            'MFI': lambda: self._mfi_series(14),
+            'AD': self._ad_series,
+            'CMF': lambda: self._cmf_series(20),
+            'ADL': self._adl_series,
+        }
+        return builders[group]()
+
+    def calculate_indicator_columns(self, groups: Optional[List[str]] = None,
+                                    tail: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Tính tất cả các chỉ số kỹ thuật dưới dạng cột (columnar)
+
+        Khác với calculate_all_indicators, giá trị trong giai đoạn warm-up được giữ là NaN
+        thay vì thay bằng 0/50, để client phân biệt được "chưa đủ dữ liệu" với giá trị thật.
+
+        Args:
+            groups: Chỉ tính các nhóm chỉ số này (None = tất cả)
+            tail: Chỉ trả về N giá trị cuối của mỗi cột (None = toàn bộ)
+
+        Returns:
+            Dictionary {tên cột: mảng float64}, ví dụ SMA_20, MACD_Signal, BB_Upper
+        """
+        columns = {}
+        for group in self.validate_groups(groups):
+            for name, series in self._group_series(group).items():
+                column = name if name.startswith(group) else f'{group}_{name}'
+                values = series.to_numpy(dtype=np.float64)
+                columns[column] = values[-tail:] if tail else values
+        return columns
+
+    def get_dates(self, tail: Optional[int] = None) -> List[str]:
+        """
+        Lấy trục thời gian dùng chung cho output dạng cột
+
+        Args:
+            tail: Chỉ lấy N ngày cuối (None = toàn bộ)
+
+        Returns:
+            Danh sách ngày (YYYY-MM-DD), hoặc ISO datetime nếu là dữ liệu intraday
+        """
+        dates = self.df.date_strings()
+        return dates[-tail:] if tail else dates
@@ -0,0 +1,107 @@
+"""
+Benchmark nhận dạng mô hình nến: vòng lặp theo dòng (iloc) so với mảng dịch chuyển NumPy
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_candlestick_patterns --bars 1250 --symbols 20
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.utils.candlestick_patterns import CandlestickPatternDetector
+
+
+# Điều kiện của các mô hình nhiều nến theo cách cũ: mỗi nến là một dòng self.df.iloc[i]
+LEGACY_RULES = {
+    'detect_engulfing_bullish': (2, lambda p, c: (
+        p['is_bearish'] and c['is_bullish'] and c['open'] < p['close'] and c['close'] > p['open'])),
+    'detect_engulfing_bearish': (2, lambda p, c: (
+        p['is_bullish'] and c['is_bearish'] and c['open'] > p['close'] and c['close'] < p['open'])),
+    'detect_harami_bullish': (2, lambda p, c: (
+        p['is_bearish'] and c['is_bullish'] and c['open'] > p['close'] and c['close'] < p['open'] and
+        c['body'] < p['body'] * 0.5)),
+    'detect_harami_bearish': (2, lambda p, c: (
+        p['is_bullish'] and c['is_bearish'] and c['open'] < p['close'] and c['close'] > p['open'] and
+        c['body'] < p['body'] * 0.5)),
+    'detect_morning_star': (3, lambda c1, c2, c3: (
+        c1['is_bearish'] and c1['body'] > c1['range'] * 0.5 and c2['body'] < c2['range'] * 0.3 and
+        c3['is_bullish'] and c3['body'] > c3['range'] * 0.5 and c3['close'] > (c1['open'] + c1['close']) / 2)),
+    'detect_evening_star': (3, lambda c1, c2, c3: (
+        c1['is_bullish'] and c1['body'] > c1['range'] * 0.5 and c2['body'] < c2['range'] * 0.3 and
+        c3['is_bearish'] and c3['body'] > c3['range'] * 0.5 and c3['close'] < (c1['open'] + c1['close']) / 2)),
+    'detect_three_white_soldiers': (3, lambda c1, c2, c3: (
+        c1['is_bullish'] and c2['is_bullish'] and c3['is_bullish'] and
+        c2['close'] > c1['close'] and c3['close'] > c2['close'] and
+        c2['open'] > c1['open'] and c3['open'] > c2['open'])),
+    'detect_three_black_crows': (3, lambda c1, c2, c3: (
+        c1['is_bearish'] and c2['is_bearish'] and c3['is_bearish'] and
+        c2['close'] < c1['close'] and c3['close'] < c2['close'] and
+        c2['open'] < c1['open'] and c3['open'] < c2['open'])),
+}
+
+
+def legacy_detect(detector: CandlestickPatternDetector, name: str) -> pd.Series:
+    """Cài đặt vòng lặp theo dòng như trước khi vector hóa"""
+    span, rule = LEGACY_RULES[name]
+    df = detector.df
+    result = pd.Series([False] * len(df), index=df.index)
+    for i in range(span - 1, len(df)):
+        if rule(*(df.iloc[i - lag] for lag in range(span - 1, -1, -1))):
+            result.iloc[i] = True
+    return result
+
+
+def make_ohlcv(bars: int, seed: int) -> pd.DataFrame:
+    """Dữ liệu giá ngẫu nhiên dạng random walk"""
+    rng = np.random.default_rng(seed)
+    close = 50 + np.cumsum(rng.normal(0, 1, bars))
+    open_ = close + rng.normal(0, 1, bars)
+    high = np.maximum(open_, close) + rng.exponential(0.7, bars)
+    low = np.minimum(open_, close) - rng.exponential(0.7, bars)
+    return pd.DataFrame({
+        'time': pd.date_range('2019-01-01', periods=bars, freq='B'),
+        'open': open_, 'high': high, 'low': low, 'close': close,
+        'volume': rng.integers(100_000, 1_000_000, bars)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, default=1250, help='Số phiên mỗi mã (mặc định 1250 ~ 5 năm)')
+    parser.add_argument('--symbols', type=int, default=20, help='Số mã giả lập')
+    args = parser.parse_args()
+
+    frames = [make_ohlcv(args.bars, seed) for seed in range(args.symbols)]
+    detectors = [CandlestickPatternDetector(df) for df in frames]
+
+    legacy_time = 0.0
+    vector_time = 0.0
+    for detector in detectors:
+        for name in LEGACY_RULES:
+            start = time.perf_counter()
+            expected = legacy_detect(detector, name)
+            legacy_time += time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = getattr(detector, name)()
+            vector_time += time.perf_counter() - start
+
+            assert expected.tolist() == actual.tolist(), f"Mismatch in {name}"
+
+    start = time.perf_counter()
+    for detector in detectors:
+        detector.detect_all_patterns()
+    all_patterns_time = time.perf_counter() - start
+
+    per_symbol = lambda seconds: seconds / args.symbols * 1000
+    print(f"{args.symbols} symbols x {args.bars} bars, {len(LEGACY_RULES)} multi-candle detectors")
+    print(f"  row loop (iloc):      {per_symbol(legacy_time):10.2f} ms/symbol")
+    print(f"  shifted arrays:       {per_symbol(vector_time):10.2f} ms/symbol")
+    print(f"  speedup:              {legacy_time / vector_time:10.1f}x")
+    print(f"  detect_all_patterns:  {per_symbol(all_patterns_time):10.2f} ms/symbol")
+
+
+if __name__ == '__main__':
+    main()
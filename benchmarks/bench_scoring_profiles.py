@@ -0,0 +1,131 @@
+"""
+Benchmark chấm điểm screening: bảng điểm if/elif theo từng dict so với scoring profile vector hóa
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_scoring_profiles --rows 1600 --repeat 50
+"""
+import argparse
+import time
+from typing import Any, Dict
+
+import numpy as np
+
+from app.services.scoring_profiles import SCORING_PROFILES, score_records
+from app.services.screener_snapshot import ScreenerSnapshot
+from benchmarks.bench_stock_upsert import make_rows
+
+INDUSTRIES = ('Ngân hàng', 'Bất động sản', 'Thép', 'Bán lẻ', 'Chứng khoán', 'Điện')
+
+
+def legacy_score(data: Dict[str, Any]) -> float:
+    """Bảng điểm if/elif trước đây của MarketScreener._calculate_screening_score"""
+    score = 50  # Base score
+
+    try:
+        # PE score: Lower is better (but not negative)
+        if data.get('pe') and data['pe'] > 0:
+            if data['pe'] < 10:
+                score += 15
+            elif data['pe'] < 15:
+                score += 10
+            elif data['pe'] < 20:
+                score += 5
+            elif data['pe'] > 30:
+                score -= 10
+
+        # PB score: Lower is better
+        if data.get('pb'):
+            if data['pb'] < 1:
+                score += 10
+            elif data['pb'] < 2:
+                score += 5
+            elif data['pb'] > 3:
+                score -= 5
+
+        # ROE score: Higher is better
+        if data.get('roe'):
+            if data['roe'] > 20:
+                score += 15
+            elif data['roe'] > 15:
+                score += 10
+            elif data['roe'] > 10:
+                score += 5
+            elif data['roe'] < 5:
+                score -= 10
+
+        # Price momentum
+        if data.get('price_change'):
+            if 0 < data['price_change'] < 20:  # Positive but not too high
+                score += 10
+            elif data['price_change'] > 50:  # Too hot
+                score -= 5
+            elif data['price_change'] < -20:  # Falling too much
+                score -= 10
+
+        # RSI score
+        if data.get('rsi'):
+            if 20 < data['rsi'] < 40:  # Oversold but not extreme
+                score += 15
+            elif 40 < data['rsi'] < 60:  # Neutral
+                score += 5
+            elif data['rsi'] > 70:  # Overbought
+                score -= 10
+
+        return max(0, min(100, score))  # Clamp to 0-100
+
+    except:
+        return 50
+
+
+def make_records(count: int, seed: int):
+    """Dữ liệu screening ngẫu nhiên có factor, ngành, giá trị biên và giá trị thiếu"""
+    rng = np.random.default_rng(seed)
+    records = make_rows(count, seed)
+    for i, record in enumerate(records):
+        record['industry'] = INDUSTRIES[i % len(INDUSTRIES)]
+        record['sma_200_distance'] = float(rng.normal(0, 20))
+        record['high_52w_distance'] = float(-rng.uniform(0, 50))
+        record['macd_histogram'] = float(rng.normal(0, 1))
+        record['macd_cross'] = float(rng.integers(-1, 2))
+        record['gross_margin'] = float(rng.uniform(0, 60))
+        record['de'] = float(rng.uniform(0, 5))
+        record['eps_growth'] = float(rng.normal(10, 30))
+        record['revenue_growth'] = float(rng.normal(10, 20))
+        # Giá trị đúng ngưỡng, bằng 0 và thiếu
+        field = ('pe', 'pb', 'roe', 'rsi', 'price_change_30d')[i % 5]
+        record[field] = (None, 0.0, 10.0, 15.0, 20.0, 40.0, 30.0, 1.0)[i % 8] if i % 4 == 0 else record[field]
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1600, help='Số mã')
+    parser.add_argument('--repeat', type=int, default=50, help='Số lần chạy')
+    args = parser.parse_args()
+
+    records = make_records(args.rows, seed=0)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        # Như các lời gọi trước đây: biến động giá truyền qua key 'price_change'
+        expected = [legacy_score({**record, 'price_change': record['price_change_30d']}) for record in records]
+    legacy_time = (time.perf_counter() - start) / args.repeat
+
+    # Chấm điểm trên snapshot dạng cột (như khi đổi trọng số và chấm lại toàn thị trường)
+    snapshot = ScreenerSnapshot(records)
+    assert np.array_equal(np.array(expected, dtype=float), snapshot.profile_scores('classic')), \
+        "classic profile differs from legacy scores"
+    assert np.array_equal(snapshot.profile_scores('classic'), score_records(records, SCORING_PROFILES['classic']))
+
+    print(f"{args.rows} stocks, legacy if/elif {legacy_time * 1000:.2f} ms")
+    for name in SCORING_PROFILES:
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            snapshot._profile_scores.clear()
+            scores = snapshot.profile_scores(name)
+        rescore_time = (time.perf_counter() - start) / args.repeat
+        print(f"  {name:<9s} {rescore_time * 1000:7.2f} ms   speedup {legacy_time / rescore_time:6.1f}x   "
+              f"mean score {scores.mean():6.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark screener: truy vấn SQLAlchemy (StockDataService.screen_stocks) so với snapshot NumPy
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_screener_snapshot --rows 1600 --repeat 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base
+from app.services.screener_snapshot import ScreenerSnapshot
+from app.services.stock_data_service import StockDataService
+from benchmarks.bench_stock_upsert import make_rows
+
+SCREENS = [
+    ({'pe_max': 15, 'pb_max': 2, 'roe_min': 15, 'market_cap_min': 1e12}, None),
+    ({'rsi_max': 30, 'volume_min': 100_000}, 'HOSE'),
+    ({'price_change_min': 5, 'price_change_max': 30}, None),
+    ({}, None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1600, help='Số mã trong database')
+    parser.add_argument('--repeat', type=int, default=200, help='Số lần chạy mỗi bộ lọc')
+    parser.add_argument('--limit', type=int, default=50, help='Số mã trả về')
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    try:
+        with Session() as db:
+            StockDataService.bulk_upsert_stock_data(db, make_rows(args.rows, seed=0))
+            start = time.perf_counter()
+            snapshot = ScreenerSnapshot.from_db(db)
+            build_time = time.perf_counter() - start
+
+            print(f"{args.rows} stocks, limit {args.limit}, snapshot build {build_time * 1000:.1f} ms")
+            for filters, exchange in SCREENS:
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    expected = [s.to_dict() for s in StockDataService.screen_stocks(db, filters, exchange, args.limit)]
+                sql_time = (time.perf_counter() - start) / args.repeat
+
+                start = time.perf_counter()
+                for _ in range(args.repeat):
+                    actual = snapshot.screen(filters, exchange, args.limit)
+                snapshot_time = (time.perf_counter() - start) / args.repeat
+
+                assert [r['symbol'] for r in expected] == [r['symbol'] for r in actual], f"Mismatch for {filters}"
+                print(f"  {len(actual):3d} found  sql {sql_time * 1e6:9.0f} us   "
+                      f"snapshot {snapshot_time * 1e6:7.0f} us   speedup {sql_time / snapshot_time:6.1f}x   {filters}")
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
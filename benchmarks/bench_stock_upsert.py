@@ -0,0 +1,91 @@
+"""
+Benchmark ghi dữ liệu screening: upsert_stock_data từng dòng so với bulk_upsert_stock_data
+
+Mỗi vòng ghi cùng một tập mã hai lần: lần đầu insert vào bảng rỗng, lần sau update các
+mã đã có. Database SQLite tạm (file) được tạo mới cho mỗi cách ghi.
+
+Chạy từ thư mục gốc của repo:
+    python -m benchmarks.bench_stock_upsert --rows 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database.models import Base, StockScreeningData
+from app.services.stock_data_service import StockDataService
+
+
+def make_rows(count: int, seed: int):
+    """Dữ liệu screening ngẫu nhiên cho `count` mã"""
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            'symbol': f"S{i:04d}",
+            'exchange': ('HOSE', 'HNX', 'UPCOM')[i % 3],
+            'current_price': float(rng.uniform(5, 150)),
+            'price_change_30d': float(rng.normal(0, 8)),
+            'volume': float(rng.integers(10_000, 5_000_000)),
+            'pe': float(rng.uniform(3, 40)),
+            'pb': float(rng.uniform(0.5, 6)),
+            'roe': float(rng.uniform(-5, 35)),
+            'eps': float(rng.uniform(-500, 8000)),
+            'market_cap': float(rng.uniform(1e11, 1e14)),
+            'rsi': float(rng.uniform(10, 90)),
+            'score': float(rng.uniform(0, 100)),
+        }
+        for i in range(count)
+    ]
+
+
+def run(write, rows_by_pass):
+    """Ghi từng lượt vào database tạm, trả về thời gian mỗi lượt (giây) và số dòng cuối"""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    timings = []
+    try:
+        for rows in rows_by_pass:
+            with Session() as db:
+                start = time.perf_counter()
+                write(db, rows)
+                timings.append(time.perf_counter() - start)
+        with Session() as db:
+            stored = {s.symbol: s.pe for s in db.query(StockScreeningData).all()}
+    finally:
+        engine.dispose()
+        os.remove(path)
+    return timings, stored
+
+
+def legacy_write(db, rows):
+    """Cách cũ: SELECT, commit và refresh cho từng mã"""
+    for row in rows:
+        StockDataService.upsert_stock_data(db, dict(row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2000, help='Số mã mỗi lượt ghi')
+    args = parser.parse_args()
+
+    rows_by_pass = [make_rows(args.rows, seed=0), make_rows(args.rows, seed=1)]
+
+    legacy, legacy_stored = run(legacy_write, rows_by_pass)
+    bulk, bulk_stored = run(StockDataService.bulk_upsert_stock_data, rows_by_pass)
+    assert legacy_stored == bulk_stored, "Stored data mismatch"
+
+    print(f"{args.rows} rows per pass (SQLite)")
+    for label, index in (('insert', 0), ('update', 1)):
+        print(f"  {label}: per-row {legacy[index] * 1000:9.1f} ms   "
+              f"bulk {bulk[index] * 1000:9.1f} ms   speedup {legacy[index] / bulk[index]:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()